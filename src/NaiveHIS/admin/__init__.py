@@ -7,7 +7,7 @@ from .accounts import HISAccountAdmin, AdministrativeEmployeeAdmin, DoctorAdmin,
 
 # objects
 from ..models.objects import Department, DepartmentQualifications, Room, Patient
-from .objects import PatientAdmin, RoomAdmin
+from .objects import PatientAdmin, RoomAdmin, DepartmentAdmin, DepartmentQualificationsAdmin
 
 # tasks
 from ..models.tasks import (
@@ -22,6 +22,7 @@ from ..models.tasks import (
     TherapyReport,
     FindingsReport,
 )
+from ..models.discharge import DischargeSummary
 
 from .tasks import (
     CaseAdmin,
@@ -34,8 +35,37 @@ from .tasks import (
     ExaminationReportAdmin,
     TherapyReportAdmin,
     FindingsReportAdmin,
+    DischargeSummaryAdmin,
 )
 
+# duplicates
+from ..models.duplicates import DuplicateCandidate, DuplicateScan, PatientMerge
+from .duplicates import DuplicateCandidateAdmin, DuplicateScanAdmin, PatientMergeAdmin
+
+# archive
+from ..models.archive import ArchivedRecord
+from .archive import ArchivedRecordAdmin
+
+# audit
+from ..models.audit import AuditEvent
+from .audit import AuditEventAdmin
+
+# hl7
+from ..models.hl7 import OutboundMessage, ReceivedMessage
+from .hl7 import OutboundMessageAdmin, ReceivedMessageAdmin
+
+# dicom
+from ..models.dicom import DicomStudy
+from .dicom import DicomStudyAdmin
+
+# jobs
+from ..models.jobs import Job
+from .jobs import JobAdmin
+
+# census
+from ..models.census import DailyCensus
+from .census import DailyCensusAdmin
+
 admin.site.site_header = _('NaiveHIS')
 admin.site.site_title = _('KIS Verwaltung')
 admin.site.index_title = _('KIS Verwaltung')
@@ -48,8 +78,8 @@ admin.site.register(Nurse, NurseAdmin)
 admin.site.register(GeneralPersonnel, GeneralPersonnelAdmin)
 
 # objects
-admin.site.register(Department)
-admin.site.register(DepartmentQualifications)
+admin.site.register(Department, DepartmentAdmin)
+admin.site.register(DepartmentQualifications, DepartmentQualificationsAdmin)
 admin.site.register(Room, RoomAdmin)
 admin.site.register(Patient, PatientAdmin)
 
@@ -66,3 +96,29 @@ admin.site.register(DiagnosisReport, DiagnosisReportAdmin)
 admin.site.register(ExaminationReport, ExaminationReportAdmin)
 admin.site.register(TherapyReport, TherapyReportAdmin)
 admin.site.register(FindingsReport, FindingsReportAdmin)
+
+admin.site.register(DischargeSummary, DischargeSummaryAdmin)
+
+# duplicates
+admin.site.register(DuplicateCandidate, DuplicateCandidateAdmin)
+admin.site.register(DuplicateScan, DuplicateScanAdmin)
+admin.site.register(PatientMerge, PatientMergeAdmin)
+
+# audit
+admin.site.register(AuditEvent, AuditEventAdmin)
+
+# archive
+admin.site.register(ArchivedRecord, ArchivedRecordAdmin)
+
+# hl7
+admin.site.register(ReceivedMessage, ReceivedMessageAdmin)
+admin.site.register(OutboundMessage, OutboundMessageAdmin)
+
+# dicom
+admin.site.register(DicomStudy, DicomStudyAdmin)
+
+# jobs
+admin.site.register(Job, JobAdmin)
+
+# census
+admin.site.register(DailyCensus, DailyCensusAdmin)
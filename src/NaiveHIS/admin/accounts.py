@@ -18,9 +18,11 @@ from .common import (
     ADDRESS_ORDERING,
     PERSON_FIELDSETS,
     PERSON_LIST_DISPLAY,
-    # PERSON_LIST_FILTER,
+    PERSON_LIST_FILTER,
     PERSON_SEARCH_FIELDS,
-    PERSON_ORDERING, BlankableAdminMixin
+    PERSON_ORDERING, BlankableAdminMixin,
+    PersonAdminMixin,
+    ReferenceDataAdminMixin,
 )
 
 from ..models.accounts import (
@@ -200,7 +202,7 @@ class HISAccountAdmin(UserAdmin):
 
     list_filter = ACCOUNT_LIST_FILTER
 
-    search_fields = ('email', 'username')
+    search_fields = ('^username', '^email')
     ordering = ('username',)
     filter_horizontal = ()
 
@@ -243,7 +245,7 @@ ORG_FIELDSETS = (_('Organisationseinheit'), {
 }),
 
 
-class EmployeeAdmin(HISAccountAdmin, BlankableAdminMixin):
+class EmployeeAdmin(HISAccountAdmin, BlankableAdminMixin, PersonAdminMixin, ReferenceDataAdminMixin):
     form = EmployeeChangeForm
     add_form = EmployeeCreationForm
 
@@ -260,7 +262,7 @@ class EmployeeAdmin(HISAccountAdmin, BlankableAdminMixin):
 
     list_filter = (
         'department',
-        # *PERSON_LIST_FILTER,
+        *PERSON_LIST_FILTER,
         *HISAccountAdmin.list_filter
     )
 
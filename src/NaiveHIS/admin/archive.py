@@ -0,0 +1,48 @@
+from django.contrib.admin import display
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext_lazy as _
+
+from ..services.archive import kept_rows
+from .pagination import LargeTableAdminMixin
+
+
+class ArchivedRecordAdmin(LargeTableAdminMixin):
+    list_display = ('model', 'object_id', 'case_id', 'patient_id', 'closed_at', 'archived_at')
+    list_filter = ('model',)
+    readonly_fields = ('model', 'object_id', 'case_id', 'patient_id', 'closed_at', 'archived_at', 'data', 'kept')
+
+    search_fields = ('=case_id',)
+    search_help_text = _('Sucht nach Fall- oder Patienten-ID')
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+
+        if not search_term.isdigit():
+            return queryset if not search_term else queryset.none(), False
+
+        return queryset.filter(Q(case_id=search_term) | Q(patient_id=search_term)), False
+
+    @display(description=_('Verknüpft'))
+    def kept(self, record):
+        # the rows kept in the hot tables that still refer to the case or its archived rows
+        links = []
+        for model, objs in kept_rows(record.case_id).items():
+            for obj in objs:
+                label = f'{model._meta.verbose_name}: {obj}'
+                if self.admin_site.is_registered(model):
+                    url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_change', args=(obj.pk,))
+                    links.append(format_html('<a href="{}">{}</a>', url, label))
+                else:
+                    links.append(label)
+
+        return format_html_join(mark_safe('<br>'), '{}', ((link,) for link in links)) or '-'
+
+    def has_add_permission(self, request):
+        # records are written by the archive_cases command
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,205 @@
+import base64
+import re
+
+from django import forms
+from django.contrib.admin import TabularInline, ModelAdmin, display
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, \
+    StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+
+from ..audit import audit_log
+from ..blobs import CHUNK_SIZE, blob_store
+from ..models.attachments import Attachment
+from ..models.audit import AuditEvent
+from ..services.attachments import attach
+
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# blobs never change, so their responses can be cached as long as the browser wants to
+_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+# content types are given by the uploader, only these are shown in the browser, everything else is downloaded
+INLINE_CONTENT_TYPES = frozenset({
+    'application/pdf',
+    'image/gif',
+    'image/jpeg',
+    'image/png',
+    'image/webp',
+    'text/plain',
+})
+
+
+def _byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """(start, end) of a single range request, end exclusive. None means the whole file, multiple ranges included."""
+    match = _BYTE_RANGE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # the last n bytes
+        start, end = max(size - int(last), 0), size
+    else:
+        start, end = int(first), min(int(last) + 1, size) if last else size
+
+    if start >= size or start >= end:
+        raise ValueError('Range not satisfiable')
+
+    return start, end
+
+
+class AttachmentForm(forms.ModelForm):
+    upload = forms.FileField(label=_('Datei'), required=False)
+
+    class Meta:
+        model = Attachment
+        fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # stored files are never replaced, a new version is a new attachment
+        if self.instance.pk is not None:
+            self.fields['upload'].disabled = True
+
+
+class AttachmentInline(TabularInline):
+    model = Attachment
+    form = AttachmentForm
+    extra = 1
+    fields = ('upload', 'download', 'content_type', 'size', 'uploaded_by', 'created_at')
+    readonly_fields = ('download', 'content_type', 'size', 'uploaded_by', 'created_at')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('blob', 'uploaded_by')
+
+    def get_fields(self, request, obj=None):
+        return self.fields
+
+    @display(description=_('Datei'))
+    def download(self, attachment: Attachment):
+        if attachment.pk is None:
+            return '-'
+
+        url = reverse(f'admin:{self.parent_model._meta.app_label}_{self.parent_model._meta.model_name}_attachment',
+                      args=(attachment.report_id, attachment.pk))
+        return format_html('<a href="{}">{}</a>', url, attachment.filename)
+
+    @display(description=_('Größe'))
+    def size(self, attachment: Attachment):
+        return attachment.blob.size if attachment.pk is not None else '-'
+
+
+class AttachmentAdminMixin(ModelAdmin):
+    """
+    Attachments of the objects of this admin: an inline for uploads from the change form, a streaming upload view for
+    large files and downloads that support range requests.
+    """
+
+    def get_inlines(self, request, obj):
+        return (*super().get_inlines(request, obj), AttachmentInline)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+
+        return [
+            path('<path:object_id>/attachments/upload/', self.admin_site.admin_view(self.upload_view),
+                 name='%s_%s_upload' % info),
+            path('<path:object_id>/attachments/<int:attachment_id>/', self.admin_site.admin_view(self.download_view),
+                 name='%s_%s_attachment' % info),
+            *super().get_urls(),
+        ]
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not Attachment:
+            return super().save_formset(request, form, formset, change)
+
+        # collects the attachments marked for deletion
+        formset.save(commit=False)
+
+        for attachment_form in formset.forms:
+            upload = attachment_form.cleaned_data.get('upload')
+            if upload is not None and attachment_form.instance.pk is None:
+                # Django has spooled the upload to a temporary file already, it's copied over in chunks
+                attach(form.instance, upload.chunks(CHUNK_SIZE), upload.name, upload.content_type or '',
+                       request.user)
+
+        for attachment in formset.deleted_objects:
+            attachment.delete()
+
+    def upload_view(self, request, object_id):
+        """Store the raw request body, sent with PUT, as an attachment without buffering it in memory."""
+        if request.method != 'PUT':
+            return HttpResponseNotAllowed(['PUT'])
+
+        obj = self.get_object(request, object_id)
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+
+        filename = request.GET.get('filename') or request.headers.get('X-Filename') or 'upload'
+        attachment = attach(obj, iter(lambda: request.read(CHUNK_SIZE), b''), filename,
+                            request.content_type or '', request.user)
+        audit_log.record(AuditEvent.Action.CHANGE, obj, request.user, f'Anhang {attachment.filename}',
+                         on_commit=True)
+
+        return JsonResponse({'id': attachment.pk, 'sha256': attachment.blob_id, 'size': attachment.blob.size},
+                            status=201)
+
+    def download_view(self, request, object_id, attachment_id):
+        obj = self.get_object(request, object_id)
+        if obj is None:
+            raise Http404
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+
+        attachment = get_object_or_404(Attachment.objects.select_related('blob'), pk=attachment_id, report=obj)
+        blob = attachment.blob
+        etag = f'"{blob.sha256}"'
+
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+        audit_log.record(AuditEvent.Action.VIEW, obj, request.user, f'Anhang {attachment.filename}')
+
+        byte_range = None
+        if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = _byte_range(request.headers['Range'], blob.size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{blob.size}'
+                return response
+
+        inline = attachment.content_type in INLINE_CONTENT_TYPES
+        content_type = attachment.content_type if inline else 'application/octet-stream'
+
+        if byte_range is None:
+            # a plain file, which the server can send with sendfile() where it supports wsgi.file_wrapper
+            response = FileResponse(blob_store.open(blob.sha256), as_attachment=not inline,
+                                    filename=attachment.filename, content_type=content_type)
+            response['Repr-Digest'] = f'sha-256=:{base64.b64encode(bytes.fromhex(blob.sha256)).decode()}:'
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(blob_store.read_range(blob.sha256, start, end), status=206,
+                                             content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end - 1}/{blob.size}'
+            response['Content-Length'] = end - start
+            if not inline:
+                response['Content-Disposition'] = 'attachment'
+
+        response['X-Content-Type-Options'] = 'nosniff'
+
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = _CACHE_CONTROL
+        return response
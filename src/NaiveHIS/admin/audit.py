@@ -0,0 +1,17 @@
+from .pagination import LargeTableAdminMixin
+
+
+class AuditEventAdmin(LargeTableAdminMixin):
+    list_display = ('timestamp', 'user', 'action', 'model', 'object_repr', 'patient')
+    list_filter = ('action', 'model')
+    list_select_related = ('user', 'patient')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # the log is append-only
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
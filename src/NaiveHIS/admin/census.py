@@ -0,0 +1,18 @@
+from .pagination import LargeTableAdminMixin
+
+
+class DailyCensusAdmin(LargeTableAdminMixin):
+    list_display = ('day', 'department', 'census', 'admissions', 'discharges', 'transfers_in', 'transfers_out')
+    list_filter = ('department',)
+    list_select_related = ('department',)
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # maintained by services.census
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
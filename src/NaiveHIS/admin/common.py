@@ -1,10 +1,18 @@
-from datetime import datetime
+from datetime import date
 from typing import Callable
 
 from django.http import HttpRequest
-from django.contrib.admin import display, ModelAdmin
+from django.contrib.admin import action, display, ModelAdmin, SimpleListFilter
+from django.forms import BaseForm
+from django.forms.models import ModelChoiceField, ModelChoiceIterator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from ..models.common import CloseableMixin, PersonMixin
+from .. import cache
+from ..audit import audit_log
+from ..models.audit import AuditEvent
+from ..models.common import CloseableMixin, PersonMixin, person_annotations
+from ..services.search import search_patients
+from ..services.visibility import visible_cases
 
 TIMESTAMPED_LIST_DISPLAY = (
     'created_at',
@@ -32,6 +40,23 @@ CLOSEABLE_LIST_DISPLAY = (
     'closed_at',
 )
 
+
+class CloseableAdminMixin(ModelAdmin):
+    """Actions to close and reopen the selected objects, see `CloseableQuerySet`."""
+
+    actions = ('close_selected', 'reopen_selected')
+
+    @action(description=_('Ausgewählte abschließen'), permissions=('change',))
+    def close_selected(self, request, queryset):
+        count = queryset.close()
+        self.message_user(request, _('%(count)d Einträge abgeschlossen') % {'count': count})
+
+    @action(description=_('Ausgewählte wieder eröffnen'), permissions=('change',))
+    def reopen_selected(self, request, queryset):
+        count = queryset.reopen()
+        self.message_user(request, _('%(count)d Einträge wieder eröffnet') % {'count': count})
+
+
 ADDRESS_FIELDSETS = (
     (_('Adresse'), {
         'classes': ('wide',),
@@ -58,46 +83,146 @@ PERSON_FIELDSETS = (
 )
 
 
-@display(description=_('Name'))
+@display(description=_('Name'), ordering='last_name')
 def _person(obj: PersonMixin):
-    return obj.person
+    # annotated by PersonAdminMixin.get_queryset
+    return getattr(obj, 'person_name', None) or obj.person
 
 
-@display(description=_('Alter'))
+# sorting by age ascending is sorting by date of birth descending, which can use the index
+@display(description=_('Alter'), ordering='-date_of_birth')
 def _age(obj: PersonMixin) -> int | str:
-    now = datetime.now()
-    dob = obj.date_of_birth
-
-    if dob is not None:
-        dy, dm, dd = (
-            now.year - dob.year,
-            now.month - dob.month,
-            now.day - dob.day
-        )
+    # annotated by PersonAdminMixin.get_queryset
+    age = getattr(obj, 'age', None)
+    return _('-') if age is None else age
+
+
+class AgeListFilter(SimpleListFilter):
+    title = _('Alter')
+    parameter_name = 'age'
+
+    # (lookup, label, minimum age, maximum age)
+    age_groups = (
+        ('minor', _('unter 18'), 0, 17),
+        ('adult', _('18 bis 64'), 18, 64),
+        ('senior', _('ab 65'), 65, None),
+    )
 
-        age = dy
-        if dm > 0 or dm == 0 and dd > 0:
-            age -= 1
-    else:
-        age = _('-')
+    def lookups(self, request, model_admin):
+        return [(lookup, label) for lookup, label, _min, _max in self.age_groups]
 
-    return age
+    def queryset(self, request, queryset):
+        today = timezone.localdate()
+
+        for lookup, label, min_age, max_age in self.age_groups:
+            if self.value() == lookup:
+                # filter on the date of birth instead of the age, so the index can be used
+                queryset = queryset.filter(date_of_birth__lte=_years_before(today, min_age))
+                if max_age is not None:
+                    queryset = queryset.filter(date_of_birth__gt=_years_before(today, max_age + 1))
+
+        return queryset
+
+
+def _years_before(day: date, years: int) -> date:
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        # 29th of february
+        return day.replace(year=day.year - years, day=28)
 
 
 PERSON_LIST_DISPLAY = (_person, _age)
-PERSON_SEARCH_FIELDS = ('title', 'first_name', 'last_name', _person)
+PERSON_LIST_FILTER = (AgeListFilter,)
+# prefix searches, so typing into autocomplete fields can make use of the name index
+PERSON_SEARCH_FIELDS = ('^last_name', '^first_name', '^title')
 PERSON_ORDERING = ('last_name', 'first_name', 'title')
 
 
-class BlankableAdminMixin(ModelAdmin):
-    blanking_conditions: tuple[tuple[Callable[[HttpRequest, object], bool], list[str]]]
+class PersonAdminMixin(ModelAdmin):
+    def get_queryset(self, request):
+        # computed once per page by the database, instead of once per cell in python
+        return super().get_queryset(request).annotate(**person_annotations())
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+
+    return value
+
+
+class CachedFormAdminMixin(ModelAdmin):
+    """
+    Builds every form class once per role and reuses it for later requests.
+    Everything the form class depends on has to be part of `get_form_cache_key`, per-request values must not be put
+    into the form class, they are shared between requests. They are set on the form instances by `bind_form`.
+    """
+
+    def get_form_cache_key(self, request, obj=None) -> tuple:
+        user = request.user
+
+        return (
+            obj is None,
+            # permissions are granted by role, they decide about readonly fields and the add/change related links
+            user.is_admin,
+            user.is_superuser,
+            None if user.is_admin else user.role,
+            tuple(self.get_readonly_fields(request, obj)),
+        )
+
+    def prepare_form(self, form, request, obj=None):
+        """Adjust a newly built form class, before it is cached."""
+        return form
+
+    def bind_form(self, form: BaseForm, request):
+        """Set what depends on the user on a new form instance."""
+        # autocomplete fields validate against the related admin's queryset, which only has the visible cases
+        for name in self.get_autocomplete_fields(request):
+            field = form.fields.get(name)
+            related_admin = self.admin_site._registry.get(field.queryset.model) if field is not None else None
+            if related_admin is not None:
+                field.queryset = related_admin.get_queryset(request)
 
     def get_form(self, request, obj=None, **kwargs):
+        forms = self.__dict__.setdefault('_form_cache', {})
+        key = (*self.get_form_cache_key(request, obj), _freeze(kwargs))
+
+        form = forms.get(key)
+        if form is None:
+            form = forms[key] = self.prepare_form(super().get_form(request, obj, **kwargs), request, obj)
+
+        return self._bound_form(form, request)
+
+    def _bound_form(self, form: type[BaseForm], request) -> type[BaseForm]:
+        admin = self
+
+        def __init__(self, *args, **kwargs):
+            form.__init__(self, *args, **kwargs)
+            admin.bind_form(self, request)
+
+        # type.__new__ skips the metaclass of the form, which would build all fields again
+        return type.__new__(type(form), form.__name__, (form,), {'__init__': __init__, '__module__': form.__module__})
+
+
+class BlankableAdminMixin(CachedFormAdminMixin):
+    blanking_conditions: tuple[tuple[Callable[[HttpRequest, object], bool], list[str]]]
+
+    def _blanking_outcomes(self, request, obj) -> tuple[bool, ...]:
+        return tuple(bool(predicate(request, obj)) for predicate, _fields in self.blanking_conditions)
+
+    def get_form_cache_key(self, request, obj=None) -> tuple:
+        return (*super().get_form_cache_key(request, obj), self._blanking_outcomes(request, obj))
+
+    def prepare_form(self, form, request, obj=None):
         # TODO not sure what happens if someone still sends the data in the request
-        form = super().get_form(request, obj, **kwargs)
+        form = super().prepare_form(form, request, obj)
 
-        for predicate, fields in self.blanking_conditions:
-            if predicate(request, obj):
+        for blanked, (_predicate, fields) in zip(self._blanking_outcomes(request, obj), self.blanking_conditions):
+            if blanked:
                 for field in fields:
                     if field in form.base_fields:
                         form.base_fields[field].disabled = True
@@ -106,3 +231,126 @@ class BlankableAdminMixin(ModelAdmin):
                         ...
 
         return form
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+
+        for obj in self.field.objects():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.objects()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.objects())
+
+
+class CachedModelChoiceField(ModelChoiceField):
+    """
+    Renders its choices from the reference data cache instead of querying on every render.
+    Submitted values are still validated against the queryset.
+    """
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, queryset, *, objects: Callable[[], list], **kwargs):
+        self.objects = objects
+        super().__init__(queryset, **kwargs)
+
+
+# related models whose dropdowns are rendered from the reference data cache
+CACHED_CHOICES = {
+    'Department': cache.departments,
+    'Room': cache.rooms,
+}
+
+
+class ReferenceDataAdminMixin(ModelAdmin):
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        objects = CACHED_CHOICES.get(db_field.related_model.__name__)
+
+        # autocomplete, raw id and radio widgets bring their own way of loading choices
+        special_widget_fields = (*self.get_autocomplete_fields(request), *self.raw_id_fields, *self.radio_fields)
+
+        if objects is not None and db_field.name not in special_widget_fields and 'queryset' not in kwargs:
+            return db_field.formfield(form_class=CachedModelChoiceField, objects=objects, **kwargs)
+
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class AutocompleteAdminMixin(ModelAdmin):
+    """Renders the selected value of autocomplete fields from the queryset of the related admin."""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        related_admin = self.admin_site._registry.get(db_field.remote_field.model)
+
+        if related_admin is not None and db_field.name in self.get_autocomplete_fields(request) \
+                and 'queryset' not in kwargs:
+            # str() of the selected value follows foreign keys for some models,
+            # the related admin's queryset selects those along
+            kwargs['queryset'] = related_admin.get_queryset(request)
+
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class PatientSearchAdminMixin(ModelAdmin):
+    """Searches by id, or by patient name through the fuzzy patient search index."""
+
+    # lookup from the model of this admin to the patient
+    patient_lookup: str = 'patient'
+    search_fields = ('=id',)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+
+        if not search_term:
+            return queryset, False
+
+        if search_term.isdigit():
+            return queryset.filter(pk=int(search_term)), False
+
+        patient_ids = [match.patient.pk for match in search_patients(search_term)]
+        return queryset.filter(**{f'{self.patient_lookup}__in': patient_ids}), False
+
+
+class CaseVisibilityAdminMixin(ModelAdmin):
+    """Lists and opens only the objects whose case the user may see, see `services.visibility`."""
+
+    # lookup from the model of this admin to the case, empty for cases themselves
+    case_lookup: str = 'case'
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        condition = visible_cases(request.user, self.case_lookup)
+
+        return queryset if condition is None else queryset.filter(condition)
+
+
+class AuditAdminMixin(ModelAdmin):
+    """Records opened, added, changed and deleted objects in the audit log."""
+
+    def render_change_form(self, request, context, add=False, change=False, form_url='', obj=None):
+        if obj is not None and request.method == 'GET':
+            audit_log.record(AuditEvent.Action.VIEW, obj, request.user)
+
+        return super().render_change_form(request, context, add, change, form_url, obj)
+
+    def _record(self, request, action: str, obj, message: str = ''):
+        # changes that are rolled back never happened
+        audit_log.record(action, obj, request.user, message, on_commit=True)
+
+    def log_addition(self, request, obj, message):
+        self._record(request, AuditEvent.Action.ADD, obj)
+        return super().log_addition(request, obj, message)
+
+    def log_change(self, request, obj, message):
+        changed = [field for entry in message if isinstance(entry, dict)
+                   for field in entry.get('changed', {}).get('fields', ())]
+        self._record(request, AuditEvent.Action.CHANGE, obj, ', '.join(changed))
+        return super().log_change(request, obj, message)
+
+    def log_deletion(self, request, obj, object_repr):
+        self._record(request, AuditEvent.Action.DELETE, obj)
+        return super().log_deletion(request, obj, object_repr)
@@ -0,0 +1,101 @@
+from django.contrib.admin import TabularInline, display
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+
+from ..models.dicom import DicomSeries, DicomStudy
+from .common import AutocompleteAdminMixin
+from .pagination import LargeTableAdminMixin
+
+STUDY_FIELDS = ('study_date', 'study_time', 'description', 'accession_number')
+
+
+class DicomSeriesInline(TabularInline):
+    model = DicomSeries
+    fields = ('number', 'modality', 'body_part', 'description', 'series_instance_uid')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class DicomStudyInline(TabularInline):
+    """The studies acquired for an examination order."""
+
+    model = DicomStudy
+    fields = STUDY_FIELDS
+    readonly_fields = STUDY_FIELDS
+    extra = 0
+    can_delete = False
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        # studies are found by the index_dicom command
+        return False
+
+
+class DicomStudyAdmin(LargeTableAdminMixin, AutocompleteAdminMixin):
+    list_display = ('study_date', 'modalities', 'description', 'patient_name', 'patient', 'linked_case',
+                    'linked_order')
+    list_filter = ('series__modality', 'series__body_part')
+    date_hierarchy = 'study_date'
+    search_fields = ('=accession_number', '=patient_identifier', '=study_instance_uid', 'patient_name',
+                     'description')
+    ordering = ('-study_date', '-id')
+
+    # only the links can be corrected, everything else is read from the files
+    fields = ('study_instance_uid', *STUDY_FIELDS, 'patient_identifier', 'issuer', 'patient_name',
+              'patient_birth_date', 'patient', 'case', 'examination_order', 'indexed_at')
+    readonly_fields = ('study_instance_uid', *STUDY_FIELDS, 'patient_identifier', 'issuer', 'patient_name',
+                       'patient_birth_date', 'indexed_at')
+    autocomplete_fields = ('patient', 'case', 'examination_order')
+    inlines = (DicomSeriesInline,)
+
+    def get_queryset(self, request):
+        # joined, so links to archived cases and orders read as None instead of failing
+        return (super().get_queryset(request)
+                .select_related('patient', 'case__patient', 'examination_order__case__patient',
+                                'examination_order__issued_by', 'examination_order__assigned_to')
+                .prefetch_related('series'))
+
+    @staticmethod
+    def _archived(study: DicomStudy, field: str) -> bool:
+        return getattr(study, f'{field}_id') is not None and getattr(study, field) is None
+
+    def get_fields(self, request, obj=None):
+        fields = super().get_fields(request, obj)
+        if obj is None or not (self._archived(obj, 'case') or self._archived(obj, 'examination_order')):
+            return fields
+
+        # the autocomplete widgets can't show archived choices, saving them would drop the links
+        return tuple({'case': 'linked_case', 'examination_order': 'linked_order'}.get(name, name) for name in fields)
+
+    def get_readonly_fields(self, request, obj=None):
+        return (*super().get_readonly_fields(request, obj), 'linked_case', 'linked_order')
+
+    def _link(self, study: DicomStudy, field: str):
+        if not self._archived(study, field):
+            return getattr(study, field)
+
+        model = DicomStudy._meta.get_field(field).related_model
+        url = f'{reverse("admin:NaiveHIS_archivedrecord_changelist")}?model={model._meta.label}' \
+              f'&object_id={getattr(study, f"{field}_id")}'
+        return format_html('<a href="{}">{} {} {}</a>', url, model._meta.verbose_name,
+                           getattr(study, f'{field}_id'), _('(archiviert)'))
+
+    @display(description=_('Fall'), ordering='case')
+    def linked_case(self, study: DicomStudy):
+        return self._link(study, 'case')
+
+    @display(description=_('Untersuchungsauftrag'), ordering='examination_order')
+    def linked_order(self, study: DicomStudy):
+        return self._link(study, 'examination_order')
+
+    @display(description=_('Modalitäten'))
+    def modalities(self, study: DicomStudy):
+        return ', '.join(sorted({series.modality for series in study.series.all() if series.modality}))
+
+    def has_add_permission(self, request):
+        return False
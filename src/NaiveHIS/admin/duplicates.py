@@ -0,0 +1,76 @@
+from django.contrib import admin, messages
+from django.utils.translation import gettext_lazy as _
+
+from .common import TIMESTAMPED_LIST_DISPLAY
+from ..models.duplicates import DuplicateCandidate
+from ..services.merge import merge_patients, undo_merge
+
+
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'duplicate', 'score', 'status', 'reviewed_by') + TIMESTAMPED_LIST_DISPLAY
+    list_filter = ('status',)
+    list_select_related = ('patient', 'duplicate', 'reviewed_by')
+    readonly_fields = ('patient', 'duplicate', 'score', 'blocking_key', 'reviewed_by')
+
+    actions = ('merge', 'reject')
+
+    @admin.action(description=_('Patienten zusammenführen'), permissions=('change',))
+    def merge(self, request, queryset):
+        # rejected candidates were reviewed as different people already
+        skipped = queryset.exclude(status=DuplicateCandidate.Status.OPEN).count()
+        if skipped:
+            self.message_user(request, _('%(count)d bereits geprüfte Kandidaten übersprungen') % {'count': skipped},
+                              messages.WARNING)
+
+        count = 0
+        for pk in queryset.filter(status=DuplicateCandidate.Status.OPEN).values_list('pk', flat=True):
+            # earlier merges of this batch may have deleted the candidate along with its patient
+            candidate = DuplicateCandidate.objects.select_related('patient', 'duplicate').filter(pk=pk).first()
+            if candidate is None:
+                continue
+
+            # the older record survives
+            merge_patients(candidate.patient, candidate.duplicate, merged_by=request.user)
+            count += 1
+
+        self.message_user(request, _('%(count)d Patienten zusammengeführt') % {'count': count})
+
+    @admin.action(description=_('Als kein Duplikat markieren'), permissions=('change',))
+    def reject(self, request, queryset):
+        count = queryset.update(status=DuplicateCandidate.Status.REJECTED, reviewed_by=request.user)
+        self.message_user(request, _('%(count)d Kandidaten abgelehnt') % {'count': count})
+
+    def has_add_permission(self, request):
+        # candidates are queued by the find_duplicate_patients command
+        return False
+
+    def save_model(self, request, obj, form, change):
+        obj.reviewed_by = request.user
+        super().save_model(request, obj, form, change)
+
+
+class DuplicateScanAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'finished_at', 'incremental', 'since', 'patients_checked', 'candidates_found')
+
+    def has_add_permission(self, request):
+        # scans are started by the find_duplicate_patients command
+        return False
+
+
+class PatientMergeAdmin(admin.ModelAdmin):
+    list_display = ('survivor', 'merged_patient_id', 'merged_by', 'created_at', 'undone_at')
+    list_select_related = ('survivor', 'merged_by')
+    readonly_fields = ('survivor', 'merged_patient_id', 'merged_patient_data', 'moved', 'closed_cases',
+                       'shifted_cases', 'merged_by', 'undone_at')
+
+    actions = ('undo',)
+
+    @admin.action(description=_('Zusammenführung rückgängig machen'), permissions=('change',))
+    def undo(self, request, queryset):
+        # newest first, so chained merges are unwound in reverse
+        for merge in queryset.filter(undone_at=None).order_by('-created_at'):
+            undo_merge(merge)
+            self.message_user(request, _('%(merge)s rückgängig gemacht') % {'merge': merge}, messages.SUCCESS)
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,46 @@
+from django.contrib.admin import action
+from django.utils.translation import gettext_lazy as _
+
+from ..models.hl7 import OutboundMessage
+from .pagination import LargeTableAdminMixin
+
+
+class ReceivedMessageAdmin(LargeTableAdminMixin):
+    list_display = ('received_at', 'sender', 'control_id', 'message_type', 'status')
+    list_filter = ('status', 'message_type')
+    readonly_fields = ('received_at', 'sender', 'control_id', 'message_type', 'status', 'error')
+    search_fields = ('=control_id',)
+
+    def has_add_permission(self, request):
+        # messages are recorded by the HL7 interface
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class OutboundMessageAdmin(LargeTableAdminMixin):
+    list_display = ('created_at', 'destination', 'message_type', 'control_id', 'status', 'attempts', 'sent_at')
+    list_filter = ('destination', 'status', 'message_type')
+    readonly_fields = ('destination', 'control_id', 'message_type', 'payload', 'created_at', 'status', 'attempts',
+                       'next_attempt_at', 'sent_at', 'error')
+    search_fields = ('=control_id',)
+    actions = ('retry_selected',)
+
+    @action(description=_('Erneut senden'), permissions=('retry',))
+    def retry_selected(self, request, queryset):
+        count = queryset.exclude(status=OutboundMessage.Status.PENDING).update(
+            status=OutboundMessage.Status.PENDING, next_attempt_at=None, error='',
+        )
+        self.message_user(request, _('%(count)d Nachrichten werden erneut gesendet') % {'count': count})
+
+    def has_retry_permission(self, request):
+        # messages themselves are read-only, but whoever may change them may queue them again
+        return super().has_change_permission(request)
+
+    def has_add_permission(self, request):
+        # messages are queued by the outbound feed, see hl7.events
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
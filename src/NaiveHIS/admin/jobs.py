@@ -0,0 +1,42 @@
+from django.contrib.admin import action, display
+from django.utils.translation import gettext_lazy as _
+
+from ..services.jobs import cancel, requeue
+from .pagination import LargeTableAdminMixin
+
+
+class JobAdmin(LargeTableAdminMixin):
+    list_display = ('__str__', 'status', 'priority', 'progress_display', 'attempts', 'created_at', 'started_at',
+                    'finished_at')
+    list_filter = ('status', 'task')
+    list_select_related = ('created_by',)
+    readonly_fields = ('task', 'arguments', 'priority', 'status', 'run_after', 'attempts', 'max_attempts', 'worker',
+                       'heartbeat_at', 'cancel_requested', 'progress', 'total', 'message', 'result', 'error',
+                       'created_by', 'created_at', 'started_at', 'finished_at')
+    actions = ('cancel_selected', 'requeue_selected')
+
+    @display(description=_('Fortschritt'))
+    def progress_display(self, job):
+        progress = f'{job.progress} / {job.total}' if job.total else str(job.progress or '')
+        return f'{progress} {job.message}'.strip() or '-'
+
+    @action(description=_('Abbrechen'), permissions=('cancel',))
+    def cancel_selected(self, request, queryset):
+        count = cancel(queryset)
+        self.message_user(request, _('%(count)d Aufgaben abgebrochen') % {'count': count})
+
+    @action(description=_('Erneut einreihen'), permissions=('cancel',))
+    def requeue_selected(self, request, queryset):
+        count = requeue(queryset)
+        self.message_user(request, _('%(count)d Aufgaben erneut eingereiht') % {'count': count})
+
+    def has_cancel_permission(self, request):
+        # jobs themselves are read-only, but whoever may change them may stop or restart them
+        return super().has_change_permission(request)
+
+    def has_add_permission(self, request):
+        # jobs are queued by the parts of the system that need them, or with the enqueue_job command
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,13 +1,30 @@
 from django import forms
 from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
-from .common import PERSON_FIELDSETS, ADDRESS_FIELDSETS, PERSON_LIST_DISPLAY, ADDRESS_LIST_DISPLAY
+from .common import (
+    PERSON_FIELDSETS,
+    ADDRESS_FIELDSETS,
+    PERSON_LIST_DISPLAY,
+    ADDRESS_LIST_DISPLAY,
+    PERSON_LIST_FILTER,
+    AuditAdminMixin,
+    PatientSearchAdminMixin,
+    PersonAdminMixin,
+    ReferenceDataAdminMixin,
+)
+from .pagination import LargeTableAdminMixin
+from .. import cache
 from ..models.common import AddressRequiredMixin, PersonMixin
+from ..models.medical import Discipline
 from ..models.objects import Patient, Department, DepartmentQualifications, Room
+from ..services.archive import patient_cases
 
 
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(LargeTableAdminMixin, AuditAdminMixin, PatientSearchAdminMixin, PersonAdminMixin):
     fieldsets = (
         *PERSON_FIELDSETS,
         *ADDRESS_FIELDSETS,
@@ -16,6 +33,32 @@ class PatientAdmin(admin.ModelAdmin):
     add_fieldsets = fieldsets
 
     list_display = PERSON_LIST_DISPLAY + ADDRESS_LIST_DISPLAY
+    list_filter = PERSON_LIST_FILTER
+
+    patient_lookup = 'pk'
+    search_help_text = _('Sucht nach der Patienten-ID oder auch nach ähnlich geschriebenen oder klingenden Namen')
+
+    readonly_fields = ('cases',)
+
+    def get_fieldsets(self, request, obj=None):
+        fieldsets = super().get_fieldsets(request, obj)
+        if obj is None:
+            return fieldsets
+
+        return (*fieldsets, (_('Fälle'), {'fields': ('cases',)}))
+
+    @admin.display(description=_('Fälle'))
+    def cases(self, patient: Patient):
+        archive = reverse('admin:NaiveHIS_archivedrecord_changelist')
+        links = (
+            (f'{archive}?model={case._meta.label}&object_id={case.pk}', case.pk, case.created_at.date(),
+             _('(archiviert)'))
+            if getattr(case, 'is_archived', False) else
+            (reverse('admin:NaiveHIS_case_change', args=(case.pk,)), case.pk, case.created_at.date(), '')
+            for case in patient_cases(patient.pk)
+        )
+
+        return format_html_join(mark_safe('<br>'), '<a href="{}">Fall {} vom {}</a> {}', links) or '-'
 
 
 class RoomChangeForm(forms.ModelForm):
@@ -45,7 +88,7 @@ class RoomCreationForm(forms.ModelForm):
         return room
 
 
-class RoomAdmin(admin.ModelAdmin):
+class RoomAdmin(ReferenceDataAdminMixin):
     form = RoomChangeForm
     add_form = RoomCreationForm
 
@@ -60,3 +103,17 @@ class RoomAdmin(admin.ModelAdmin):
     class Meta:
         model = Room
         fields = '__all__'
+
+
+class DepartmentAdmin(ReferenceDataAdminMixin):
+    list_display = ('name', 'qualifications')
+
+    @admin.display(description=_('Benötigte Qualifikationen'))
+    def qualifications(self, department: Department):
+        needed = cache.department_qualifications().get(department.pk, ())
+        return ', '.join(sorted(str(Discipline(qualification).label) for qualification in needed)) or '-'
+
+
+class DepartmentQualificationsAdmin(ReferenceDataAdminMixin):
+    list_display = ('department', 'qualification')
+    list_filter = ('department', 'qualification')
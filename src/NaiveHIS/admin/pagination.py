@@ -0,0 +1,269 @@
+"""
+Changelist pagination for tables too big to count.
+
+Above a size threshold, totals are estimated or counted up to a bound and cached. Pages next to the current one are
+fetched by keyset on the ordering columns instead of scanning past all earlier rows with OFFSET: their links carry the
+ordering values of the last or first row of the current page, so any process can serve them. Jumps to distant pages
+still use OFFSET. NULLs are ordered first ascending and last descending on every database, so nullable ordering
+columns like the closing time of cases can be paged by keyset as well.
+"""
+import json
+import operator
+
+from datetime import date, time
+from functools import reduce
+from hashlib import sha1
+
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection, models
+from django.db.models import F, Max, Q
+from django.utils.functional import cached_property
+
+# query parameters with the ordering values of the row before or after the requested page
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+ROW_ESTIMATE_TIMEOUT = 60
+
+
+def estimate_rows(model: type[models.Model]) -> int:
+    """Rough number of rows in the table of `model`, without counting them."""
+    key = f'row-estimate:{model._meta.label}'
+    estimate = cache.get(key)
+
+    if estimate is None:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                               [model._meta.db_table])
+                estimate = cursor.fetchone()[0]
+        else:
+            # ids are handed out in ascending order, the highest one is a good enough guess and comes from the index
+            estimate = model._base_manager.aggregate(max=Max('pk'))['max'] or 0
+
+        cache.set(key, estimate, ROW_ESTIMATE_TIMEOUT)
+
+    return estimate
+
+
+class KeysetPaginator(Paginator):
+    exact_count_threshold: int = 100_000
+    cache_timeout: int = 300
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 exact_count_threshold: int | None = None, number: int = 1, after: str | None = None,
+                 before: str | None = None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+
+        if exact_count_threshold is not None:
+            self.exact_count_threshold = exact_count_threshold
+
+        # the requested page, and the boundary it's fetched by, see `boundary_params`
+        self.number = number
+        self.after = after
+        self.before = before
+        self._pages = {}
+
+    @cached_property
+    def _query_key(self) -> str:
+        return sha1(f'{self.object_list.query}|{self.per_page}'.encode()).hexdigest()
+
+    @cached_property
+    def is_large(self) -> bool:
+        return estimate_rows(self.object_list.model) > self.exact_count_threshold
+
+    @cached_property
+    def count(self) -> int:
+        if not self.is_large:
+            return super().count
+
+        key = f'changelist-count:{self._query_key}'
+        count = cache.get(key)
+
+        if count is None:
+            if not self.object_list.query.where:
+                count = estimate_rows(self.object_list.model)
+            else:
+                # count at most up to the threshold
+                count = self.object_list.order_by()[:self.exact_count_threshold].count()
+
+            cache.set(key, count, self.cache_timeout)
+
+        # the count is a bound or an estimate, the requested page and whether rows follow it are known for sure,
+        # which keeps pages beyond the bound reachable
+        rows, more = self._fetch(self.number)
+        return max(count, (self.number - 1) * self.per_page + len(rows) + more)
+
+    @cached_property
+    def _keyset_ordering(self) -> list[tuple[models.Field, bool]] | None:
+        """(field, descending) for every ordering column, or None if the ordering doesn't allow keyset paging."""
+        opts = self.object_list.model._meta
+        ordering = []
+
+        for item in self.object_list.query.order_by:
+            if not isinstance(item, str) or '__' in item or item == '?':
+                return None
+
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+
+            try:
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+
+            if not field.concrete:
+                return None
+
+            ordering.append((field, descending))
+
+        # a keyset needs a total ordering, which the changelist provides by appending the primary key
+        if not any(field.primary_key for field, _descending in ordering):
+            return None
+
+        return ordering
+
+    @cached_property
+    def _ordered(self) -> models.QuerySet:
+        if self._keyset_ordering is None:
+            return self.object_list
+
+        # databases disagree on where NULLs go by default
+        return self.object_list.order_by(*(
+            F(field.attname).desc(nulls_last=field.null or None) if descending
+            else F(field.attname).asc(nulls_first=field.null or None)
+            for field, descending in self._keyset_ordering
+        ))
+
+    def _beyond(self, boundary: list, reverse: bool = False) -> Q:
+        """The rows after `boundary` in the ordering, or with `reverse` the ones before it."""
+        # (a, b, c) > (x, y, z)  <=>  a > x or (a = x and b > y) or (a = x and b = y and c > z)
+        conditions = []
+        equal = Q()
+
+        for (field, descending), value in zip(self._keyset_ordering, boundary):
+            name = field.attname
+            # reversed, the NULLs change ends along with the direction
+            descending = descending != reverse
+
+            if value is None:
+                following = None if descending else Q(**{f'{name}__isnull': False})
+            else:
+                following = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+                if descending and field.null:
+                    following |= Q(**{f'{name}__isnull': True})
+
+            if following is not None:
+                conditions.append(equal & following)
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+        return reduce(operator.or_, conditions, Q(pk__in=[]))
+
+    def _encode(self, obj: models.Model) -> str:
+        values = [getattr(obj, field.attname) for field, _descending in self._keyset_ordering]
+        return json.dumps([value.isoformat() if isinstance(value, (date, time)) else value for value in values])
+
+    def _decode(self, encoded: str | None) -> list | None:
+        if not encoded or self._keyset_ordering is None:
+            return None
+
+        # a boundary from a link to another ordering, or tampered with, is ignored
+        try:
+            values = json.loads(encoded)
+            if not isinstance(values, list) or len(values) != len(self._keyset_ordering):
+                return None
+
+            return [None if value is None else field.to_python(value)
+                    for (field, _descending), value in zip(self._keyset_ordering, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _fetch(self, number: int) -> tuple[list, bool]:
+        """The rows of page `number`, and whether more rows follow."""
+        if number not in self._pages:
+            after = before = None
+            if number == self.number:
+                after, before = self._decode(self.after), self._decode(self.before)
+
+            if before is not None:
+                rows = list(self._ordered.reverse().filter(self._beyond(before, reverse=True))[:self.per_page])
+                # the page the boundary came from follows
+                self._pages[number] = rows[::-1], True
+            else:
+                if after is not None:
+                    query = self._ordered.filter(self._beyond(after))
+                else:
+                    query = self._ordered[(number - 1) * self.per_page:]
+
+                rows = list(query[:self.per_page + 1])
+                self._pages[number] = rows[:self.per_page], len(rows) > self.per_page
+
+        return self._pages[number]
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.is_large:
+            return super().page(number)
+
+        rows, _more = self._fetch(number)
+        return self._get_page(rows, number, self)
+
+    def boundary_params(self, rows: list[models.Model], number: int, current: int) -> dict[str, str]:
+        """Query parameters to fetch page `number` by keyset, if it's next to the `current` page of `rows`."""
+        if not self.is_large or self._keyset_ordering is None or not rows:
+            return {}
+
+        if number == current + 1:
+            return {AFTER_VAR: self._encode(rows[-1])}
+        if number == current - 1:
+            return {BEFORE_VAR: self._encode(rows[0])}
+
+        return {}
+
+
+class KeysetChangeList(ChangeList):
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for name in (AFTER_VAR, BEFORE_VAR):
+            lookup_params.pop(name, None)
+
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        new_params = dict(new_params or {})
+        # a boundary only belongs to the page it was made for
+        remove = [*(remove or ()), AFTER_VAR, BEFORE_VAR]
+
+        paginator = getattr(self, 'paginator', None)
+        if isinstance(paginator, KeysetPaginator) and new_params.get(PAGE_VAR) is not None:
+            new_params.update(paginator.boundary_params(list(self.result_list), int(new_params[PAGE_VAR]),
+                                                        self.page_num))
+
+        return super().get_query_string(new_params, remove)
+
+
+class LargeTableAdminMixin(ModelAdmin):
+    paginator = KeysetPaginator
+    exact_count_threshold: int = KeysetPaginator.exact_count_threshold
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            number = int(request.GET.get(PAGE_VAR, 1))
+        except ValueError:
+            number = 1
+
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page,
+                              exact_count_threshold=self.exact_count_threshold, number=number,
+                              after=request.GET.get(AFTER_VAR), before=request.GET.get(BEFORE_VAR))
+
+    @property
+    def show_full_result_count(self) -> bool:
+        # the unfiltered total is shown next to filtered results, only count it while it's cheap
+        return estimate_rows(self.model) <= self.exact_count_threshold
@@ -1,10 +1,27 @@
+from typing import Callable
+
 from django import forms
-from django.contrib import admin
 from django.contrib.admin import display
-from django.forms import ModelChoiceField
+from django.http import HttpRequest
 from django.utils.translation import gettext_lazy as _
 
-from .common import CLOSEABLE_FIELDSETS, CLOSEABLE_LIST_DISPLAY, TIMESTAMPED_LIST_DISPLAY
+from .common import (
+    CLOSEABLE_FIELDSETS,
+    CLOSEABLE_LIST_DISPLAY,
+    TIMESTAMPED_LIST_DISPLAY,
+    AuditAdminMixin,
+    AutocompleteAdminMixin,
+    CachedFormAdminMixin,
+    CachedModelChoiceField,
+    CaseVisibilityAdminMixin,
+    CloseableAdminMixin,
+    PatientSearchAdminMixin,
+    ReferenceDataAdminMixin,
+)
+from .attachments import AttachmentAdminMixin
+from .dicom import DicomStudyInline
+from .pagination import LargeTableAdminMixin
+from .. import cache
 from ..models.accounts import GeneralPersonnel
 from ..models.tasks import Case
 
@@ -38,31 +55,60 @@ CASE_LIST_DISPLAY = (
 )
 
 
-class CaseAdmin(admin.ModelAdmin):
+class CaseAdmin(LargeTableAdminMixin, AuditAdminMixin, CloseableAdminMixin, PatientSearchAdminMixin,
+                CaseVisibilityAdminMixin, AutocompleteAdminMixin, ReferenceDataAdminMixin, CachedFormAdminMixin):
     fieldsets = CASE_FIELDSETS + CLOSEABLE_FIELDSETS
     add_fieldsets = CASE_FIELDSETS + CLOSEABLE_FIELDSETS
 
     list_display = CASE_LIST_DISPLAY + CLOSEABLE_LIST_DISPLAY
 
+    case_lookup = ''
+
+    autocomplete_fields = ('patient', 'assigned_doctor')
+
+    def get_queryset(self, request):
+        # Case.__str__ shows the patient, also in autocomplete results of orders and reports
+        return super().get_queryset(request).select_related('patient', 'assigned_department', 'assigned_doctor')
 
-def PrefilledFieldAdminMixin(field_name, field_value, eval_field_value=False, disabled=True):
-    class Admin(admin.ModelAdmin):
-        def get_form(self, request, obj=None, **kwargs):
-            if eval_field_value:
-                value = eval(field_value)
-            else:
-                value = field_value
 
-            form = super().get_form(request, obj, **kwargs)
+def PrefilledFieldAdminMixin(field_name: str, field_value: Callable[[HttpRequest], object], disabled: bool = True):
+    """
+    Prefills `field_name` of new objects with `field_value(request)`, e.g. the current user.
+    The value is applied per request and not baked into the cached form class.
+    """
 
-            form.base_fields[field_name].initial = value
-            form.base_fields[field_name].disabled = disabled
+    class Admin(CachedFormAdminMixin):
+        def prepare_form(self, form, request, obj=None):
+            form = super().prepare_form(form, request, obj)
+
+            if disabled and field_name in form.base_fields:
+                # a disabled field isn't submitted, the value is set in save_model instead
+                form.base_fields[field_name].disabled = True
+                form.base_fields[field_name].required = False
 
             return form
 
+        def get_changeform_initial_data(self, request):
+            initial = super().get_changeform_initial_data(request)
+
+            if disabled or field_name not in initial:
+                initial[field_name] = field_value(request)
+
+            return initial
+
+        def save_model(self, request, obj, form, change):
+            if not change and disabled:
+                setattr(obj, obj._meta.get_field(field_name).attname, field_value(request))
+
+            super().save_model(request, obj, form, change)
+
     return Admin
 
 
+def _current_user(request: HttpRequest):
+    return request.user.pk
+
+
 ORDER_LIST_DISPLAY = (
     'assigned_to',
     'issued_by',
@@ -85,8 +131,15 @@ def generate_order_fieldsets(*fields: tuple[str, ...]):
     )
 
 
-class OrderAdmin(PrefilledFieldAdminMixin('issued_by', 'request.user.id', eval_field_value=True)):
-    ...
+class OrderAdmin(LargeTableAdminMixin, CloseableAdminMixin, PatientSearchAdminMixin, CaseVisibilityAdminMixin,
+                 AutocompleteAdminMixin, ReferenceDataAdminMixin, PrefilledFieldAdminMixin('issued_by', _current_user)):
+    patient_lookup = 'case__patient'
+    autocomplete_fields = ('case', 'issued_by', 'assigned_to')
+    # orders and reports have no default ordering, newest first keeps autocomplete results stable
+    ordering = ('-id',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('issued_by', 'assigned_to', 'case__patient')
 
 
 _transport_field_sets = (
@@ -106,14 +159,19 @@ class TransportOrderAdmin(OrderAdmin):
 
     list_display = TRANSPORTORDER_LIST_DISPLAY + ORDER_LIST_DISPLAY + CLOSEABLE_LIST_DISPLAY
 
-    def get_form(self, request, obj=None, **kwargs):
-        form = super().get_form(request, obj, **kwargs)
+    # assigned_to is limited to the few transport personnel, see get_form
+    autocomplete_fields = ('case', 'issued_by', 'supervised_by')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('from_room', 'to_room', 'supervised_by')
 
-        transport_personnel = GeneralPersonnel.objects.filter(function='transport')
-        form.base_fields['assigned_to'] = ModelChoiceField(queryset=transport_personnel,
-                                                           required=False, label=_('Auftragnehmer'))
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'assigned_to':
+            transport_personnel = GeneralPersonnel.objects.filter(function='transport')
+            return CachedModelChoiceField(queryset=transport_personnel, objects=cache.transport_personnel,
+                                          required=False, label=_('Auftragnehmer'))
 
-        return form
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 
 class TransferOrderAdmin(OrderAdmin):
@@ -129,6 +187,8 @@ class TreatmentOrderAdmin(OrderAdmin):
 
     list_display = ('doctor',) + ORDER_LIST_DISPLAY + CLOSEABLE_LIST_DISPLAY
 
+    autocomplete_fields = OrderAdmin.autocomplete_fields + ('doctor',)
+
 
 class ExaminationOrderAdmin(OrderAdmin):
     fieldsets = generate_order_fieldsets(('description',))
@@ -136,6 +196,8 @@ class ExaminationOrderAdmin(OrderAdmin):
 
     list_display = ORDER_LIST_DISPLAY + CLOSEABLE_LIST_DISPLAY
 
+    inlines = (DicomStudyInline,)
+
 
 def generate_report_fieldsets(*fields: tuple[str, ...]):
     return (
@@ -153,43 +215,76 @@ REPORT_FIELDSETS = generate_report_fieldsets()
 REPORT_LIST_DISPLAY = ('case', 'written_by')
 
 
-class ReportAdmin(PrefilledFieldAdminMixin('written_by', 'request.user.id', eval_field_value=True)):
+class ReportAdmin(LargeTableAdminMixin, AuditAdminMixin, PatientSearchAdminMixin, CaseVisibilityAdminMixin,
+                  AutocompleteAdminMixin, PrefilledFieldAdminMixin('written_by', _current_user)):
     fieldsets = REPORT_FIELDSETS
     add_fieldsets = REPORT_FIELDSETS
 
     list_display = REPORT_LIST_DISPLAY + TIMESTAMPED_LIST_DISPLAY
 
+    patient_lookup = 'case__patient'
+    autocomplete_fields = ('case', 'written_by')
+    ordering = ('-id',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('written_by', 'case__patient')
+
 
 class AnamnesisReportAdmin(ReportAdmin):
-    fieldsets = generate_report_fieldsets(('text',))
-    add_fieldsets = generate_report_fieldsets(('text',))
+    fieldsets = generate_report_fieldsets(('treatment_order',), ('text',))
+    add_fieldsets = generate_report_fieldsets(('treatment_order',), ('text',))
 
     list_display = ReportAdmin.list_display
 
+    autocomplete_fields = ReportAdmin.autocomplete_fields + ('treatment_order',)
+
 
 class DiagnosisReportAdmin(ReportAdmin):
-    fieldsets = generate_report_fieldsets(('text',))
-    add_fieldsets = generate_report_fieldsets(('text',))
+    fieldsets = generate_report_fieldsets(('treatment_order',), ('text',), ('tumor', 'nodes', 'metastases'))
+    add_fieldsets = generate_report_fieldsets(('treatment_order',), ('text',), ('tumor', 'nodes', 'metastases'))
 
-    list_display = ReportAdmin.list_display
+    list_display = ReportAdmin.list_display + ('staging',)
+    list_filter = ('metastases', 'tumor', 'nodes')
+
+    autocomplete_fields = ReportAdmin.autocomplete_fields + ('treatment_order',)
 
+    @display(description=_('TNM'), ordering='tumor')
+    def staging(self, report):
+        return report.staging or '-'
 
-class ExaminationReportAdmin(ReportAdmin):
+
+class ExaminationReportAdmin(AttachmentAdminMixin, ReportAdmin):
     fieldsets = generate_report_fieldsets(('examination_order', 'text',))
     add_fieldsets = generate_report_fieldsets(('examination_order', 'text',))
 
     list_display = ('examination_order',) + ReportAdmin.list_display
 
+    autocomplete_fields = ReportAdmin.autocomplete_fields + ('examination_order',)
+
 
 class TherapyReportAdmin(ReportAdmin):
-    fieldsets = generate_report_fieldsets(('text',))
-    add_fieldsets = generate_report_fieldsets(('text',))
+    fieldsets = generate_report_fieldsets(('treatment_order',), ('text',))
+    add_fieldsets = generate_report_fieldsets(('treatment_order',), ('text',))
 
     list_display = ReportAdmin.list_display
 
+    autocomplete_fields = ReportAdmin.autocomplete_fields + ('treatment_order',)
+
 
 class FindingsReportAdmin(ReportAdmin):
     fieldsets = generate_report_fieldsets(('diagnosis_report', 'therapy_report'), ('text',))
     add_fieldsets = generate_report_fieldsets(('diagnosis_report', 'therapy_report'), ('text',))
 
     list_display = ReportAdmin.list_display
+
+    autocomplete_fields = ReportAdmin.autocomplete_fields + ('diagnosis_report', 'therapy_report')
+
+
+class DischargeSummaryAdmin(LargeTableAdminMixin):
+    list_display = ('case', 'discharged_at', 'room', 'closed_orders')
+    list_select_related = ('case__patient', 'room')
+    readonly_fields = ('case', 'discharged_at', 'room', 'closed_orders')
+
+    def has_add_permission(self, request):
+        # summaries are written when cases are closed
+        return False
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class NaiveHisConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "NaiveHIS"
+
+    def ready(self):
+        # connect signal receivers
+        from . import signals
+        # register the tasks of the job queue
+        from . import jobs
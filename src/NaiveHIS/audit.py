@@ -0,0 +1,148 @@
+"""
+Audit log of who viewed or changed patient data.
+
+Events are buffered in memory and written by a background thread with one bulk insert per batch, so recording an
+access doesn't add a write to the request. The buffer is flushed when it is full, after a short interval and when the
+process exits.
+"""
+import atexit
+import logging
+import os
+
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+
+from django.db import DatabaseError, connection, models, transaction
+
+from .models.audit import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+
+def patient_of(obj: models.Model) -> int | None:
+    """Id of the patient a patient, case, order or report belongs to."""
+    from .models.objects import Patient
+
+    if isinstance(obj, Patient):
+        return obj.pk
+
+    if hasattr(obj, 'patient_id'):
+        return obj.patient_id
+
+    if hasattr(obj, 'case_id'):
+        # the admins of orders and reports select the case along
+        return obj.case.patient_id
+
+    return None
+
+
+class AuditLog:
+    batch_size: int = 500
+    flush_interval: float = 2.0
+    # if the database is unavailable for long, the oldest events are dropped instead of growing without bounds
+    max_buffered: int = 50_000
+
+    def __init__(self):
+        self._buffer: list[AuditEvent] = []
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._wakeup = Event()
+        self._thread: Thread | None = None
+        self._pid: int | None = None
+        self._suspended = 0
+
+    def record(self, action: str, obj: models.Model, user=None, message: str = '', on_commit: bool = False):
+        """
+        Buffer an event about `obj`. With `on_commit` the event is only buffered once the current transaction commits,
+        it's captured right away all the same, as deleted objects lose their id.
+        """
+        event = AuditEvent(
+            user_id=getattr(user, 'pk', None),
+            action=action,
+            model=obj._meta.label,
+            object_id=str(obj.pk),
+            object_repr=str(obj)[:200],
+            patient_id=patient_of(obj),
+            message=message,
+        )
+
+        if on_commit:
+            transaction.on_commit(lambda: self._append(event))
+        else:
+            self._append(event)
+
+    @contextmanager
+    def suspended(self):
+        """
+        Drop the events recorded meanwhile, e.g. by benchmarks whose changes are rolled back. The writer commits through
+        its own connection and would keep events about objects that never existed.
+        """
+        with self._lock:
+            self._suspended += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._suspended -= 1
+
+    def _append(self, event: AuditEvent):
+        with self._lock:
+            if self._suspended:
+                return
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.batch_size
+
+        self._ensure_writer()
+        if full:
+            self._wakeup.set()
+
+    def record_access(self, objects, user=None):
+        """For reads outside of the admin, e.g. API views."""
+        for obj in objects:
+            self.record(AuditEvent.Action.VIEW, obj, user)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+
+            if not events:
+                return
+
+            try:
+                AuditEvent.objects.bulk_create(events, batch_size=self.batch_size)
+            except DatabaseError:
+                logger.exception('Writing %d audit events failed, retrying with the next batch', len(events))
+
+                with self._lock:
+                    self._buffer[:0] = events
+                    if len(self._buffer) > self.max_buffered:
+                        dropped = len(self._buffer) - self.max_buffered
+                        del self._buffer[:dropped]
+                        logger.error('Dropped %d audit events', dropped)
+
+    def _ensure_writer(self):
+        # threads don't survive a fork, worker processes start their own writer
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            self.flush()
+            # the writer keeps its own connection, don't hold it open while idle
+            connection.close()
+
+
+audit_log = AuditLog()
+
+# the writer is a daemon thread and won't get to write what's left, so the exiting thread does
+atexit.register(audit_log.flush)
@@ -0,0 +1,93 @@
+"""
+Micro-benchmarks of the model and admin hot paths.
+
+Benchmarks are registered with `benchmark`, see `suite`, and run against generated datasets of several sizes, see
+`datasets`. Every benchmark reports the median time of a call over a number of rounds and the queries a call makes.
+Results are stored as a JSON baseline, later runs are compared against it: a benchmark regresses if it got slower by
+more than a threshold, or makes more queries than it did. Run with the `benchmark` command.
+"""
+from statistics import median
+from time import perf_counter
+from typing import Callable, NamedTuple
+
+from django.db import connection
+
+from .datasets import Dataset
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # prepares a run against a dataset, returns the function that is measured
+    setup: Callable[[Dataset], Callable[[], object]]
+    # calls per round, enough for a round to take a few milliseconds
+    number: int
+
+
+class Result(NamedTuple):
+    seconds: float
+    queries: int
+
+
+class Regression(NamedTuple):
+    name: str
+    size: int
+    baseline: Result
+    result: Result
+
+
+# registered with `benchmark`, see NaiveHIS.benchmarks.suite
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, number: int = 10):
+    """Register `setup` as the benchmark `name`."""
+
+    def register(setup: Callable[[Dataset], Callable[[], object]]):
+        BENCHMARKS[name] = Benchmark(name, setup, number)
+        return setup
+
+    return register
+
+
+def measure(benchmark: Benchmark, dataset: Dataset, rounds: int = 5) -> Result:
+    """Median time and number of queries of a call to the benchmark's function."""
+    function = benchmark.setup(dataset)
+    # the first call fills caches, e.g. compiled templates, cached form classes and reference data
+    function()
+
+    # counted apart from the timed rounds. Not with CaptureQueriesContext, requests of the test client reset the log
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        function()
+
+    times = []
+    for _round in range(rounds):
+        start = perf_counter()
+        for _call in range(benchmark.number):
+            function()
+        times.append((perf_counter() - start) / benchmark.number)
+
+    return Result(median(times), len(queries))
+
+
+def regressions(results: dict[str, dict[int, Result]], baseline: dict[str, dict[int, Result]],
+                threshold: float) -> list[Regression]:
+    """The results slower than their baseline by more than `threshold`, e.g. 0.25, or with more queries."""
+    found = []
+
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+            before = baseline.get(name, {}).get(size)
+            if before is not None and (result.seconds > before.seconds * (1 + threshold)
+                                       or result.queries > before.queries):
+                found.append(Regression(name, size, before, result))
+
+    return found
+
+
+def to_json(results: dict[str, dict[int, Result]]) -> dict:
+    return {name: {str(size): result._asdict() for size, result in sizes.items()} for name, sizes in results.items()}
+
+
+def from_json(data: dict) -> dict[str, dict[int, Result]]:
+    return {name: {int(size): Result(**result) for size, result in sizes.items()} for name, sizes in data.items()}
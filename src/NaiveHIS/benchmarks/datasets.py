@@ -0,0 +1,85 @@
+"""
+Datasets the benchmarks run against. A dataset of size n has n patients with a case each, a closed and an open
+transport per case, an examination order per case, and a doctor for every 20 cases. All doctors are named alike, so
+their usernames are numbered, as they are in a hospital with many people of the same name.
+"""
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from django.utils import timezone
+
+from ..models.accounts import Doctor, HISAccount
+from ..models.objects import Department, Patient, Room
+from ..models.tasks import Case, ExaminationOrder, TransportOrder
+from ..services.fixtures import load_fixtures
+from ..services.search import index_patients
+
+DEPARTMENTS = 5
+ROOMS = 20
+
+
+class Dataset(NamedTuple):
+    size: int
+    cases: list[int]
+    doctor: int
+    superuser: int
+
+
+def generate(size: int) -> Dataset:
+    """Generate a dataset of `size` cases, meant to be rolled back when the benchmarks are done."""
+    now = timezone.now()
+
+    departments = Department.objects.bulk_create([
+        Department(name=f'Benchmark {number}') for number in range(DEPARTMENTS)
+    ])
+    rooms = Room.objects.bulk_create([
+        Room(name=f'Benchmark {number}', department=departments[number % DEPARTMENTS], capacity=size, usage=0)
+        for number in range(ROOMS)
+    ])
+
+    doctors = load_fixtures({Doctor: {
+        f'doctor{number}': dict(
+            username=f'bmark{number or ""}', first_name='Bench', last_name='Mark', gender='m',
+            date_of_birth=date(1970, 1, 1), city='Berlin', street='Teststraße', street_number=number,
+            zip_code='10115', department=departments[number % DEPARTMENTS].pk, rank=Doctor.Rank.SPECIALIST_PHYSICIAN,
+        )
+        for number in range(max(size // 20, DEPARTMENTS))
+    }})
+    doctors = list(doctors.values())
+    superuser = HISAccount.objects.create_superuser(username='benchmark-admin')
+
+    patients = Patient.objects.bulk_create([
+        Patient(first_name='Bench', last_name=f'Mark {number}', date_of_birth=date(1940, 1, 1) + timedelta(number),
+                city='Berlin', street='Teststraße', street_number=number, zip_code='10115')
+        for number in range(size)
+    ])
+    index_patients(patients)
+
+    cases = Case.objects.bulk_create([
+        Case(patient=patient, assigned_department=departments[number % DEPARTMENTS],
+             assigned_doctor=doctors[number % len(doctors)])
+        for number, patient in enumerate(patients)
+    ])
+
+    TransportOrder.objects.bulk_create([
+        TransportOrder(issued_by=doctors[0], case=case, from_room=rooms[0], to_room=rooms[number % ROOMS],
+                       requested_arrival=now - timedelta(hours=2), supervised=False, closed_at=now - timedelta(hours=1))
+        for number, case in enumerate(cases)
+    ] + [
+        TransportOrder(issued_by=doctors[0], case=case, from_room=rooms[number % ROOMS],
+                       to_room=rooms[(number + 1) % ROOMS], requested_arrival=now + timedelta(hours=1),
+                       supervised=False)
+        for number, case in enumerate(cases)
+    ])
+    # bulk created transports don't occupy their rooms on their own
+    for number, room in enumerate(rooms):
+        room.usage = len(range(number, size, ROOMS))
+    Room.objects.bulk_update(rooms, ['usage'])
+
+    ExaminationOrder.objects.bulk_create([
+        ExaminationOrder(issued_by=doctors[0], case=case, assigned_to=doctors[number % len(doctors)],
+                         description='Benchmark')
+        for number, case in enumerate(cases)
+    ])
+
+    return Dataset(size, [case.pk for case in cases], doctors[1].pk, superuser.pk)
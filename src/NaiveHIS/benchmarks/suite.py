@@ -0,0 +1,84 @@
+from django.test import Client
+from django.urls import reverse
+
+from . import benchmark
+from .datasets import Dataset
+from ..models.accounts import HISAccount
+from ..models.tasks import Case
+
+# a sample of cases, like the ones on a changelist page
+SAMPLE = 25
+
+
+def _page(user: int, url: str):
+    client = Client()
+    client.force_login(HISAccount.objects.get(pk=user))
+
+    def get():
+        response = client.get(url)
+        # a redirect to the login or an error page would be measured instead
+        if response.status_code != 200:
+            raise RuntimeError(f'GET {url} returned {response.status_code}')
+
+    return get
+
+
+@benchmark('case.last_room')
+def last_room(dataset: Dataset):
+    pks = dataset.cases[-SAMPLE:]
+
+    def run():
+        # fresh instances, as a request would load them
+        return [case.last_room for case in Case.objects.filter(pk__in=pks)]
+
+    return run
+
+
+@benchmark('case.next_room')
+def next_room(dataset: Dataset):
+    pks = dataset.cases[-SAMPLE:]
+
+    def run():
+        return [case.next_room for case in Case.objects.filter(pk__in=pks)]
+
+    return run
+
+
+@benchmark('account.has_perm', number=50)
+def has_perm(dataset: Dataset):
+    perms = ('NaiveHIS.view_case', 'NaiveHIS.change_case', 'NaiveHIS.add_examinationreport', 'NaiveHIS.view_room',
+             'NaiveHIS.delete_patient')
+
+    def run():
+        # the account is loaded once per request, and asked for its permissions many times by the admin
+        user = HISAccount.objects.get(pk=dataset.doctor)
+        return [user.has_perm(perm) for perm in perms * 10]
+
+    return run
+
+
+@benchmark('account.get_valid_username')
+def get_valid_username(dataset: Dataset):
+    # every doctor of the dataset is a Bench Mark, the next one gets the next free number
+    return lambda: HISAccount.objects.get_valid_username('Bench', 'Mark')
+
+
+@benchmark('admin.case_changelist', number=3)
+def case_changelist(dataset: Dataset):
+    return _page(dataset.superuser, reverse('admin:NaiveHIS_case_changelist'))
+
+
+@benchmark('admin.case_changelist_restricted', number=3)
+def case_changelist_restricted(dataset: Dataset):
+    # a doctor sees the cases of their department, see services.visibility
+    return _page(dataset.doctor, reverse('admin:NaiveHIS_case_changelist'))
+
+
+@benchmark('admin.case_change_form', number=3)
+def case_change_form(dataset: Dataset):
+    return _page(dataset.superuser, reverse('admin:NaiveHIS_case_change', args=(dataset.cases[-1],)))
+
+
+@benchmark('admin.examination_report_add_form', number=3)
+def examination_report_add_form(dataset: Dataset):
+    return _page(dataset.doctor, reverse('admin:NaiveHIS_examinationreport_add'))
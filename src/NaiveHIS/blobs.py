@@ -0,0 +1,135 @@
+"""
+Content-addressed file store.
+
+Files are stored once under their SHA-256, in `BLOB_STORE_ROOT/ab/cd/abcd...`. Writes go to a temporary file first,
+are hashed while they are written and moved into place in one step, so a blob is either complete or not there, and
+storing the same content twice leaves one file. Blobs are never changed after they were written.
+"""
+import hashlib
+import mmap
+import os
+
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Iterable, Iterator
+
+from django.conf import settings
+
+CHUNK_SIZE = 1 << 20
+
+
+class BlobWriter:
+    """Accepts the content of a blob chunk by chunk, see `BlobStore.writer`."""
+
+    def __init__(self, store: 'BlobStore'):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = NamedTemporaryFile(dir=store.temporary_directory, prefix='upload-', delete=False)
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def digest(self) -> str:
+        """Digest of the content written so far."""
+        return self._hash.hexdigest()
+
+    def commit(self) -> str:
+        """Move the content into the store and return its digest."""
+        digest = self.digest
+        path = self.store.path(digest)
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        if path.exists():
+            # deduplicated, the content is there already
+            os.unlink(self._file.name)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(self._file.name, 0o444)
+            os.replace(self._file.name, path)
+
+        return digest
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._file.name):
+            os.unlink(self._file.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+
+
+class BlobStore:
+    def __init__(self, root: str | os.PathLike | None = None):
+        self._root = root
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or settings.BLOB_STORE_ROOT)
+
+    @property
+    def temporary_directory(self) -> Path:
+        # on the same file system as the blobs, so moving a finished upload into place is atomic
+        directory = self.root / 'tmp'
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def path(self, digest: str) -> Path:
+        if len(digest) != 64 or not all(char in '0123456789abcdef' for char in digest):
+            raise ValueError(f'Invalid digest {digest!r}')
+
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def store(self, chunks: Iterable[bytes]) -> tuple[str, int]:
+        """Store the content from `chunks` and return its digest and size."""
+        with self.writer() as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+            return writer.commit(), writer.size
+
+    def open(self, digest: str):
+        return open(self.path(digest), 'rb')
+
+    def read_range(self, digest: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Bytes `start` to `end` (exclusive) of a blob, read chunk by chunk from a memory map."""
+        with self.open(digest) as file:
+            if end <= start:
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(start, end, chunk_size):
+                    yield mapped[offset:min(offset + chunk_size, end)]
+
+    def verify(self, digest: str) -> bool:
+        """Whether the blob's content still matches its digest."""
+        with self.open(digest) as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return digest == hashlib.sha256().hexdigest()
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return hashlib.sha256(mapped).hexdigest() == digest
+
+    def delete(self, digest: str):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+
+blob_store = BlobStore()
@@ -0,0 +1,161 @@
+"""
+Versioned cache for reference data that changes rarely, like departments and rooms.
+
+Every namespace has a version token in the shared ``reference`` cache. Entries in the per-process LRU remember the
+token they were loaded under, and are reloaded once any process bumps the token of their namespace. Tokens are
+remembered for `token_ttl` seconds, so other processes see a bump that late at most.
+Cached model instances are shared between requests, so they must be treated as read-only.
+"""
+import time
+
+from collections import OrderedDict
+from threading import RLock, local
+from typing import Any, Callable, Hashable
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+
+REFERENCE_CACHE_ALIAS = 'reference'
+
+DEPARTMENTS = 'departments'
+ROOMS = 'rooms'
+DEPARTMENT_QUALIFICATIONS = 'department_qualifications'
+TRANSPORT_PERSONNEL = 'transport_personnel'
+
+
+class ReferenceDataCache:
+    def __init__(self, maxsize: int = 128, token_ttl: float = 1.0):
+        self.maxsize = maxsize
+        self.token_ttl = token_ttl
+        self._entries: OrderedDict[tuple[str, Hashable], tuple[str, Any]] = OrderedDict()
+        self._tokens: dict[str, tuple[str, float]] = {}
+        self._lock = RLock()
+        # namespaces written by the transaction open in this thread
+        self._local = local()
+
+    @property
+    def shared(self):
+        return caches[REFERENCE_CACHE_ALIAS]
+
+    @staticmethod
+    def _token_key(namespace: str) -> str:
+        return f'reference-token:{namespace}'
+
+    def token(self, namespace: str) -> str:
+        with self._lock:
+            token, expires = self._tokens.get(namespace, (None, 0.0))
+        if time.monotonic() < expires:
+            return token
+
+        key = self._token_key(namespace)
+        token = self.shared.get(key)
+
+        if token is None:
+            # tokens are random instead of counters, so an evicted token can never be mistaken for an old one
+            # add() only sets missing keys, so concurrent first calls agree on the same token
+            self.shared.add(key, uuid4().hex, timeout=None)
+            token = self.shared.get(key)
+
+        self._remember(namespace, token)
+        return token
+
+    def _remember(self, namespace: str, token: str):
+        with self._lock:
+            self._tokens[namespace] = (token, time.monotonic() + self.token_ttl)
+
+    def bump(self, namespace: str):
+        token = uuid4().hex
+        self.shared.set(self._token_key(namespace), token, timeout=None)
+        # seen by this process right away
+        self._remember(namespace, token)
+
+    def _pending(self) -> set[str]:
+        atomic_blocks = transaction.get_connection().atomic_blocks
+        outermost = atomic_blocks[0] if atomic_blocks else None
+
+        if outermost is None or getattr(self._local, 'outermost', None) is not outermost:
+            # the transaction the writes were made in is over, committed or rolled back
+            self._local.outermost, self._local.pending = outermost, set()
+
+        return self._local.pending
+
+    def bump_on_commit(self, namespace: str):
+        # bump right away, so the writing process doesn't serve its own stale data,
+        # and again after the commit, so other processes can't cache the uncommitted state under the new token
+        self.bump(namespace)
+        if transaction.get_connection().in_atomic_block:
+            self._pending().add(namespace)
+        transaction.on_commit(lambda: self.bump(namespace))
+
+    def get(self, namespace: str, loader: Callable[[], Any], key: Hashable = None) -> Any:
+        if namespace in self._pending():
+            # not cached while the write may still be rolled back, nor read from entries that can't contain it
+            return loader()
+
+        token = self.token(namespace)
+        entry_key = (namespace, key)
+
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(entry_key)
+                return entry[1]
+
+        # if the token is bumped while loading, the entry is stored under the old token and reloaded on next access
+        value = loader()
+
+        with self._lock:
+            self._entries[entry_key] = (token, value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+
+reference_cache = ReferenceDataCache()
+
+
+def departments() -> list['Department']:
+    from .models.objects import Department
+    return reference_cache.get(DEPARTMENTS, lambda: list(Department.objects.all()))
+
+
+def rooms() -> list['Room']:
+    from .models.objects import Room
+    return reference_cache.get(ROOMS, lambda: list(Room.objects.select_related('department')))
+
+
+def department_qualifications() -> dict[int, list[str]]:
+    """Mapping of department ids to the disciplines they need."""
+    from .models.objects import DepartmentQualifications
+
+    def load():
+        qualifications = {}
+        for department_id, qualification in DepartmentQualifications.objects.values_list('department_id',
+                                                                                         'qualification'):
+            qualifications.setdefault(department_id, []).append(qualification)
+        return qualifications
+
+    return reference_cache.get(DEPARTMENT_QUALIFICATIONS, load)
+
+
+def transport_personnel() -> list['GeneralPersonnel']:
+    from .models.accounts import GeneralPersonnel
+    return reference_cache.get(TRANSPORT_PERSONNEL,
+                               lambda: list(GeneralPersonnel.objects.filter(function='transport')))
+
+
+# which namespaces have to be invalidated when a model changes
+INVALIDATED_BY = {
+    'Department': (DEPARTMENTS, ROOMS),
+    'Room': (ROOMS,),
+    'DepartmentQualifications': (DEPARTMENT_QUALIFICATIONS,),
+    'GeneralPersonnel': (TRANSPORT_PERSONNEL,),
+}
@@ -0,0 +1 @@
+"""FHIR R4 bulk export of patients, cases, staff, rooms, orders and reports."""
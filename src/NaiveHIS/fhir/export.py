@@ -0,0 +1,146 @@
+"""
+FHIR bulk data export.
+
+The output follows the bulk data `$export` operation: NDJSON files per resource type and a manifest listing them.
+Every source table is split into primary key ranges, which worker processes export independently. Each range is
+streamed to a file of its own in chunks, so memory stays bounded and the export scales with the number of processes.
+"""
+import json
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+import django
+
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from ..utils import Progress
+from .resources import RESOURCES
+
+ITERATOR_CHUNK_SIZE = 2000
+
+
+class ExportTask(NamedTuple):
+    resource_type: str
+    source: int
+    first_pk: int
+    last_pk: int
+    since: datetime | None
+    path: str
+
+
+def _queryset(resource_type: str, source: int, since: datetime | None):
+    source = RESOURCES[resource_type][source]
+    queryset = source.queryset()
+    if since is not None:
+        queryset = queryset.filter(**{f'{source.updated_field}__gt': since})
+
+    return queryset
+
+
+def _tasks(resource_types: Iterable[str], since: datetime | None, range_size: int, directory: Path) -> list[ExportTask]:
+    tasks = []
+
+    for resource_type in resource_types:
+        part = 0
+        for source in range(len(RESOURCES[resource_type])):
+            bounds = _queryset(resource_type, source, since).aggregate(first=Min('pk'), last=Max('pk'))
+            if bounds['first'] is None:
+                continue
+
+            for first_pk in range(bounds['first'], bounds['last'] + 1, range_size):
+                part += 1
+                tasks.append(ExportTask(resource_type, source, first_pk, min(first_pk + range_size, bounds['last'] + 1),
+                                        since, str(directory / f'{resource_type}.{part:04}.ndjson')))
+
+    return tasks
+
+
+def _init_worker():
+    # a no-op if the worker was forked from a process that is set up already
+    django.setup()
+
+
+def export_range(task: ExportTask) -> int:
+    """Write the resources of one primary key range to its file and return their number."""
+    source = RESOURCES[task.resource_type][task.source]
+    queryset = (_queryset(task.resource_type, task.source, task.since)
+                .filter(pk__gte=task.first_pk, pk__lt=task.last_pk)
+                .order_by('pk'))
+
+    count = 0
+    with open(task.path, 'w', encoding='utf-8') as file:
+        for obj in source.objects(queryset, ITERATOR_CHUNK_SIZE):
+            file.write(json.dumps(source.serialize(obj), ensure_ascii=False, separators=(',', ':')))
+            file.write('\n')
+            count += 1
+
+    if not count:
+        os.remove(task.path)
+
+    return count
+
+
+def bulk_export(directory: str | os.PathLike, resource_types: Iterable[str] | None = None,
+                since: datetime | None = None, workers: int | None = None, range_size: int = 50_000,
+                progress: Progress | None = None) -> dict:
+    """
+    Export `resource_types` (all by default) into `directory` and return the manifest, which is written there as well.
+    With `since`, only resources changed after it are exported. The manifest's `transactionTime` is the `since` for
+    the next incremental export, changes made while an export runs may show up in both.
+    `progress` is called whenever a range is exported.
+    """
+    resource_types = list(resource_types or RESOURCES)
+    unknown = set(resource_types) - set(RESOURCES)
+    if unknown:
+        raise ValueError(f'Unsupported resource types: {", ".join(sorted(unknown))}')
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    transaction_time = timezone.now()
+    tasks = _tasks(resource_types, since, range_size, directory)
+    workers = workers or os.cpu_count() or 1
+
+    counts = []
+
+    def exported(count: int):
+        counts.append(count)
+        if progress is not None:
+            progress(len(counts), len(tasks), f'{sum(counts)} Ressourcen exportiert')
+
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            exported(export_range(task))
+    else:
+        # connections must not be shared with the workers
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker) as executor:
+            # results come in the order of the tasks
+            for count in executor.map(export_range, tasks):
+                exported(count)
+
+    parameters = [f'_type={",".join(resource_types)}']
+    if since is not None:
+        parameters.append(f'_since={since.isoformat()}')
+
+    manifest = {
+        'transactionTime': transaction_time.isoformat(),
+        'request': f'$export?{"&".join(parameters)}',
+        'requiresAccessToken': False,
+        'output': [
+            {'type': task.resource_type, 'url': Path(task.path).name, 'count': count}
+            for task, count in zip(tasks, counts) if count
+        ],
+        'error': [],
+    }
+
+    with open(directory / 'manifest.json', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+    return manifest
@@ -0,0 +1,250 @@
+"""
+FHIR R4 representations of the HIS models.
+
+Every resource type is exported from one or more sources. A source knows its model, what to load along with it and
+how to turn one row into a resource, so exporting a chunk of rows takes a fixed number of queries. Archived cases,
+orders and reports are exported from their records in the archive, as changed when they were archived.
+"""
+from datetime import date, datetime
+from itertools import islice
+from typing import Callable, Iterator, NamedTuple
+
+from django.db import models
+
+from ..models.accounts import Doctor
+from ..models.archive import ArchivedRecord
+from ..models.objects import Patient, Room
+from ..models.tasks import (
+    Case,
+    TransportOrder,
+    TransferOrder,
+    TreatmentOrder,
+    ExaminationOrder,
+    AnamnesisReport,
+    DiagnosisReport,
+    ExaminationReport,
+    TherapyReport,
+    FindingsReport,
+)
+from ..services.archive import instances
+
+SYSTEM = 'urn:naivehis'
+
+GENDERS = {'m': 'male', 'w': 'female', 'd': 'other'}
+
+_ENCOUNTER_CLASS = {
+    'system': 'http://terminology.hl7.org/CodeSystem/v3-ActCode',
+    'code': 'IMP',
+    'display': 'inpatient encounter',
+}
+_ROOM_TYPE = {
+    'coding': [{'system': 'http://terminology.hl7.org/CodeSystem/location-physical-type', 'code': 'ro',
+                'display': 'Room'}],
+}
+
+
+def _timestamp(value: datetime | date | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def _reference(resource_type: str, id) -> dict | None:
+    return {'reference': f'{resource_type}/{id}'} if id is not None else None
+
+
+def _resource(resource_type: str, id, obj: models.Model, **fields) -> dict:
+    """Resource dict without the empty elements, which FHIR doesn't allow."""
+    resource = {'resourceType': resource_type, 'id': str(id)}
+
+    updated_at = getattr(obj, 'updated_at', None)
+    if updated_at is not None:
+        resource['meta'] = {'lastUpdated': updated_at.isoformat()}
+
+    resource.update((name, value) for name, value in fields.items() if value not in (None, '', [], {}))
+    return resource
+
+
+def _name(person) -> list[dict]:
+    name = {'use': 'official', 'family': person.last_name, 'given': [person.first_name]}
+    if person.title:
+        name['prefix'] = [person.title]
+
+    return [name]
+
+
+def _address(person) -> list[dict]:
+    street = ' '.join(str(part) for part in (person.street, person.street_number) if part)
+    address = {name: value for name, value in (('city', person.city), ('postalCode', person.zip_code)) if value}
+    if street:
+        address['line'] = [street]
+
+    return [address] if address else []
+
+
+def _local_id(kind: str, id) -> dict:
+    return {'system': f'{SYSTEM}:{kind}', 'value': str(id)}
+
+
+def _typed_id(obj: models.Model) -> str:
+    # orders and reports of different kinds live in different tables, their ids only are unique per kind
+    return f'{obj._meta.model_name}-{obj.pk}'
+
+
+def patient(obj: Patient) -> dict:
+    identifiers = [_local_id('patient', obj.pk)]
+    identifiers.extend({'value': identifier.value, 'assigner': {'display': identifier.authority}}
+                       for identifier in obj.identifiers.all())
+
+    return _resource(
+        'Patient', obj.pk, obj,
+        identifier=identifiers,
+        name=_name(obj),
+        gender=GENDERS.get(obj.gender, 'unknown'),
+        birthDate=_timestamp(obj.date_of_birth),
+        address=_address(obj),
+    )
+
+
+def encounter(obj: Case) -> dict:
+    return _resource(
+        'Encounter', obj.pk, obj,
+        identifier=[_local_id('case', obj.pk)],
+        status='finished' if obj.is_closed else 'in-progress',
+        **{'class': _ENCOUNTER_CLASS},
+        subject=_reference('Patient', obj.patient_id),
+        period={'start': _timestamp(obj.created_at), 'end': _timestamp(obj.closed_at)} if obj.closed_at
+        else {'start': _timestamp(obj.created_at)},
+        serviceType={'text': obj.assigned_department.name},
+        participant=[{'individual': _reference('Practitioner', obj.assigned_doctor_id)}]
+        if obj.assigned_doctor_id else [],
+    )
+
+
+def practitioner(obj: Doctor) -> dict:
+    return _resource(
+        'Practitioner', obj.pk, obj,
+        identifier=[_local_id('practitioner', obj.pk)],
+        active=obj.is_active,
+        name=_name(obj),
+        gender=GENDERS.get(obj.gender, 'unknown'),
+        address=_address(obj),
+        qualification=[{'code': {'text': str(qualification.get_qualification_display())}}
+                       for qualification in obj.doctorqualification_set.all()],
+    )
+
+
+def location(obj: Room) -> dict:
+    return _resource(
+        'Location', obj.pk, obj,
+        identifier=[_local_id('room', obj.pk)],
+        status='active',
+        name=obj.name,
+        description=obj.department.name,
+        physicalType=_ROOM_TYPE,
+    )
+
+
+def service_request(obj) -> dict:
+    details = {}
+
+    if isinstance(obj, TransportOrder):
+        details['occurrenceDateTime'] = _timestamp(obj.requested_arrival)
+        details['note'] = [{'text': f'{obj.from_room.name} → {obj.to_room.name}'}]
+    elif isinstance(obj, TransferOrder):
+        details['note'] = [{'text': f'{obj.from_department.name} → {obj.to_department.name}'}]
+    elif isinstance(obj, TreatmentOrder):
+        details['performer'] = [_reference('Practitioner', obj.doctor_id)]
+    elif isinstance(obj, ExaminationOrder):
+        details['note'] = [{'text': obj.description}]
+
+    return _resource(
+        'ServiceRequest', _typed_id(obj), obj,
+        identifier=[_local_id(obj._meta.model_name, obj.pk)],
+        status='completed' if obj.is_closed else 'active',
+        intent='order',
+        code={'text': str(obj._meta.verbose_name)},
+        subject=_reference('Patient', obj.case.patient_id),
+        encounter=_reference('Encounter', obj.case_id),
+        authoredOn=_timestamp(obj.created_at),
+        **details,
+    )
+
+
+def diagnostic_report(obj) -> dict:
+    based_on = [
+        _reference('ServiceRequest', f'{order_model._meta.model_name}-{getattr(obj, field)}')
+        for field, order_model in (('treatment_order_id', TreatmentOrder), ('examination_order_id', ExaminationOrder))
+        if getattr(obj, field, None) is not None
+    ]
+
+    return _resource(
+        'DiagnosticReport', _typed_id(obj), obj,
+        identifier=[_local_id(obj._meta.model_name, obj.pk)],
+        basedOn=based_on,
+        status='final',
+        code={'text': str(obj._meta.verbose_name)},
+        subject=_reference('Patient', obj.case.patient_id),
+        encounter=_reference('Encounter', obj.case_id),
+        effectiveDateTime=_timestamp(obj.created_at),
+        issued=_timestamp(obj.updated_at),
+        conclusion=obj.text,
+    )
+
+
+class Source(NamedTuple):
+    model: type[models.Model]
+    serialize: Callable[[models.Model], dict]
+    related: tuple[str, ...] = ()
+    prefetched: tuple[str, ...] = ()
+    archived: bool = False
+
+    @property
+    def updated_field(self) -> str:
+        return 'archived_at' if self.archived else 'updated_at'
+
+    def queryset(self) -> models.QuerySet:
+        if self.archived:
+            return ArchivedRecord.objects.filter(model=self.model._meta.label)
+
+        return self.model._base_manager.select_related(*self.related).prefetch_related(*self.prefetched)
+
+    def objects(self, queryset: models.QuerySet, chunk_size: int) -> Iterator[models.Model]:
+        """The instances of a slice of `queryset()`, loaded chunk by chunk."""
+        if not self.archived:
+            yield from queryset.iterator(chunk_size=chunk_size)
+            return
+
+        records = queryset.values_list('data', flat=True).iterator(chunk_size=chunk_size)
+        while chunk := list(islice(records, chunk_size)):
+            yield from instances(self.model, chunk)
+
+
+ORDERS = (TransportOrder, TransferOrder, TreatmentOrder, ExaminationOrder)
+REPORTS = (AnamnesisReport, DiagnosisReport, ExaminationReport, TherapyReport, FindingsReport)
+
+
+RESOURCES: dict[str, tuple[Source, ...]] = {
+    'Patient': (
+        Source(Patient, patient, prefetched=('identifiers',)),
+    ),
+    'Encounter': (
+        Source(Case, encounter, related=('assigned_department',)),
+        Source(Case, encounter, archived=True),
+    ),
+    'Practitioner': (
+        Source(Doctor, practitioner, prefetched=('doctorqualification_set',)),
+    ),
+    'Location': (
+        Source(Room, location, related=('department',)),
+    ),
+    'ServiceRequest': (
+        Source(TransportOrder, service_request, related=('case', 'from_room', 'to_room')),
+        Source(TransferOrder, service_request, related=('case', 'from_department', 'to_department')),
+        Source(TreatmentOrder, service_request, related=('case',)),
+        Source(ExaminationOrder, service_request, related=('case',)),
+        *(Source(model, service_request, archived=True) for model in ORDERS),
+    ),
+    'DiagnosticReport': (
+        *(Source(model, diagnostic_report, related=('case',)) for model in REPORTS),
+        *(Source(model, diagnostic_report, archived=True) for model in REPORTS),
+    ),
+}
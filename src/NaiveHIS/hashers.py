@@ -0,0 +1,31 @@
+import base64
+import hashlib
+import os
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class LegacyPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Passwords of the accounts taken over from the old system, PBKDF2-SHA256 over a 64 byte binary salt with a 128 byte
+    key, see `old/utils.py`. The salt is stored hex encoded. Django replaces these hashes with ones of the default
+    hasher on the first successful login.
+    """
+
+    algorithm = 'legacy_pbkdf2_sha256'
+    iterations = 100_000
+    digest_length = 128
+
+    def salt(self):
+        return os.urandom(64).hex()
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), bytes.fromhex(salt), iterations,
+                                  dklen=self.digest_length)
+        return self.from_legacy(bytes.fromhex(salt), key, iterations)
+
+    def from_legacy(self, salt: bytes, pw_hash: bytes, iterations: int | None = None) -> str:
+        """The encoded password for the salt and hash columns of a legacy account."""
+        return f'{self.algorithm}${iterations or self.iterations}${salt.hex()}${base64.b64encode(pw_hash).decode()}'
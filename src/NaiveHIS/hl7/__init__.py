@@ -0,0 +1,6 @@
+"""
+HL7 v2 interface.
+
+`parser` reads messages from streams, `mllp` frames them on TCP connections and `adt` applies admission, transfer,
+discharge and update events to patients and cases.
+"""
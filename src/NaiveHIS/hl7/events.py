@@ -0,0 +1,218 @@
+"""
+Outbound HL7 v2 feed.
+
+Changes to cases, transfers, transports and reports are turned into messages where they happen and queued as
+`OutboundMessage` rows in the same transaction. Downstream systems thus learn about exactly the committed changes,
+without the request waiting for them. Delivery is up to the hl7_send_outbound command, see `hl7.outbound`.
+Builders take querysets as well as instances, querysets are loaded with everything the messages need at once.
+"""
+from datetime import datetime
+from typing import Iterable, Iterator
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .. import cache
+from ..models.discharge import DischargeSummary
+from ..models.hl7 import OutboundMessage
+from ..models.objects import Department, Patient, Room
+from ..models.tasks import Case, Order, Report, TransferOrder, TransportOrder
+from .parser import escape, format_timestamp
+
+GENDERS = {'m': 'M', 'w': 'F', 'd': 'O'}
+
+_CASE_RELATED = ('case__patient', 'case__assigned_department')
+
+
+def receivers(message_type: str) -> list[str]:
+    """Destinations that subscribed to messages like `ADT`, see `settings.HL7_OUTBOUND_DESTINATIONS`."""
+    return [name for name, destination in settings.HL7_OUTBOUND_DESTINATIONS.items()
+            if message_type in destination.get('messages', (message_type,))]
+
+
+def _related(objects: Iterable[models.Model], *fields: str) -> Iterable[models.Model]:
+    return objects.select_related(*fields) if isinstance(objects, models.QuerySet) else objects
+
+
+def _text(value) -> str:
+    return escape(str(value)) if value is not None else ''
+
+
+def _formatted_text(value: str) -> str:
+    return '\\.br\\'.join(_text(line) for line in value.splitlines())
+
+
+def _segment(name: str, fields: dict[int, str]) -> str:
+    values = [''] * max(fields)
+    for index, value in fields.items():
+        values[index - 1] = value
+
+    return '|'.join((name, *values))
+
+
+def _evn(event: str, when: datetime) -> str:
+    return _segment('EVN', {1: event, 2: format_timestamp(when)})
+
+
+def _pid(patient: Patient) -> str:
+    street = ' '.join(str(part) for part in (patient.street, patient.street_number) if part)
+
+    return _segment('PID', {
+        1: '1',
+        3: f'{patient.pk}^^^{settings.HL7_APPLICATION}^PI',
+        5: f'{_text(patient.last_name)}^{_text(patient.first_name)}^^^{_text(patient.title)}',
+        7: patient.date_of_birth.strftime('%Y%m%d') if patient.date_of_birth else '',
+        8: GENDERS.get(patient.gender, 'U'),
+        11: f'{_text(street)}^^{_text(patient.city)}^^{_text(patient.zip_code)}',
+    })
+
+
+def _location(department: Department | None, room: Room | None = None) -> str:
+    if room is not None:
+        department = room.department
+    if department is None:
+        return ''
+
+    return f'{_text(department.name)}^{_text(room.name) if room else ""}'
+
+
+def _pv1(case: Case, location: str, prior_location: str = '', discharged_at: datetime | None = None) -> str:
+    fields = {
+        1: '1',
+        2: 'I',
+        3: location,
+        6: prior_location,
+        10: _text(case.assigned_department.name),
+        19: f'{case.pk}^^^{settings.HL7_APPLICATION}^VN',
+        44: format_timestamp(case.created_at),
+    }
+    if discharged_at is not None:
+        fields[45] = format_timestamp(discharged_at)
+
+    return _segment('PV1', fields)
+
+
+def _enqueue(message_type: str, messages: Iterator[list[str]]):
+    destinations = receivers(message_type.split('^')[0])
+    if not destinations:
+        return
+
+    created = format_timestamp()
+    rows = []
+
+    for segments in messages:
+        control_id = uuid4().hex[:20]
+        body = '\r'.join(segments)
+
+        for destination in destinations:
+            header = '|'.join(('MSH', '^~\\&', settings.HL7_APPLICATION, _text(settings.HL7_FACILITY), destination,
+                               '', created, '', message_type, control_id, 'P', '2.5'))
+            rows.append(OutboundMessage(destination=destination, control_id=control_id, message_type=message_type,
+                                        payload=f'{header}\r{body}'))
+
+    OutboundMessage.objects.bulk_create(rows)
+
+
+def admitted(cases: Iterable[Case]):
+    """A01 for newly opened cases."""
+    if not receivers('ADT'):
+        return
+
+    _enqueue('ADT^A01', (
+        [_evn('A01', case.created_at), _pid(case.patient), _pv1(case, _location(case.assigned_department))]
+        for case in _related(cases, 'patient', 'assigned_department')
+    ))
+
+
+def _location_change(order: Order) -> tuple[str, str]:
+    if isinstance(order, TransportOrder):
+        return _location(None, order.to_room), _location(None, order.from_room)
+
+    return _location(order.to_department), _location(order.from_department)
+
+
+def transferred(orders: Iterable[TransferOrder | TransportOrder]):
+    """A02 for transfers and transports that were carried out, i.e. closed."""
+    if not receivers('ADT'):
+        return
+
+    if isinstance(orders, models.QuerySet):
+        location_related = (('to_room__department', 'from_room__department') if orders.model is TransportOrder
+                            else ('to_department', 'from_department'))
+        orders = orders.select_related(*_CASE_RELATED, *location_related)
+
+    def messages():
+        for order in orders:
+            location, prior_location = _location_change(order)
+            # e.g. the transport into the first room on admission
+            if location == prior_location:
+                continue
+
+            yield [_evn('A02', order.closed_at), _pid(order.case.patient), _pv1(order.case, location, prior_location)]
+
+    _enqueue('ADT^A02', messages())
+
+
+def discharged(summaries: list[DischargeSummary]):
+    """A03 for discharged cases, from their discharge summaries."""
+    if not receivers('ADT') or not summaries:
+        return
+
+    cases = Case.objects.select_related('patient', 'assigned_department').in_bulk(
+        [summary.case_id for summary in summaries]
+    )
+    rooms = {room.pk: room for room in cache.rooms()}
+
+    _enqueue('ADT^A03', (
+        [
+            _evn('A03', summary.discharged_at),
+            _pid(cases[summary.case_id].patient),
+            _pv1(cases[summary.case_id],
+                 _location(cases[summary.case_id].assigned_department, rooms.get(summary.room_id)),
+                 discharged_at=summary.discharged_at),
+        ]
+        for summary in summaries
+    ))
+
+
+def discharge_cancelled(cases: Iterable[Case]):
+    """A13 for reopened cases."""
+    if not receivers('ADT'):
+        return
+
+    now = timezone.now()
+    _enqueue('ADT^A13', (
+        [_evn('A13', now), _pid(case.patient), _pv1(case, _location(case.assigned_department))]
+        for case in _related(cases, 'patient', 'assigned_department')
+    ))
+
+
+def _result(report: Report, corrected: bool) -> list[str]:
+    status = 'C' if corrected else 'F'
+    opts = report._meta
+    service = f'{opts.model_name}^{_text(opts.verbose_name)}^L'
+
+    return [
+        _pid(report.case.patient),
+        _pv1(report.case, _location(report.case.assigned_department)),
+        _segment('OBR', {
+            1: '1',
+            3: f'{report.pk}^{settings.HL7_APPLICATION}',
+            4: service,
+            7: format_timestamp(report.created_at),
+            22: format_timestamp(report.updated_at),
+            25: status,
+        }),
+        _segment('OBX', {1: '1', 2: 'TX', 3: service, 5: _formatted_text(report.text), 11: status,
+                         16: str(report.written_by_id)}),
+    ]
+
+
+def reported(reports: Iterable[Report], corrected: bool = False):
+    """ORU^R01 for written reports, `corrected` if they were changed afterwards."""
+    if not receivers('ORU'):
+        return
+
+    _enqueue('ORU^R01', (_result(report, corrected) for report in _related(reports, *_CASE_RELATED)))
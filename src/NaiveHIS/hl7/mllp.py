@@ -0,0 +1,145 @@
+"""
+Minimal Lower Layer Protocol (MLLP) transport.
+
+Every message is framed as <VT> message <FS><CR>. The server hands all messages that arrived together to its batch
+handler at once and answers each of them with an acknowledgement, in order. Senders may keep a window of messages
+in flight, which is what lets batches form in the first place.
+"""
+import logging
+import socket
+import socketserver
+
+from typing import Callable, Iterable, Iterator
+
+from django.db import connection
+
+from .parser import Message, parse_message
+
+logger = logging.getLogger(__name__)
+
+START_BLOCK = b'\x0b'
+END_BLOCK = b'\x1c\r'
+ENCODING = 'utf-8'
+BUFFER_SIZE = 1 << 16
+
+# applies a batch of messages and returns one acknowledgement per message
+BatchHandler = Callable[[list[Message]], list[str]]
+
+_UNPARSEABLE_ACK = 'MSH|^~\\&|NaiveHIS||||||ACK|||P|2.5\rMSA|AR||Nachricht konnte nicht gelesen werden'
+
+
+def frame(message: str | Message) -> bytes:
+    return START_BLOCK + str(message).encode(ENCODING) + END_BLOCK
+
+
+class FrameReader:
+    """Collects framed messages from a byte stream that may split them anywhere."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self._buffer += data
+        frames = []
+
+        while (end := self._buffer.find(END_BLOCK)) >= 0:
+            start = self._buffer.find(START_BLOCK, 0, end)
+            # bytes outside of a frame are noise
+            if start >= 0:
+                frames.append(bytes(self._buffer[start + 1:end]))
+            del self._buffer[:end + len(END_BLOCK)]
+
+        return frames
+
+
+def _handle_frames(frames: list[bytes], handle_batch: BatchHandler) -> list[str]:
+    acks: list[str | None] = [None] * len(frames)
+    messages, positions = [], []
+
+    for position, data in enumerate(frames):
+        try:
+            messages.append(parse_message(data.decode(ENCODING)))
+            positions.append(position)
+        except ValueError:
+            logger.warning('Rejected unparseable HL7 message %r', data[:80])
+            acks[position] = _UNPARSEABLE_ACK
+
+    for position, ack in zip(positions, handle_batch(messages) if messages else ()):
+        acks[position] = ack
+
+    return acks
+
+
+def serve_connection(sock: socket.socket, handle_batch: BatchHandler, batch_size: int = 500):
+    """Receive messages on `sock` until the peer closes it, and acknowledge them batch by batch."""
+    reader = FrameReader()
+
+    while data := sock.recv(BUFFER_SIZE):
+        frames = reader.feed(data)
+
+        for start in range(0, len(frames), batch_size):
+            acks = _handle_frames(frames[start:start + batch_size], handle_batch)
+            sock.sendall(b''.join(frame(ack) for ack in acks))
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    server: 'MLLPServer'
+
+    def handle(self):
+        try:
+            serve_connection(self.request, self.server.handle_batch, self.server.batch_size)
+        finally:
+            # every connection is served by a thread of its own, which has a database connection of its own
+            connection.close()
+
+
+class MLLPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple[str, int], handle_batch: BatchHandler, batch_size: int = 500):
+        self.handle_batch = handle_batch
+        self.batch_size = batch_size
+        super().__init__(address, _ConnectionHandler)
+
+
+def exchange(sock: socket.socket, messages: Iterable[str | Message], window: int = 100) -> Iterator[Message]:
+    """
+    Send `messages` over `sock`, with up to `window` of them waiting for their acknowledgement,
+    and yield the acknowledgements as they come in.
+    """
+    reader = FrameReader()
+    messages = iter(messages)
+    outstanding = 0
+    exhausted = False
+
+    while True:
+        frames = []
+        while not exhausted and outstanding + len(frames) < window:
+            message = next(messages, None)
+            if message is None:
+                exhausted = True
+            else:
+                frames.append(frame(message))
+
+        if frames:
+            sock.sendall(b''.join(frames))
+            outstanding += len(frames)
+
+        if not outstanding:
+            return
+
+        data = sock.recv(BUFFER_SIZE)
+        if not data:
+            raise ConnectionError(f'Connection closed with {outstanding} messages unacknowledged')
+
+        for ack in reader.feed(data):
+            outstanding -= 1
+            yield parse_message(ack.decode(ENCODING))
+
+
+def send_messages(address: tuple[str, int], messages: Iterable[str | Message], window: int = 100,
+                  timeout: float = 30) -> Iterator[Message]:
+    """Stand-in for a sending system: deliver `messages` to the MLLP server at `address`, see `exchange`."""
+    with socket.create_connection(address, timeout=timeout) as sock:
+        yield from exchange(sock, messages, window)
@@ -0,0 +1,111 @@
+"""
+Delivery of the outbound HL7 v2 feed.
+
+Every destination is a queue of its own that is delivered in order: messages are sent in batches over one
+connection, with a window of them awaiting their acknowledgement. If the destination can't be reached, the first
+undelivered message is retried with exponential backoff and nothing behind it is sent in the meantime. Messages the
+destination rejects (AE, AR) are marked as failed and don't hold up the queue.
+"""
+import logging
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from ..models.hl7 import OutboundMessage
+from .mllp import send_messages
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = ('AA', 'CA')
+
+
+class OutboundSender:
+    batch_size: int = 500
+    window: int = 100
+    timeout: float = 30
+    retry_delay: float = 5
+    max_retry_delay: float = 900
+
+    def __init__(self, destinations: dict[str, dict] | None = None, **options):
+        self.destinations = settings.HL7_OUTBOUND_DESTINATIONS if destinations is None else destinations
+
+        for name, value in options.items():
+            if value is not None:
+                setattr(self, name, value)
+
+    @staticmethod
+    def pending(destination: str):
+        return OutboundMessage.objects.filter(destination=destination,
+                                              status=OutboundMessage.Status.PENDING).order_by('id')
+
+    def deliver(self, destination: str) -> int:
+        """Send the next batch of `destination` and return how many of its messages were acknowledged."""
+        batch = list(self.pending(destination)[:self.batch_size])
+        if not batch or (batch[0].next_attempt_at is not None and batch[0].next_attempt_at > timezone.now()):
+            return 0
+
+        config = self.destinations[destination]
+        acks = []
+        failure = None
+
+        try:
+            for message, ack in zip(batch, send_messages((config['host'], config['port']),
+                                                         (message.payload for message in batch),
+                                                         self.window, self.timeout)):
+                if ack.get('MSA-2') != message.control_id:
+                    raise ValueError(f'Acknowledgement for {ack.get("MSA-2")!r} instead of {message.control_id!r}')
+                acks.append(ack)
+        except (OSError, ValueError) as error:
+            failure = error
+            logger.warning('Delivering HL7 messages to %s failed: %s', destination, error)
+
+        self._record(batch, acks, failure)
+        return len(acks)
+
+    def _record(self, batch: list[OutboundMessage], acks: list, failure: Exception | None):
+        now = timezone.now()
+        sent, rejected = [], []
+
+        for message, ack in zip(batch, acks):
+            message.attempts += 1
+            if ack.get('MSA-1') in ACCEPTED:
+                sent.append(message.pk)
+            else:
+                message.status = OutboundMessage.Status.FAILED
+                message.error = ack.get('MSA-3') or ack.get('MSA-1')
+                rejected.append(message)
+
+        with transaction.atomic():
+            OutboundMessage.objects.filter(pk__in=sent).update(status=OutboundMessage.Status.SENT, sent_at=now,
+                                                               attempts=F('attempts') + 1, next_attempt_at=None,
+                                                               error='')
+            OutboundMessage.objects.bulk_update(rejected, ['status', 'attempts', 'error'])
+
+            if failure is not None and len(acks) < len(batch):
+                head = batch[len(acks)]
+                head.attempts += 1
+                head.next_attempt_at = now + timedelta(
+                    seconds=min(self.retry_delay * 2 ** (head.attempts - 1), self.max_retry_delay)
+                )
+                head.error = str(failure)
+                head.save(update_fields=['attempts', 'next_attempt_at', 'error'])
+
+    def lag(self) -> dict[str, tuple[int, timedelta]]:
+        """Number of pending messages and age of the oldest one, per destination."""
+        now = timezone.now()
+        lag = {destination: (0, timedelta()) for destination in self.destinations}
+
+        pending = (OutboundMessage.objects
+                   .filter(status=OutboundMessage.Status.PENDING)
+                   .order_by()
+                   .values('destination')
+                   .annotate(count=Count('pk'), oldest=Min('created_at'))
+                   .values_list('destination', 'count', 'oldest'))
+        for destination, count, oldest in pending:
+            lag[destination] = (count, now - oldest)
+
+        return lag
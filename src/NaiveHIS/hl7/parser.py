@@ -0,0 +1,201 @@
+"""
+Minimal HL7 v2 parser.
+
+Messages are read one at a time from a stream, so files of any size are processed in constant memory. A message is
+split into segments when it is read, fields and components are only split when they are accessed.
+"""
+import re
+
+from datetime import datetime
+from typing import Iterable, Iterator, TextIO
+from uuid import uuid4
+
+from django.utils import timezone
+
+_SEGMENT_SEPARATOR = re.compile(r'[\r\n]+')
+# MLLP framing bytes, in case a file holds framed messages
+_FRAMING = str.maketrans('', '', '\x0b\x1c')
+
+_ESCAPES = {'F': '|', 'S': '^', 'T': '&', 'R': '~', 'E': '\\'}
+
+
+class Segment:
+    __slots__ = ('raw', 'name', '_fields', '_field_separator', '_component_separator', '_repetition_separator')
+
+    def __init__(self, raw: str, field_separator: str = '|', encoding_characters: str = '^~\\&'):
+        self.raw = raw
+        self.name = raw[:3]
+        self._fields: list[str] | None = None
+        self._field_separator = field_separator
+        self._component_separator = encoding_characters[0]
+        self._repetition_separator = encoding_characters[1]
+
+    def __repr__(self):
+        return f'<Segment {self.raw[:40]}>'
+
+    @property
+    def fields(self) -> list[str]:
+        if self._fields is None:
+            fields = self.raw.split(self._field_separator)
+            if self.name == 'MSH':
+                # MSH-1 is the field separator itself, which doesn't show up when splitting
+                fields.insert(1, self._field_separator)
+            self._fields = fields
+
+        return self._fields
+
+    def field(self, index: int, component: int | None = None) -> str:
+        """Value of the first repetition of field `index`, or of one of its components (counting from 1)."""
+        fields = self.fields
+        value = fields[index] if index < len(fields) else ''
+
+        if self.name == 'MSH' and index <= 2:
+            return value
+
+        value = value.split(self._repetition_separator, 1)[0]
+
+        if component is not None:
+            components = value.split(self._component_separator)
+            value = components[component - 1] if component <= len(components) else ''
+
+        return unescape(value) if '\\' in value else value
+
+
+class Message:
+    __slots__ = ('segments', '_by_name')
+
+    def __init__(self, segments: list[str]):
+        header = segments[0] if segments else ''
+        if not header.startswith('MSH') or len(header) < 8:
+            raise ValueError('HL7 messages start with a MSH segment')
+
+        field_separator, encoding_characters = header[3], header[4:8]
+        self.segments = [Segment(raw, field_separator, encoding_characters) for raw in segments]
+        self._by_name = {}
+        for segment in self.segments:
+            self._by_name.setdefault(segment.name, segment)
+
+    def __repr__(self):
+        return f'<Message {self.message_type} {self.control_id}>'
+
+    def __str__(self):
+        return '\r'.join(segment.raw for segment in self.segments)
+
+    def segment(self, name: str) -> Segment | None:
+        """The first segment called `name`."""
+        return self._by_name.get(name)
+
+    def get(self, path: str) -> str:
+        """Value at an HL7 path like `PID-5` or `PID-5.2`, '' if it is missing."""
+        name, _, position = path.partition('-')
+        index, _, component = position.partition('.')
+
+        segment = self.segment(name)
+        if segment is None:
+            return ''
+
+        return segment.field(int(index), int(component) if component else None)
+
+    @property
+    def message_type(self) -> str:
+        return f'{self.get("MSH-9.1")}^{self.get("MSH-9.2")}'
+
+    @property
+    def event(self) -> str:
+        return self.get('MSH-9.2') or self.get('EVN-1')
+
+    @property
+    def control_id(self) -> str:
+        return self.get('MSH-10')
+
+    @property
+    def sender(self) -> str:
+        return '^'.join(filter(None, (self.get('MSH-3'), self.get('MSH-4'))))
+
+
+def unescape(value: str) -> str:
+    return re.sub(r'\\([FSTRE])\\', lambda match: _ESCAPES[match.group(1)], value)
+
+
+def escape(value: str) -> str:
+    value = value.replace('\\', '\\E\\')
+    for char, escaped in (('|', '\\F\\'), ('^', '\\S\\'), ('&', '\\T\\'), ('~', '\\R\\')):
+        value = value.replace(char, escaped)
+
+    return value
+
+
+def parse_message(raw: str) -> Message:
+    return Message([segment for segment in _SEGMENT_SEPARATOR.split(raw.translate(_FRAMING)) if segment.strip()])
+
+
+def iter_messages(chunks: Iterable[str]) -> Iterator[Message]:
+    """
+    Messages from a stream of text chunks, e.g. `iter(lambda: file.read(65536), '')`.
+    Segments may be separated by carriage returns or newlines, every MSH segment starts a new message.
+    """
+    segments = []
+    rest = ''
+
+    for chunk in chunks:
+        lines = _SEGMENT_SEPARATOR.split(rest + chunk.translate(_FRAMING))
+        # the last line may continue in the next chunk
+        rest = lines.pop()
+
+        for line in lines:
+            if line.startswith('MSH') and segments:
+                yield Message(segments)
+                segments = []
+
+            if line.strip():
+                segments.append(line)
+
+    if rest.strip():
+        if rest.startswith('MSH') and segments:
+            yield Message(segments)
+            segments = []
+        segments.append(rest)
+
+    if segments:
+        yield Message(segments)
+
+
+def read_messages(file: TextIO, chunk_size: int = 1 << 16) -> Iterator[Message]:
+    return iter_messages(iter(lambda: file.read(chunk_size), ''))
+
+
+def parse_timestamp(value: str) -> datetime | None:
+    """HL7 TS like `20230115083000`, `202301150830+0100` or `20230115`, in local time if no offset is given."""
+    value = value.strip()
+    if not value:
+        return None
+
+    match = re.match(r'^(\d{4,14})(?:\.\d+)?([+-]\d{4})?$', value)
+    if match is None:
+        raise ValueError(f'Invalid HL7 timestamp {value!r}')
+
+    digits, offset = match.groups()
+    # missing month and day are the first, missing time is midnight
+    if len(digits) < 8:
+        digits = (digits + '0101')[:8]
+    digits = digits.ljust(14, '0')
+
+    if offset is not None:
+        return datetime.strptime(digits + offset, '%Y%m%d%H%M%S%z')
+
+    return timezone.make_aware(datetime.strptime(digits, '%Y%m%d%H%M%S'))
+
+
+def format_timestamp(value: datetime | None = None) -> str:
+    value = timezone.localtime(value or timezone.now())
+    return value.strftime('%Y%m%d%H%M%S%z')
+
+
+def ack(message: Message, code: str = 'AA', text: str = '', application: str = 'NaiveHIS') -> str:
+    """Acknowledgement for `message`: AA accepted, AE error, AR rejected."""
+    header = '|'.join((
+        'MSH', '^~\\&', application, '', message.get('MSH-3'), message.get('MSH-4'), format_timestamp(), '',
+        f'ACK^{message.event}^ACK', uuid4().hex[:20], 'P', message.get('MSH-12') or '2.5',
+    ))
+
+    return '\r'.join((header, f'MSA|{code}|{message.control_id}|{escape(text)}'))
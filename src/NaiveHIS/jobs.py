@@ -0,0 +1,73 @@
+"""
+Tasks that can run as background jobs, see `services.jobs`. Registered on startup, see apps.py.
+
+The workers of the job queue are processes already, so tasks that can use a process pool of their own run with a
+single process unless the job asks for more.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fhir.export import bulk_export
+from .models.objects import Department
+from .models.tasks import Case
+from .services import census
+from .services.archive import archive_cases
+from .services.dicom import index_directory
+from .services.duplicates import find_duplicates, last_scan_start
+from .services.jobs import JobContext, task
+from .services.legacy import LegacyMigrator
+
+
+def _datetime(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+@task('archive_cases')
+def archive(job: JobContext, days: int = settings.ARCHIVE_CASES_AFTER_DAYS, chunk_size: int = 200) -> dict:
+    older_than = timedelta(days=days)
+    total = Case._base_manager.filter(closed_at__lt=timezone.now() - older_than).count()
+    archived = 0
+
+    # chunk by chunk, so the job can be cancelled in between
+    while count := archive_cases(older_than=older_than, chunk_size=chunk_size, limit=chunk_size):
+        archived += count
+        job.progress(archived, total, f'{archived} Fälle archiviert')
+
+    return {'archived': archived}
+
+
+@task('rebuild_census')
+def rebuild_census(job: JobContext, days: int = settings.CENSUS_CATCH_UP_DAYS) -> dict:
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return {'since': since.isoformat(), 'rows': census.rebuild(since)}
+
+
+@task('find_duplicate_patients')
+def duplicates(job: JobContext, incremental: bool = True, threshold: float = 0.7, workers: int = 1) -> dict:
+    # the first scan has to be a full one
+    since = last_scan_start() if incremental else None
+    scan = find_duplicates(since=since, threshold=threshold, workers=workers, progress=job.progress)
+
+    return {'scan': scan.pk, 'patients_checked': scan.patients_checked, 'candidates_found': scan.candidates_found}
+
+
+@task('fhir_export')
+def fhir_export(job: JobContext, directory: str, types: list[str] | None = None, since: str | None = None,
+                workers: int = 1) -> dict:
+    return bulk_export(directory, types, since=_datetime(since), workers=workers, progress=job.progress)
+
+
+@task('index_dicom')
+def index_dicom(job: JobContext, directory: str, prune: bool = False, workers: int = 1) -> dict:
+    return index_directory(directory, workers=workers, prune=prune, progress=job.progress)._asdict()
+
+
+@task('migrate_legacy')
+def migrate_legacy(job: JobContext, database: str, department: str, close_cases: bool = False) -> dict:
+    migrator = LegacyMigrator(database, Department.objects.get(name=department), close_cases=close_cases)
+    try:
+        return dict(migrator.migrate(progress=job.progress))
+    finally:
+        migrator.close()
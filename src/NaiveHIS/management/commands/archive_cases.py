@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...services.archive import archive_cases
+
+
+class Command(BaseCommand):
+    help = 'Move long closed cases with their orders and reports into the archive database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_CASES_AFTER_DAYS,
+                            help='archive cases closed longer ago than this')
+        parser.add_argument('--chunk-size', type=int, default=200, help='cases archived per transaction')
+        parser.add_argument('--limit', type=int, default=None, help='stop after this many cases')
+
+    def handle(self, *args, days, chunk_size, limit, **options):
+        count = archive_cases(older_than=timedelta(days=days), chunk_size=chunk_size, limit=limit)
+        self.stdout.write(self.style.SUCCESS(f'Archived {count} cases'))
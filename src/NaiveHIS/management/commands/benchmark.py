@@ -0,0 +1,84 @@
+import json
+import platform
+
+from pathlib import Path
+
+import django
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from ...audit import audit_log
+from ...benchmarks import BENCHMARKS, from_json, measure, regressions, to_json
+from ...benchmarks.datasets import generate
+# registers the benchmarks
+from ...benchmarks import suite  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = ('Run the micro-benchmarks of model and admin hot paths on generated datasets and compare them against '
+            'the baseline, all changes are rolled back afterwards')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, action='append', dest='sizes',
+                            help='cases in a dataset, may be repeated, 100 and 1000 by default')
+        parser.add_argument('--only', action='append', help='only benchmarks whose name contains this, may be repeated')
+        parser.add_argument('--rounds', type=int, default=5, help='rounds timed per benchmark, the median counts')
+        parser.add_argument('--baseline', type=Path, default=settings.BENCHMARK_BASELINE)
+        parser.add_argument('--threshold', type=float, default=settings.BENCHMARK_THRESHOLD,
+                            help='fraction by which a benchmark may be slower than its baseline')
+        parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+
+    def handle(self, *args, sizes, only, rounds, baseline, threshold, save, **options):
+        benchmarks = [benchmark for name, benchmark in sorted(BENCHMARKS.items())
+                      if not only or any(part in name for part in only)]
+        if not benchmarks:
+            raise CommandError('No benchmark matches')
+
+        previous = from_json(json.loads(baseline.read_text())['results']) if baseline.exists() else {}
+        results = {}
+
+        # the test client's requests are made to the host 'testserver', audit events would outlive the rollback
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), audit_log.suspended():
+            for size in sorted(sizes or (100, 1000)):
+                with transaction.atomic():
+                    dataset = generate(size)
+
+                    for benchmark in benchmarks:
+                        result = results.setdefault(benchmark.name, {})[size] = measure(benchmark, dataset, rounds)
+                        self._report(benchmark.name, size, result, previous.get(benchmark.name, {}).get(size))
+
+                    transaction.set_rollback(True)
+
+        if save:
+            baseline.write_text(json.dumps({
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                # benchmarks that weren't run keep their previous baseline
+                'results': to_json({**previous, **{name: {**previous.get(name, {}), **sizes}
+                                                   for name, sizes in results.items()}}),
+            }, indent=2))
+            self.stdout.write(self.style.SUCCESS(f'Saved the baseline to {baseline}'))
+            return
+
+        found = regressions(results, previous, threshold)
+        if found:
+            for regression in found:
+                self.stderr.write(self.style.ERROR(
+                    f'{regression.name} ({regression.size}) regressed: '
+                    f'{regression.baseline.seconds * 1000:.3f} ms -> {regression.result.seconds * 1000:.3f} ms, '
+                    f'{regression.baseline.queries} -> {regression.result.queries} queries'
+                ))
+            raise CommandError(f'{len(found)} benchmarks regressed by more than {threshold:.0%} or in queries')
+
+    def _report(self, name, size, result, baseline):
+        line = f'{name:<40} {size:>7} {result.seconds * 1000:>10.3f} ms {result.queries:>6} queries'
+        if baseline is not None:
+            line += (f'  {result.seconds / baseline.seconds - 1:>+7.1%} '
+                     f'{result.queries - baseline.queries:>+4d} queries vs baseline')
+
+        self.stdout.write(line)
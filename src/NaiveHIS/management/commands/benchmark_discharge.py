@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ...models.accounts import HISAccount
+from ...models.objects import Department, Patient, Room
+from ...models.tasks import Case, ExaminationOrder, TransportOrder
+
+
+class Command(BaseCommand):
+    help = 'Measure discharge throughput on generated cases, all changes are rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=1000, help='number of cases to discharge')
+        parser.add_argument('--batch-size', type=int, default=250, help='cases closed per call')
+        parser.add_argument('--rooms', type=int, default=50)
+
+    def handle(self, *args, cases, batch_size, rooms, **options):
+        with transaction.atomic():
+            case_pks = self._generate(cases, rooms)
+
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                for offset in range(0, len(case_pks), batch_size):
+                    Case.objects.filter(pk__in=case_pks[offset:offset + batch_size]).close()
+                elapsed = perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Discharged {cases} cases in {elapsed:.3f}s ({cases / elapsed:.0f} cases/s), '
+            f'{len(queries)} queries, {len(queries) / -(-cases // batch_size):.1f} per batch'
+        ))
+
+    def _generate(self, cases: int, rooms: int) -> list[int]:
+        now = timezone.now()
+
+        issuer = HISAccount.objects.create_user(username='benchmark-discharge')
+        department = Department.objects.create(name='Benchmark')
+        ward = Room.objects.bulk_create([
+            Room(name=f'Benchmark {number}', department=department, capacity=cases, usage=0) for number in range(rooms)
+        ])
+
+        patients = Patient.objects.bulk_create([
+            Patient(first_name='Bench', last_name=f'Mark {number}', date_of_birth=date(1970, 1, 1) + timedelta(number),
+                    city='Berlin', street='Teststraße', street_number=number, zip_code='10115')
+            for number in range(cases)
+        ])
+        created = Case.objects.bulk_create([
+            Case(patient=patient, assigned_department=department) for patient in patients
+        ])
+
+        # every patient was brought to a room and has an examination pending
+        TransportOrder.objects.bulk_create([
+            TransportOrder(issued_by=issuer, case=case, from_room=ward[0], to_room=ward[number % rooms],
+                           requested_arrival=now, supervised=False, closed_at=now - timedelta(hours=1))
+            for number, case in enumerate(created)
+        ])
+        ExaminationOrder.objects.bulk_create([
+            ExaminationOrder(issued_by=issuer, case=case, description='Benchmark') for case in created
+        ])
+
+        for number, room in enumerate(ward):
+            room.usage = len(range(number, cases, rooms))
+        Room.objects.bulk_update(ward, ['usage'])
+
+        return [case.pk for case in created]
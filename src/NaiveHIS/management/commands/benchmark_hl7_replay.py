@@ -0,0 +1,89 @@
+import socket
+
+from datetime import timedelta
+from threading import Thread
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ...hl7.adt import AdtIngester
+from ...hl7.mllp import exchange, serve_connection
+from ...hl7.parser import format_timestamp
+from ...models.objects import Department, Room
+
+
+def _message(number: int, event: str, patient: int, room: str, when) -> str:
+    timestamp = format_timestamp(when)
+    segments = [
+        f'MSH|^~\\&|BENCH|HOSPITAL|NaiveHIS||{timestamp}||ADT^{event}|BENCH{number}|P|2.5',
+        f'EVN|{event}|{timestamp}',
+        f'PID|||P{patient}^^^BENCH||Mark {patient}^Bench||19700101|{"MF"[patient % 2]}|||'
+        f'Teststraße {patient}^^Berlin^^10115',
+        f'PV1||I|Benchmark^{room}||||||||||||||||V{patient}^^^BENCH',
+    ]
+    return '\r'.join(segments)
+
+
+class Command(BaseCommand):
+    help = 'Measure HL7 ADT ingestion throughput over MLLP, all changes are rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=4000, help='number of messages to replay')
+        parser.add_argument('--batch-size', type=int, default=500, help='messages applied per transaction')
+        parser.add_argument('--window', type=int, default=500, help='messages sent ahead of their acknowledgement')
+
+    def handle(self, *args, messages, batch_size, window, **options):
+        server, client = socket.socketpair()
+        acks = []
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        # generated up front, the sender shares the interpreter with the ingestion
+        payloads = list(self._generate(messages))
+
+        def send():
+            acks.extend(exchange(client, payloads, window))
+            client.shutdown(socket.SHUT_WR)
+
+        with transaction.atomic():
+            department = Department.objects.create(name='Benchmark')
+            Room.objects.bulk_create([
+                Room(name=f'B{number}', department=department, capacity=messages, usage=0) for number in range(10)
+            ])
+
+            sender = Thread(target=send)
+            # counted instead of captured, the query log is capped at 9000 entries
+            with connection.execute_wrapper(count):
+                start = perf_counter()
+                sender.start()
+                serve_connection(server, AdtIngester().ingest, batch_size)
+                sender.join()
+                elapsed = perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        server.close()
+        client.close()
+
+        rejected = sum(ack.get('MSA-1') != 'AA' for ack in acks)
+        self.stdout.write(self.style.SUCCESS(
+            f'Applied {len(acks)} messages in {elapsed:.3f}s ({len(acks) / elapsed:.0f} messages/s), '
+            f'{rejected} rejected, {queries / max(len(acks), 1):.1f} queries per message'
+        ))
+
+    @staticmethod
+    def _generate(count: int):
+        # every patient is admitted, moved to another room, updated and discharged
+        events = ('A01', 'A02', 'A08', 'A03')
+        now = timezone.now()
+
+        for number in range(count):
+            patient, step = divmod(number, len(events))
+            room = f'B{(patient + (step >= 1)) % 10}'
+            yield _message(number, events[step], patient, room, now + timedelta(seconds=number))
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from ...blobs import blob_store
+from ...models.attachments import Blob
+from ...services.attachments import collect_blobs
+
+
+class Command(BaseCommand):
+    help = 'Verify the content of the stored attachment blobs and remove the ones no attachment references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collect', action='store_true', help='delete unreferenced blobs')
+        parser.add_argument('--grace-hours', type=int, default=1, help='keep unreferenced blobs younger than this')
+        parser.add_argument('--no-verify', action='store_true', help="don't hash the blobs")
+
+    def handle(self, *args, collect, grace_hours, no_verify, **options):
+        if collect:
+            count = collect_blobs(grace=timedelta(hours=grace_hours))
+            self.stdout.write(f'Deleted {count} unreferenced blobs')
+
+        if no_verify:
+            return
+
+        damaged = 0
+        for digest in Blob.objects.values_list('sha256', flat=True).iterator():
+            if not blob_store.exists(digest):
+                self.stderr.write(f'{digest}: missing')
+                damaged += 1
+            elif not blob_store.verify(digest):
+                self.stderr.write(f'{digest}: content does not match')
+                damaged += 1
+
+        if damaged:
+            self.stderr.write(self.style.ERROR(f'{damaged} damaged blobs'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All blobs intact'))
@@ -0,0 +1,34 @@
+import json
+
+from argparse import ArgumentTypeError
+
+from django.core.management.base import BaseCommand
+
+from ...services.jobs import TASKS, enqueue
+
+
+def _argument(argument: str) -> tuple[str, object]:
+    name, equals, value = argument.partition('=')
+    if not name or not equals:
+        raise ArgumentTypeError(f'{argument!r} is not name=value')
+
+    try:
+        # numbers, booleans, lists and quoted strings, anything else is a string
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+class Command(BaseCommand):
+    help = 'Queue a background job, e.g. from cron, it is run by the run_jobs command'
+
+    def add_arguments(self, parser):
+        parser.add_argument('task', choices=sorted(TASKS))
+        parser.add_argument('arguments', nargs='*', type=_argument, metavar='name=value',
+                            help='arguments of the task, values are read as JSON if they can be')
+        parser.add_argument('--priority', type=int, default=0, help='higher runs first')
+        parser.add_argument('--max-attempts', type=int, default=1, help='tries before the job fails')
+
+    def handle(self, *args, task, arguments, priority, max_attempts, **options):
+        job = enqueue(task, priority=priority, max_attempts=max_attempts, **dict(arguments))
+        self.stdout.write(self.style.SUCCESS(f'Queued {job}'))
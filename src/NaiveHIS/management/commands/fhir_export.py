@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ...fhir.export import bulk_export
+from ...fhir.resources import RESOURCES
+
+
+class Command(BaseCommand):
+    help = 'Export FHIR resources as NDJSON files with a bulk data manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--type', action='append', dest='types', choices=sorted(RESOURCES),
+                            help='resource type to export, may be repeated, all by default')
+        parser.add_argument('--since', help='only export resources changed after this ISO 8601 time')
+        parser.add_argument('--since-manifest', help='continue from the transactionTime of an earlier manifest')
+        parser.add_argument('--workers', type=int, default=None, help='worker processes, one per CPU by default')
+        parser.add_argument('--range-size', type=int, default=50_000, help='primary keys per exported part')
+
+    def handle(self, *args, directory, types, since, since_manifest, workers, range_size, **options):
+        if since_manifest:
+            with open(since_manifest, encoding='utf-8') as file:
+                since = json.load(file)['transactionTime']
+
+        if since:
+            parsed = parse_datetime(since)
+            if parsed is None:
+                raise CommandError(f'Invalid time {since!r}')
+            since = parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+        manifest = bulk_export(directory, types, since=since, workers=workers, range_size=range_size)
+
+        totals = {}
+        for output in manifest['output']:
+            totals[output['type']] = totals.get(output['type'], 0) + output['count']
+
+        for resource_type, count in totals.items():
+            self.stdout.write(f'{resource_type}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Exported up to {manifest["transactionTime"]}'))
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.duplicates import find_duplicates, last_scan_start
+
+
+class Command(BaseCommand):
+    help = 'Queue possible duplicate patients for review'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='only check patients changed since the last finished scan')
+        parser.add_argument('--since', type=datetime.fromisoformat,
+                            help='only check patients changed since this ISO timestamp')
+        parser.add_argument('--threshold', type=float, default=0.7)
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, incremental, since, threshold, workers, **options):
+        if incremental and since is None:
+            since = last_scan_start()
+            if since is None:
+                raise CommandError('There is no finished scan yet, run a full scan first')
+
+        scan = find_duplicates(since=since, threshold=threshold, workers=workers)
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {scan.patients_checked} patients, found {scan.candidates_found} candidate pairs'
+        ))
@@ -0,0 +1,29 @@
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from ...hl7.adt import AdtIngester
+from ...hl7.parser import parse_message, read_messages
+
+
+class Command(BaseCommand):
+    help = 'Apply HL7 v2 ADT messages from files, e.g. a replay of an interface log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+')
+        parser.add_argument('--batch-size', type=int, default=500, help='messages applied per transaction')
+
+    def handle(self, *args, files, batch_size, **options):
+        ingester = AdtIngester()
+        codes = Counter()
+
+        for path in files:
+            with open(path, encoding='utf-8', newline='') as file:
+                messages = read_messages(file)
+                while batch := list(islice(messages, batch_size)):
+                    codes.update(parse_message(ack).get('MSA-1') for ack in ingester.ingest(batch))
+
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{code}: {count}' for code, count in sorted(codes.items())) or 'No messages'
+        ))
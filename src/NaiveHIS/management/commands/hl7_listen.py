@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ...hl7.adt import AdtIngester
+from ...hl7.mllp import MLLPServer
+
+
+class Command(BaseCommand):
+    help = 'Receive HL7 v2 ADT messages over MLLP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=2575)
+        parser.add_argument('--batch-size', type=int, default=500, help='messages applied per transaction')
+
+    def handle(self, *args, host, port, batch_size, **options):
+        ingester = AdtIngester()
+
+        with MLLPServer((host, port), ingester.ingest, batch_size) as server:
+            self.stdout.write(f'Listening on {host}:{port}')
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
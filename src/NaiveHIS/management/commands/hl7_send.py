@@ -0,0 +1,25 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from ...hl7.mllp import send_messages
+from ...hl7.parser import read_messages
+
+
+class Command(BaseCommand):
+    help = 'Send HL7 v2 messages from a file to an MLLP server, standing in for a sending system'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--port', type=int, default=2575)
+        parser.add_argument('--window', type=int, default=100, help='messages sent ahead of their acknowledgement')
+
+    def handle(self, *args, file, host, port, window, **options):
+        codes = Counter()
+
+        with open(file, encoding='utf-8', newline='') as messages:
+            for ack in send_messages((host, port), read_messages(messages), window):
+                codes[ack.get('MSA-1')] += 1
+
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{code}: {count}' for code, count in sorted(codes.items()))))
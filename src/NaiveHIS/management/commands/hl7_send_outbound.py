@@ -0,0 +1,60 @@
+from time import monotonic, sleep
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from ...hl7.outbound import OutboundSender
+
+
+class Command(BaseCommand):
+    help = ('Deliver the outbound HL7 feed. Destinations are served one after the other, run one process per '
+            'destination if a slow one shouldn\'t delay the rest.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destination', action='append', dest='destinations',
+                            help='only deliver to this destination, may be repeated')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--window', type=int, help='messages sent ahead of their acknowledgement')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds to wait when idle')
+        parser.add_argument('--report-interval', type=float, default=60.0, help='seconds between lag reports')
+        parser.add_argument('--once', action='store_true', help='deliver what can be delivered now and stop')
+        parser.add_argument('--lag', action='store_true', help='only report the lag')
+
+    def handle(self, *args, destinations, batch_size, window, poll_interval, report_interval, once, lag,
+               **options):
+        sender = OutboundSender(batch_size=batch_size, window=window)
+
+        unknown = set(destinations or ()) - set(sender.destinations)
+        if unknown:
+            raise CommandError(f'Unknown destinations: {", ".join(sorted(unknown))}')
+        destinations = destinations or list(sender.destinations)
+
+        if lag:
+            self._report(sender, destinations)
+            return
+
+        reported_at = monotonic()
+        try:
+            while True:
+                close_old_connections()
+                delivered = sum(sender.deliver(destination) for destination in destinations)
+
+                if once and not delivered:
+                    break
+
+                if monotonic() - reported_at >= report_interval:
+                    self._report(sender, destinations)
+                    reported_at = monotonic()
+
+                if not delivered:
+                    sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+
+        self._report(sender, destinations)
+
+    def _report(self, sender: OutboundSender, destinations: list[str]):
+        lag = sender.lag()
+        for destination in destinations:
+            count, age = lag[destination]
+            self.stdout.write(f'{destination}: {count} pending, oldest {age.total_seconds():.0f}s')
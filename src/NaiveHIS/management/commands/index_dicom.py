@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ...models.dicom import DicomStudy
+from ...services.dicom import index_directory, link_studies
+
+
+class Command(BaseCommand):
+    help = 'Index the headers of the DICOM files in a directory, rescans only read new and changed files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='processes reading headers, one per CPU by default')
+        parser.add_argument('--batch-size', type=int, default=500, help='files written per transaction')
+        parser.add_argument('--prune', action='store_true', help='remove files that are gone from the index')
+        parser.add_argument('--relink', action='store_true',
+                            help='try again to link all studies without a patient, e.g. after patients were imported')
+
+    def handle(self, *args, directory, workers, batch_size, prune, relink, **options):
+        stats = index_directory(directory, workers=workers, batch_size=batch_size, prune=prune)
+        self.stdout.write(f'Indexed {stats.indexed} files, {stats.unchanged} unchanged, {stats.failed} skipped, '
+                          f'{stats.removed} removed')
+
+        if relink:
+            linked = link_studies(DicomStudy.objects.filter(patient=None).exclude(patient_identifier='').iterator())
+            self.stdout.write(f'Linked {linked} studies')
+
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models.objects import Department
+from ...services.legacy import LegacyMigrator
+
+
+class Command(BaseCommand):
+    help = 'Migrate patients, doctors, cases and reports from the database of the old system, can be run repeatedly'
+
+    def add_arguments(self, parser):
+        parser.add_argument('database', help='SQLite database of the old system')
+        parser.add_argument('--department', required=True,
+                            help='name of the department migrated doctors and cases are assigned to')
+        parser.add_argument('--close-cases', action='store_true',
+                            help='close all migrated cases at the time they were last changed, otherwise all but '
+                                 'the newest case of every patient')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='rows migrated per transaction')
+
+    def handle(self, *args, database, department, close_cases, chunk_size, **options):
+        if not Path(database).is_file():
+            raise CommandError(f'{database} does not exist')
+
+        try:
+            department = Department.objects.get(name=department)
+        except Department.DoesNotExist:
+            raise CommandError(f'Unknown department {department}')
+
+        migrator = LegacyMigrator(database, department, close_cases=close_cases, chunk_size=chunk_size)
+        try:
+            stats = migrator.migrate()
+        finally:
+            migrator.close()
+
+        for table in ('doctors', 'patients', 'cases', 'reports'):
+            self.stdout.write(f'{table}: {stats[table]} migrated, {stats[f"{table} skipped"]} skipped')
+
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,27 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...services.census import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Recompute the daily census of the departments from the cases, run nightly to catch up on changes '
+            'the incremental updates missed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CENSUS_CATCH_UP_DAYS,
+                            help='recompute this many days up to today')
+        parser.add_argument('--since', type=date.fromisoformat, help='recompute from this day on, e.g. 2023-01-01')
+
+    def handle(self, *args, days, since, **options):
+        since = since or timezone.localdate() - timedelta(days=days - 1)
+
+        try:
+            rows = rebuild(since)
+        except ValueError as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} census rows since {since}'))
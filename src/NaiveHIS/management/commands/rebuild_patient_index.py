@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ...services.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fuzzy patient search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, chunk_size, **options):
+        count = rebuild_index(chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} patients'))
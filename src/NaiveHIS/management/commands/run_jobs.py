@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from ...services.jobs import JobWorker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs in a pool of worker processes, any number of these may run side by side'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help='jobs run at the same time')
+        parser.add_argument('--poll-interval', type=float, help='seconds to wait when idle')
+        parser.add_argument('--stale-minutes', type=int,
+                            help='give up on running jobs of other workers without a heartbeat for this long')
+        parser.add_argument('--once', action='store_true', help='run the jobs that are due and stop')
+
+    def handle(self, *args, processes, poll_interval, stale_minutes, once, **options):
+        worker = JobWorker(processes=processes, poll_interval=poll_interval,
+                           stale_after=timedelta(minutes=stale_minutes) if stale_minutes else None)
+
+        self.stdout.write(f'Worker {worker.name} running jobs in {worker.processes} processes')
+        try:
+            worker.run(once=once)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ...services.staging import stage_reports
+
+
+class Command(BaseCommand):
+    help = 'Fill the TNM staging of diagnosis reports from their text, e.g. after importing legacy reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='parse already staged reports again')
+        parser.add_argument('--batch-size', type=int, default=2000, help='reports updated per transaction')
+
+    def handle(self, *args, overwrite, batch_size, **options):
+        staged, unparseable = stage_reports(overwrite=overwrite, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Staged {staged} reports, {unparseable} without TNM classification'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from ...models.medical import Metastases, Nodes, Tumor
+from ...services.staging import STAGING_FIELDS, staging_by_department
+
+
+class Command(BaseCommand):
+    help = 'Count the cases per department and TNM staging, e.g. --metastases M1 for all M1 cases by department'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--by', action='append', choices=STAGING_FIELDS, default=[],
+                            help='break the counts down by this part of the staging, repeatable')
+        parser.add_argument('--tumor', choices=Tumor.values)
+        parser.add_argument('--nodes', choices=Nodes.values)
+        parser.add_argument('--metastases', choices=Metastases.values)
+
+    def handle(self, *args, by, **options):
+        filters = {field: options[field] for field in STAGING_FIELDS if options[field]}
+        rows = staging_by_department(*by, **filters)
+
+        for row in rows:
+            self.stdout.write('\t'.join((row['department'], *(row[field] for field in by), str(row['cases']))))
@@ -1 +1,12 @@
 from NaiveHIS.models.accounts import HISAccount, Employee
+from NaiveHIS.models.search import PatientSearchIndex, PatientTrigram
+from NaiveHIS.models.duplicates import DuplicateCandidate, DuplicateScan, PatientMerge
+from NaiveHIS.models.discharge import DischargeSummary
+from NaiveHIS.models.audit import AuditEvent
+from NaiveHIS.models.archive import ArchivedRecord
+from NaiveHIS.models.hl7 import PatientIdentifier, CaseIdentifier, ReceivedMessage, OutboundMessage
+from NaiveHIS.models.attachments import Blob, Attachment
+from NaiveHIS.models.dicom import DicomStudy, DicomSeries, DicomInstance
+from NaiveHIS.models.legacy import LegacyRecord
+from NaiveHIS.models.jobs import Job
+from NaiveHIS.models.census import DailyCensus
@@ -2,12 +2,12 @@ import django.contrib.auth.models
 from django.db import models
 from django.contrib import admin
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from itertools import count
 
-from .common import TimeStampedMixin, PersonMixin, AddressRequiredMixin
+from .common import TimeStampedMixin, PersonMixin, PersonQuerySet, AddressRequiredMixin
 from .objects import Department
 from .medical import Discipline
 
@@ -91,8 +91,9 @@ class HISAccount(AbstractBaseUser, TimeStampedMixin, PermissionsMixin):
     def has_perm(self, perm, obj=None):
         return self.is_admin or perm in self.role.perms
 
-    @property
+    @cached_property
     def role(self):
+        # looked up once per loaded account, every permission check asks for it
         for klass in (HISAccount, *Employee.__subclasses__()):
             fieldname = klass.__name__.lower()
             if hasattr(self, fieldname):
@@ -138,7 +139,7 @@ def EmployeeManagerFactory(klass):
             return employee
 
         def get_queryset(self):
-            return QuerySet(model=klass)
+            return PersonQuerySet(model=klass, using=self._db)
 
     return EmployeeManager
 
@@ -147,7 +148,7 @@ class Employee(HISAccount, PersonMixin, AddressRequiredMixin):
     department = models.ForeignKey(to=Department, on_delete=models.DO_NOTHING, verbose_name=_('Abteilung'))
     rank = models.CharField(max_length=64, verbose_name=_('Rang'))
 
-    class Meta:
+    class Meta(PersonMixin.Meta):
         verbose_name = _('Angestellte_r')
         verbose_name_plural = _('Angestellte')
         abstract = True
@@ -163,7 +164,7 @@ class AdministrativeEmployee(Employee):
 
     perms = ADMINISTRATIVE_EMPLOYEE_PERMS
 
-    class Meta:
+    class Meta(Employee.Meta):
         verbose_name = _('Verwaltungsangestellte_r')
         verbose_name_plural = _('Verwaltungsangestellte')
 
@@ -191,7 +192,7 @@ class Doctor(Employee):
     def qualifications(self):
         return [dq.qualification for dq in DoctorQualification.objects.filter(doctor=self)]
 
-    class Meta:
+    class Meta(Employee.Meta):
         verbose_name = _('Arzt/Ärztin')
         verbose_name_plural = _('Ärzte')
 
@@ -218,7 +219,7 @@ class Nurse(Employee):
         NURSING_INTERN = ('intern', _('Krankenpflege-Praktikant_in'))
 
     perms = NURSE_PERMS
-    class Meta:
+    class Meta(Employee.Meta):
         verbose_name = _('Krankenpflegekraft')
         verbose_name_plural = _('Krankenpflegekräfte')
 
@@ -239,7 +240,7 @@ class GeneralPersonnel(Employee):
     perms = GENERALPERSONNEL_PERMS
     function = models.CharField(max_length=64, choices=Function.choices, verbose_name=_('Funktion'))
 
-    class Meta:
+    class Meta(Employee.Meta):
         verbose_name = _('Sonstige_r Beschäftigte_r')
         verbose_name_plural = _('Sonstige Beschäftigte')
 
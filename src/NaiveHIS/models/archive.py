@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+ARCHIVE_DATABASE = 'archive'
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts datetimes to milliseconds, archived rows keep them as they were
+        if isinstance(o, datetime):
+            return o.isoformat()
+
+        return super().default(o)
+
+
+class ArchivedRecord(models.Model):
+    """
+    A row of a closed case, or of anything attached to it, moved out of the hot tables by `services.archive`.
+    Lives in the archive database, see `routers.ArchiveRouter`.
+    """
+
+    model: str = models.CharField(max_length=64, verbose_name=_('Datentyp'))
+    object_id: int = models.BigIntegerField(verbose_name=_('Datensatz'))
+    case_id: int = models.BigIntegerField(db_index=True, verbose_name=_('Fall'))
+    patient_id: int = models.BigIntegerField(db_index=True, verbose_name=_('Patient_in'))
+    closed_at: datetime = models.DateTimeField(verbose_name=_('Fall abgeschlossen'))
+    archived_at: datetime = models.DateTimeField(auto_now_add=True, verbose_name=_('Archiviert'))
+    # field values by attname, e.g. {'id': 1, 'case_id': 2, 'text': '...'}
+    data: dict = models.JSONField(encoder=ArchiveJSONEncoder)
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} aus Fall {self.case_id}'
+
+    class Meta:
+        verbose_name = _('Archivierter Datensatz')
+        verbose_name_plural = _('Archiv')
+        ordering = ('case_id', 'model', 'object_id')
+        # archiving a chunk again after an interruption skips the rows that made it already
+        unique_together = ('model', 'object_id')
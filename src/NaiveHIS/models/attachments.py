@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .accounts import HISAccount
+from .tasks import ExaminationReport
+
+
+class Blob(models.Model):
+    """File content in the blob store, shared by all attachments with the same content, see `blobs`."""
+
+    sha256: str = models.CharField(max_length=64, primary_key=True, verbose_name=_('SHA-256'))
+    size: int = models.BigIntegerField(verbose_name=_('Größe'))
+    # renewed whenever the content is stored again, recently stored blobs are kept by `collect_blobs`
+    stored_at: datetime = models.DateTimeField(default=timezone.now, verbose_name=_('Gespeichert'))
+
+    def __str__(self):
+        return self.sha256
+
+    class Meta:
+        verbose_name = _('Datei')
+        verbose_name_plural = _('Dateien')
+
+
+class Attachment(models.Model):
+    # outlives its report when that is archived, so the blob stays referenced
+    report: ExaminationReport = models.ForeignKey(to=ExaminationReport, on_delete=models.DO_NOTHING,
+                                                  db_constraint=False, related_name='attachments',
+                                                  verbose_name=_('Untersuchungsreport'))
+    blob: Blob = models.ForeignKey(to=Blob, on_delete=models.PROTECT, related_name='attachments',
+                                   verbose_name=_('Datei'))
+    filename: str = models.CharField(max_length=255, verbose_name=_('Dateiname'))
+    content_type: str = models.CharField(max_length=127, verbose_name=_('Dateityp'))
+    uploaded_by: HISAccount | None = models.ForeignKey(to=HISAccount, on_delete=models.DO_NOTHING, blank=True,
+                                                       null=True, verbose_name=_('Hochgeladen von'))
+    created_at: datetime = models.DateTimeField(auto_now_add=True, verbose_name=_('Hochgeladen'))
+
+    def __str__(self):
+        return self.filename
+
+    class Meta:
+        verbose_name = _('Anhang')
+        verbose_name_plural = _('Anhänge')
+        ordering = ('created_at',)
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .accounts import HISAccount
+from .objects import Patient
+
+
+class AuditEvent(models.Model):
+    """
+    Who viewed or changed which record, written in batches by `audit.AuditLog`.
+    Rows are never updated or deleted, the foreign keys have no constraints so events outlive their subjects.
+    """
+
+    class Action(models.TextChoices):
+        VIEW = ('view', _('Angesehen'))
+        ADD = ('add', _('Angelegt'))
+        CHANGE = ('change', _('Geändert'))
+        DELETE = ('delete', _('Gelöscht'))
+
+    # the time of the access, not of the insert
+    timestamp: datetime = models.DateTimeField(default=timezone.now, verbose_name=_('Zeitpunkt'))
+    user: HISAccount | None = models.ForeignKey(to=HISAccount, on_delete=models.DO_NOTHING, db_constraint=False,
+                                                blank=True, null=True, related_name='+', verbose_name=_('Nutzer'))
+    action: str = models.CharField(max_length=8, choices=Action.choices, verbose_name=_('Aktion'))
+
+    model: str = models.CharField(max_length=64, verbose_name=_('Datentyp'))
+    object_id: str = models.CharField(max_length=64, verbose_name=_('Datensatz'))
+    object_repr: str = models.CharField(max_length=200, verbose_name=_('Bezeichnung'))
+    patient: Patient | None = models.ForeignKey(to=Patient, on_delete=models.DO_NOTHING, db_constraint=False,
+                                                blank=True, null=True, related_name='+', verbose_name=_('Patient_in'))
+    message: str = models.TextField(blank=True, verbose_name=_('Details'))
+
+    def __str__(self):
+        return f'{self.user_id} {self.action} {self.model} {self.object_id} am {self.timestamp}'
+
+    class Meta:
+        verbose_name = _('Protokolleintrag')
+        verbose_name_plural = _('Zugriffsprotokoll')
+        ordering = ('-timestamp',)
+        indexes = [
+            models.Index(fields=['patient', 'timestamp']),
+            models.Index(fields=['user', 'timestamp']),
+        ]
@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .objects import Department
+
+# movements counted per department and day, see `services.census`
+FLOWS = ('admissions', 'discharges', 'transfers_in', 'transfers_out')
+
+
+class DailyCensus(models.Model):
+    """
+    Rollup of the patients of a department on a day, maintained by `services.census`. Days without movements have no
+    row, their census is the one of the last row before them.
+    """
+
+    department: Department = models.ForeignKey(to=Department, on_delete=models.CASCADE, related_name='+',
+                                               verbose_name=_('Abteilung'))
+    day: date = models.DateField(verbose_name=_('Tag'))
+    # patients in the department at the end of the day
+    census: int = models.IntegerField(default=0, verbose_name=_('Belegung'))
+    admissions: int = models.IntegerField(default=0, verbose_name=_('Aufnahmen'))
+    discharges: int = models.IntegerField(default=0, verbose_name=_('Entlassungen'))
+    transfers_in: int = models.IntegerField(default=0, verbose_name=_('Verlegungen hinein'))
+    transfers_out: int = models.IntegerField(default=0, verbose_name=_('Verlegungen hinaus'))
+
+    def __str__(self):
+        return f'Belegung {self.department} am {self.day}'
+
+    class Meta:
+        verbose_name = _('Tagesbelegung')
+        verbose_name_plural = _('Tagesbelegungen')
+        ordering = ['-day', 'department']
+        unique_together = ('department', 'day')
+        # range queries of all departments
+        indexes = [models.Index(fields=['day'])]
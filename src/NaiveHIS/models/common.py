@@ -1,5 +1,8 @@
-from datetime import datetime
-from django.db import models
+from collections import Counter
+from datetime import datetime, date, timedelta
+from django.db import models, transaction
+from django.db.models.functions import Concat, ExtractDay, ExtractMonth, ExtractYear
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -12,7 +15,71 @@ class TimeStampedMixin(models.Model):
         ordering = ['created_at', 'updated_at']
 
 
-class CloseableManager(models.Manager):
+class CloseableQuerySet(models.QuerySet):
+    def _unique_with_closed_at(self) -> list[str]:
+        """Fields that are unique together with the closing time, e.g. the patient of a case."""
+        return [field for together in self.model._meta.unique_together if 'closed_at' in together
+                for field in together if field != 'closed_at']
+
+    def close(self, *args, closed_at: datetime | dict[int, datetime] | None = None, **kwargs) -> int:
+        """
+        Close all open objects of this queryset and return their number. The model's `on_bulk_close` runs in the
+        same transaction, with the arguments passed on.
+        `closed_at` is either the closing time of all objects or one per primary key, e.g. the discharge times an
+        interface reports. Then only the objects in it are closed, with a CASE per UPDATE, and `on_bulk_close` gets
+        the closing times by primary key as well.
+        Objects that would close at the same time as another one of e.g. the same patient, which the closing time is
+        unique together with, close a microsecond after each other. Usually that's a single UPDATE, otherwise one per
+        offset, and `on_bulk_close` is called per offset as well.
+        """
+        by_pk = closed_at if isinstance(closed_at, dict) else None
+        closed_at = closed_at or timezone.now()
+        unique_with = self._unique_with_closed_at()
+
+        with transaction.atomic(using=self.db):
+            queryset = self.filter(closed_at=None) if by_pk is None else self.filter(closed_at=None, pk__in=by_pk)
+            rows = list(queryset.select_for_update().order_by('pk').values_list('pk', *unique_with))
+
+            by_offset, seen = {}, Counter()
+            for pk, *key in rows:
+                key = (by_pk[pk] if by_pk is not None else closed_at, *key)
+                # without unique fields every object closes at the given time
+                by_offset.setdefault(seen[key] if unique_with else 0, []).append(pk)
+                seen[key] += 1
+
+            for offset, pks in sorted(by_offset.items()):
+                closed = self.model._base_manager.using(self.db).filter(pk__in=pks)
+                if by_pk is None:
+                    at = closed_at + timedelta(microseconds=offset)
+                    closed.update(closed_at=at, updated_at=at)
+                else:
+                    at = {pk: by_pk[pk] + timedelta(microseconds=offset) for pk in pks}
+                    closed.update(closed_at=models.Case(*(models.When(pk=pk, then=models.Value(time))
+                                                          for pk, time in at.items()),
+                                                        output_field=models.DateTimeField()),
+                                  updated_at=timezone.now())
+                self.model.on_bulk_close(closed, at, *args, **kwargs)
+
+        return len(rows)
+
+    def reopen(self, *args, **kwargs) -> int:
+        """
+        Reopen all closed objects of this queryset with a single UPDATE and return their number.
+        The model's `on_bulk_reopen` runs in the same transaction before the UPDATE, while the closing times are
+        still there.
+        """
+        with transaction.atomic(using=self.db):
+            pks = list(self.exclude(closed_at=None).select_for_update().values_list('pk', flat=True))
+
+            if pks:
+                reopened = self.model._base_manager.using(self.db).filter(pk__in=pks)
+                self.model.on_bulk_reopen(reopened, *args, **kwargs)
+                reopened.update(closed_at=None, updated_at=timezone.now())
+
+        return len(pks)
+
+
+class CloseableManager(models.Manager.from_queryset(CloseableQuerySet)):
     @property
     def open_objects(self):
         return self.filter(closed_at=None)
@@ -26,6 +93,22 @@ class CloseableMixin(TimeStampedMixin):
     closed_at: datetime | None = models.DateTimeField(blank=True, null=True, default=None,
                                                       verbose_name=_('Abschlusszeitpunkt'))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered to tell whether saving closes the object, see `closed_by_save`
+        instance._loaded_closed_at = instance.__dict__.get('closed_at', models.DEFERRED)
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_closed_at = self.closed_at
+
+    @property
+    def closed_by_save(self) -> bool:
+        """Whether the object is closed but wasn't when it was loaded, valid until the end of `save`."""
+        return self.closed_at is not None and getattr(self, '_loaded_closed_at', None) is None
+
     @property
     def opened_at(self):
         return self.created_at
@@ -39,12 +122,24 @@ class CloseableMixin(TimeStampedMixin):
         return not self.is_open
 
     def close(self, *args, **kwargs):
-        self.closed_at = datetime.now()
+        self.closed_at = timezone.now()
         self.on_close(*args, **kwargs)
 
     def on_close(self, *args, **kwargs):
         pass
 
+    @classmethod
+    def on_bulk_close(cls, queryset, closed_at: datetime | dict[int, datetime], *args, **kwargs):
+        """
+        Called by `CloseableQuerySet.close` with the objects that were just closed and their closing time, or their
+        closing times by primary key.
+        Falls back to calling `on_close` per object, models with expensive hooks should override this with a set
+        based version.
+        """
+        if cls.on_close is not CloseableMixin.on_close:
+            for obj in queryset:
+                obj.on_close(*args, **kwargs)
+
     def reopen(self, *args, **kwargs):
         self.closed_at = None
         self.on_reopen(*args, **kwargs)
@@ -52,6 +147,13 @@ class CloseableMixin(TimeStampedMixin):
     def on_reopen(self, *args, **kwargs):
         pass
 
+    @classmethod
+    def on_bulk_reopen(cls, queryset, *args, **kwargs):
+        """Called by `CloseableQuerySet.reopen` with the objects about to be reopened, see `on_bulk_close`."""
+        if cls.on_reopen is not CloseableMixin.on_reopen:
+            for obj in queryset:
+                obj.on_reopen(*args, **kwargs)
+
     class Meta(TimeStampedMixin.Meta):
         abstract = True
         ordering = ['closed_at', 'created_at', 'updated_at']
@@ -85,6 +187,43 @@ AddressOptionalMixin = _AddressMixinFactory(address_required=False)
 AddressRequiredMixin = _AddressMixinFactory(address_required=True)
 
 
+def age_expression(field: str = 'date_of_birth', today: date | None = None) -> models.ExpressionWrapper:
+    """Age in completed years, computed by the database. Evaluates to NULL if the date of birth is unknown."""
+    today = today or timezone.localdate()
+
+    # comparing dates as YYYYMMDD numbers takes care of birthdays later in the year
+    today_number = today.year * 10000 + today.month * 100 + today.day
+    birthday_number = ExtractYear(field) * 10000 + ExtractMonth(field) * 100 + ExtractDay(field)
+
+    return models.ExpressionWrapper((models.Value(today_number) - birthday_number) / 10000,
+                                    output_field=models.IntegerField())
+
+
+def person_expression() -> Concat:
+    """Same format as `PersonMixin.person`, computed by the database."""
+    title = models.Case(
+        models.When(title__gt='', then=Concat('title', models.Value(' '))),
+        default=models.Value(''),
+    )
+
+    return Concat(title, 'first_name', models.Value(' '), 'last_name', output_field=models.CharField())
+
+
+def person_annotations(today: date | None = None) -> dict[str, models.Expression]:
+    return {
+        'age': age_expression(today=today),
+        'person_name': person_expression(),
+    }
+
+
+class PersonQuerySet(models.QuerySet):
+    def with_age(self, today: date | None = None):
+        return self.annotate(age=age_expression(today=today))
+
+    def with_person_name(self):
+        return self.annotate(person_name=person_expression())
+
+
 class PersonMixin(models.Model):
     gender = models.CharField(max_length=1, verbose_name=_('Geschlecht'),
                               choices=(('m', _('männlich')),
@@ -122,3 +261,8 @@ class PersonMixin(models.Model):
         verbose_name = _('Person')
         verbose_name_plural = _('Personen')
         abstract = True
+        # name and age columns in the admin sort on these
+        indexes = [
+            models.Index(fields=['last_name', 'first_name']),
+            models.Index(fields=['date_of_birth']),
+        ]
@@ -0,0 +1,89 @@
+from datetime import date, datetime, time
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .objects import Patient
+from .tasks import Case, ExaminationOrder
+
+
+class DicomStudy(models.Model):
+    """Imaging study found by the DICOM indexer, linked to the patient, case and examination order it belongs to."""
+
+    study_instance_uid: str = models.CharField(max_length=64, unique=True, verbose_name=_('Study Instance UID'))
+    patient: Patient | None = models.ForeignKey(to=Patient, on_delete=models.SET_NULL, blank=True, null=True,
+                                                related_name='dicom_studies', verbose_name=_('Patient_in'))
+    # outlive their case and order when those are archived, the links are kept
+    case: Case | None = models.ForeignKey(to=Case, on_delete=models.DO_NOTHING, db_constraint=False, blank=True,
+                                          null=True, related_name='dicom_studies', verbose_name=_('Fall'))
+    examination_order: ExaminationOrder | None = models.ForeignKey(to=ExaminationOrder, on_delete=models.DO_NOTHING,
+                                                                   db_constraint=False, blank=True, null=True,
+                                                                   related_name='dicom_studies',
+                                                                   verbose_name=_('Untersuchungsauftrag'))
+
+    # as written in the files, kept to link studies that arrive before their patient
+    patient_identifier: str = models.CharField(max_length=64, blank=True, verbose_name=_('Patienten-ID'))
+    issuer: str = models.CharField(max_length=64, blank=True, verbose_name=_('Vergebende Stelle'))
+    patient_name: str = models.CharField(max_length=128, blank=True, verbose_name=_('Patientenname'))
+    patient_birth_date: date | None = models.DateField(blank=True, null=True, verbose_name=_('Geburtsdatum'))
+
+    accession_number: str = models.CharField(max_length=16, blank=True, db_index=True,
+                                             verbose_name=_('Accession Number'))
+    study_date: date | None = models.DateField(blank=True, null=True, db_index=True,
+                                               verbose_name=_('Untersuchungsdatum'))
+    study_time: time | None = models.TimeField(blank=True, null=True, verbose_name=_('Untersuchungszeit'))
+    description: str = models.CharField(max_length=64, blank=True, verbose_name=_('Beschreibung'))
+    indexed_at: datetime = models.DateTimeField(auto_now=True, verbose_name=_('Indiziert'))
+
+    def __str__(self):
+        return f'{self.description or self.study_instance_uid} vom {self.study_date}'
+
+    class Meta:
+        verbose_name = _('DICOM-Studie')
+        verbose_name_plural = _('DICOM-Studien')
+        ordering = ('-study_date', '-study_time')
+        indexes = [
+            models.Index(fields=['patient', 'study_date']),
+        ]
+
+
+class DicomSeries(models.Model):
+    study: DicomStudy = models.ForeignKey(to=DicomStudy, on_delete=models.CASCADE, related_name='series',
+                                          verbose_name=_('Studie'))
+    series_instance_uid: str = models.CharField(max_length=64, unique=True, verbose_name=_('Series Instance UID'))
+    modality: str = models.CharField(max_length=16, blank=True, db_index=True, verbose_name=_('Modalität'))
+    body_part: str = models.CharField(max_length=16, blank=True, db_index=True, verbose_name=_('Körperregion'))
+    number: int | None = models.IntegerField(blank=True, null=True, verbose_name=_('Seriennummer'))
+    description: str = models.CharField(max_length=64, blank=True, verbose_name=_('Beschreibung'))
+
+    def __str__(self):
+        return f'{self.modality} {self.description or self.series_instance_uid}'
+
+    class Meta:
+        verbose_name = _('DICOM-Serie')
+        verbose_name_plural = _('DICOM-Serien')
+        ordering = ('number',)
+        indexes = [
+            models.Index(fields=['modality', 'body_part']),
+        ]
+
+
+class DicomInstance(models.Model):
+    """One indexed file. Size and modification time tell a rescan whether the file has to be read again."""
+
+    series: DicomSeries = models.ForeignKey(to=DicomSeries, on_delete=models.CASCADE, related_name='instances',
+                                            verbose_name=_('Serie'))
+    sop_instance_uid: str = models.CharField(max_length=64, db_index=True, verbose_name=_('SOP Instance UID'))
+    path: str = models.CharField(max_length=1024, unique=True, verbose_name=_('Pfad'))
+    size: int = models.BigIntegerField(verbose_name=_('Größe'))
+    mtime_ns: int = models.BigIntegerField(verbose_name=_('Geändert'))
+    # the header in the DICOM JSON model, without pixel data and other large values
+    header: dict = models.JSONField(default=dict, verbose_name=_('Header'))
+    indexed_at: datetime = models.DateTimeField(auto_now=True, verbose_name=_('Indiziert'))
+
+    def __str__(self):
+        return self.path
+
+    class Meta:
+        verbose_name = _('DICOM-Datei')
+        verbose_name_plural = _('DICOM-Dateien')
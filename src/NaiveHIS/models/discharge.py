@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .common import TimeStampedMixin
+from .objects import Room
+from .tasks import Case
+
+
+class DischargeSummary(TimeStampedMixin):
+    """Written by `services.discharge` when a case is closed, removed again if the case is reopened."""
+
+    case: Case = models.OneToOneField(to=Case, on_delete=models.CASCADE, related_name='discharge_summary',
+                                      verbose_name=_('Fall'))
+    discharged_at: datetime = models.DateTimeField(db_index=True, verbose_name=_('Entlassungszeitpunkt'))
+    # the room the patient was released from, if they had been transported into one
+    room: Room | None = models.ForeignKey(to=Room, on_delete=models.SET_NULL, blank=True, null=True,
+                                          related_name='+', verbose_name=_('Freigegebener Raum'))
+    closed_orders: int = models.IntegerField(default=0, verbose_name=_('Abgeschlossene Aufträge'))
+
+    def __str__(self):
+        return f'Entlassung zu {self.case} am {self.discharged_at.date()}'
+
+    class Meta(TimeStampedMixin.Meta):
+        verbose_name = _('Entlassung')
+        verbose_name_plural = _('Entlassungen')
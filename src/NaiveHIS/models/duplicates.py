@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .accounts import HISAccount
+from .common import TimeStampedMixin
+from .objects import Patient
+
+
+class DuplicateCandidate(TimeStampedMixin):
+    """A pair of patients that might be the same person, waiting for review."""
+
+    class Status(models.TextChoices):
+        OPEN = ('open', _('Offen'))
+        CONFIRMED = ('confirmed', _('Bestätigt'))
+        REJECTED = ('rejected', _('Abgelehnt'))
+
+    # the patient with the lower id is always stored first, so every pair exists only once
+    patient: Patient = models.ForeignKey(to=Patient, on_delete=models.CASCADE, related_name='duplicate_candidates',
+                                         verbose_name=_('Patient_in'))
+    duplicate: Patient = models.ForeignKey(to=Patient, on_delete=models.CASCADE, related_name='+',
+                                           verbose_name=_('Mögliches Duplikat'))
+    score: float = models.FloatField(verbose_name=_('Ähnlichkeit'))
+    blocking_key: str = models.CharField(max_length=128, verbose_name=_('Blockschlüssel'))
+
+    status: str = models.CharField(max_length=16, choices=Status.choices, default=Status.OPEN, db_index=True,
+                                   verbose_name=_('Status'))
+    reviewed_by: HISAccount | None = models.ForeignKey(to=HISAccount, on_delete=models.SET_NULL, blank=True, null=True,
+                                                       related_name='+', verbose_name=_('Geprüft durch'))
+
+    def __str__(self):
+        return f'{self.patient} / {self.duplicate} ({self.score:.2f})'
+
+    class Meta(TimeStampedMixin.Meta):
+        verbose_name = _('Mögliches Patientenduplikat')
+        verbose_name_plural = _('Mögliche Patientenduplikate')
+        ordering = ['status', '-score']
+        unique_together = ('patient', 'duplicate')
+
+
+class DuplicateScan(TimeStampedMixin):
+    incremental: bool = models.BooleanField(default=False, verbose_name=_('Inkrementell'))
+    since: datetime | None = models.DateTimeField(blank=True, null=True, verbose_name=_('Geänderte Patienten seit'))
+    finished_at: datetime | None = models.DateTimeField(blank=True, null=True, verbose_name=_('Abgeschlossen'))
+    patients_checked: int = models.IntegerField(default=0, verbose_name=_('Geprüfte Patienten'))
+    candidates_found: int = models.IntegerField(default=0, verbose_name=_('Gefundene Kandidaten'))
+
+    def __str__(self):
+        return f'Duplikatsuche vom {self.created_at}'
+
+    class Meta(TimeStampedMixin.Meta):
+        verbose_name = _('Duplikatsuche')
+        verbose_name_plural = _('Duplikatsuchen')
+
+
+class PatientMerge(TimeStampedMixin):
+    """Undo record of a patient merge, see `services.merge`."""
+
+    # no constraint, the survivor may be merged into another patient later on
+    survivor: Patient = models.ForeignKey(to=Patient, on_delete=models.DO_NOTHING, db_constraint=False,
+                                          related_name='+', verbose_name=_('Verbleibende_r Patient_in'))
+    merged_patient_id: int = models.BigIntegerField(verbose_name=_('Zusammengeführte Patienten-ID'))
+    # field values of the merged patient, to restore the row on undo
+    merged_patient_data: dict = models.JSONField(encoder=DjangoJSONEncoder)
+    # foreign keys that were repointed, e.g. {'NaiveHIS.case.patient': [1, 2, 3]}
+    moved: dict = models.JSONField(default=dict)
+    # cases of the merged patient that had to be closed or shifted because of Case.unique_together
+    closed_cases: list = models.JSONField(default=list)
+    shifted_cases: list = models.JSONField(default=list)
+
+    merged_by: HISAccount | None = models.ForeignKey(to=HISAccount, on_delete=models.SET_NULL, blank=True, null=True,
+                                                     related_name='+', verbose_name=_('Zusammengeführt durch'))
+    undone_at: datetime | None = models.DateTimeField(blank=True, null=True, verbose_name=_('Rückgängig gemacht'))
+
+    def __str__(self):
+        return f'Patient {self.merged_patient_id} in {self.survivor_id} zusammengeführt am {self.created_at.date()}'
+
+    class Meta(TimeStampedMixin.Meta):
+        verbose_name = _('Patientenzusammenführung')
+        verbose_name_plural = _('Patientenzusammenführungen')
@@ -0,0 +1,104 @@
+from datetime import datetime
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .objects import Patient
+from .tasks import Case
+
+
+class PatientIdentifier(models.Model):
+    """Id of a patient in another system, e.g. the patient number of the admission system (PID-3)."""
+
+    patient: Patient = models.ForeignKey(to=Patient, on_delete=models.CASCADE, related_name='identifiers',
+                                         verbose_name=_('Patient_in'))
+    authority: str = models.CharField(max_length=64, blank=True, verbose_name=_('Vergebende Stelle'))
+    value: str = models.CharField(max_length=64, verbose_name=_('Kennung'))
+
+    def __str__(self):
+        return f'{self.authority}:{self.value}' if self.authority else self.value
+
+    class Meta:
+        verbose_name = _('Patientenkennung')
+        verbose_name_plural = _('Patientenkennungen')
+        unique_together = ('value', 'authority')
+
+
+class CaseIdentifier(models.Model):
+    """Visit number of a case in another system (PV1-19)."""
+
+    # outlives its case when that is archived, the visit number stays taken
+    case: Case = models.ForeignKey(to=Case, on_delete=models.DO_NOTHING, db_constraint=False,
+                                   related_name='identifiers', verbose_name=_('Fall'))
+    authority: str = models.CharField(max_length=64, blank=True, verbose_name=_('Vergebende Stelle'))
+    value: str = models.CharField(max_length=64, verbose_name=_('Kennung'))
+
+    def __str__(self):
+        return f'{self.authority}:{self.value}' if self.authority else self.value
+
+    class Meta:
+        verbose_name = _('Fallkennung')
+        verbose_name_plural = _('Fallkennungen')
+        unique_together = ('value', 'authority')
+
+
+class ReceivedMessage(models.Model):
+    """Every inbound HL7 message is applied once, its control id is the idempotency key."""
+
+    class Status(models.TextChoices):
+        PROCESSED = ('processed', _('Verarbeitet'))
+        REJECTED = ('rejected', _('Abgelehnt'))
+
+    sender: str = models.CharField(max_length=128, blank=True, verbose_name=_('Absender'))
+    control_id: str = models.CharField(max_length=64, verbose_name=_('Nachrichtenkennung'))
+    message_type: str = models.CharField(max_length=16, verbose_name=_('Nachrichtentyp'))
+    received_at: datetime = models.DateTimeField(auto_now_add=True, verbose_name=_('Empfangen'))
+    status: str = models.CharField(max_length=16, choices=Status.choices, verbose_name=_('Status'))
+    error: str = models.TextField(blank=True, verbose_name=_('Fehler'))
+
+    def __str__(self):
+        return f'{self.message_type} {self.control_id} von {self.sender}'
+
+    class Meta:
+        verbose_name = _('Empfangene HL7-Nachricht')
+        verbose_name_plural = _('Empfangene HL7-Nachrichten')
+        ordering = ('-received_at',)
+        unique_together = ('control_id', 'sender')
+
+
+class OutboundMessage(models.Model):
+    """
+    Message of the outbound feed, one per destination. Rows are written in the transaction of the change they
+    describe, so a message exists exactly if its change was committed. Delivery is in id order per destination.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = ('pending', _('Ausstehend'))
+        SENT = ('sent', _('Gesendet'))
+        FAILED = ('failed', _('Abgelehnt'))
+
+    destination: str = models.CharField(max_length=32, verbose_name=_('Empfänger'))
+    control_id: str = models.CharField(max_length=64, verbose_name=_('Nachrichtenkennung'))
+    message_type: str = models.CharField(max_length=16, verbose_name=_('Nachrichtentyp'))
+    payload: str = models.TextField(verbose_name=_('Nachricht'))
+    created_at: datetime = models.DateTimeField(auto_now_add=True, verbose_name=_('Erstellt'))
+    status: str = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING,
+                                   verbose_name=_('Status'))
+    attempts: int = models.PositiveIntegerField(default=0, verbose_name=_('Zustellversuche'))
+    next_attempt_at: datetime | None = models.DateTimeField(blank=True, null=True,
+                                                            verbose_name=_('Nächster Zustellversuch'))
+    sent_at: datetime | None = models.DateTimeField(blank=True, null=True, verbose_name=_('Gesendet'))
+    error: str = models.TextField(blank=True, verbose_name=_('Fehler'))
+
+    def __str__(self):
+        return f'{self.message_type} {self.control_id} an {self.destination}'
+
+    class Meta:
+        verbose_name = _('Ausgehende HL7-Nachricht')
+        verbose_name_plural = _('Ausgehende HL7-Nachrichten')
+        ordering = ('-id',)
+        unique_together = ('control_id', 'destination')
+        indexes = [
+            # the queue of a destination is read head first
+            models.Index(fields=['destination', 'status', 'id']),
+        ]
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .accounts import HISAccount
+
+
+class Job(models.Model):
+    """
+    Background job, run by the `run_jobs` worker, see `services.jobs`. Queued jobs are claimed by the worker that
+    flips their status first, `attempts` tells apart the runs of a job that is retried.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = ('queued', _('Wartend'))
+        RUNNING = ('running', _('Läuft'))
+        SUCCEEDED = ('succeeded', _('Erfolgreich'))
+        FAILED = ('failed', _('Fehlgeschlagen'))
+        CANCELLED = ('cancelled', _('Abgebrochen'))
+
+    task: str = models.CharField(max_length=64, verbose_name=_('Aufgabe'))
+    arguments: dict = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name=_('Argumente'))
+    # higher runs first
+    priority: int = models.SmallIntegerField(default=0, verbose_name=_('Priorität'))
+    status: str = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED,
+                                   verbose_name=_('Status'))
+    run_after: datetime = models.DateTimeField(default=timezone.now, verbose_name=_('Frühestens ab'))
+
+    attempts: int = models.PositiveSmallIntegerField(default=0, verbose_name=_('Versuche'))
+    max_attempts: int = models.PositiveSmallIntegerField(default=1, verbose_name=_('Maximale Versuche'))
+    worker: str = models.CharField(max_length=64, blank=True, verbose_name=_('Worker'))
+    # written by the worker while the job runs, a job without one for long lost its worker
+    heartbeat_at: datetime | None = models.DateTimeField(blank=True, null=True, verbose_name=_('Lebenszeichen'))
+    cancel_requested: bool = models.BooleanField(default=False, verbose_name=_('Abbruch angefordert'))
+
+    progress: int = models.PositiveIntegerField(default=0, verbose_name=_('Fortschritt'))
+    total: int | None = models.PositiveIntegerField(blank=True, null=True, verbose_name=_('Gesamt'))
+    message: str = models.CharField(max_length=255, blank=True, verbose_name=_('Statusmeldung'))
+    result: dict | None = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder,
+                                           verbose_name=_('Ergebnis'))
+    error: str = models.TextField(blank=True, verbose_name=_('Fehler'))
+
+    created_by: HISAccount | None = models.ForeignKey(to=HISAccount, on_delete=models.SET_NULL, blank=True,
+                                                      null=True, related_name='+', verbose_name=_('Erstellt durch'))
+    created_at: datetime = models.DateTimeField(auto_now_add=True, verbose_name=_('Erstellt'))
+    started_at: datetime | None = models.DateTimeField(blank=True, null=True, verbose_name=_('Gestartet'))
+    finished_at: datetime | None = models.DateTimeField(blank=True, null=True, verbose_name=_('Beendet'))
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+    class Meta:
+        verbose_name = _('Hintergrundaufgabe')
+        verbose_name_plural = _('Hintergrundaufgaben')
+        ordering = ('-id',)
+        indexes = [
+            # the queue is read head first
+            models.Index(fields=['status', '-priority', 'run_after']),
+        ]
@@ -0,0 +1,22 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class LegacyRecord(models.Model):
+    """
+    Row of the old system's database that was migrated, with the object it became. Rows that couldn't be migrated
+    have no object. The highest migrated id of a table is where the migration of that table continues.
+    """
+
+    table: str = models.CharField(max_length=32, verbose_name=_('Tabelle'))
+    legacy_id: int = models.BigIntegerField(verbose_name=_('Alte ID'))
+    model: str = models.CharField(max_length=64, blank=True, verbose_name=_('Modell'))
+    object_id: int | None = models.BigIntegerField(blank=True, null=True, verbose_name=_('Objekt-ID'))
+
+    def __str__(self):
+        return f'{self.table} #{self.legacy_id}'
+
+    class Meta:
+        verbose_name = _('Migrierter Altdatensatz')
+        verbose_name_plural = _('Migrierte Altdatensätze')
+        unique_together = ('table', 'legacy_id')
@@ -1,3 +1,5 @@
+import re
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -42,3 +44,48 @@ class Discipline(models.TextChoices):
 
     def __str__(self):
         return self.label()
+
+
+class Tumor(models.TextChoices):
+    TX = ('TX', _('TX: Primärtumor nicht beurteilbar'))
+    T0 = ('T0', _('T0: Kein Anhalt für Primärtumor'))
+    TIS = ('Tis', _('Tis: Carcinoma in situ'))
+    T1 = ('T1', _('T1: tumorspezifisch, meist klein'))
+    T2 = ('T2', _('T2: tumorspezifisch'))
+    T3 = ('T3', _('T3: tumorspezifisch, meist groß'))
+    T4 = ('T4', _('T4: tumorspezifisch, meist Ausdehnung in benachbartes Gewebe'))
+
+
+class Nodes(models.TextChoices):
+    NX = ('NX', _('NX: Lymphknoten nicht beurteilbar'))
+    N0 = ('N0', _('N0: Keine regionären Lymphknotenmetastasen'))
+    N1 = ('N1', _('N1: tumorspezifisch'))
+    N2 = ('N2', _('N2: tumorspezifisch'))
+    N3 = ('N3', _('N3: tumorspezifisch'))
+
+
+class Metastases(models.TextChoices):
+    M0 = ('M0', _('M0: Keine Fernmetastasen'))
+    M1 = ('M1', _('M1: Fernmetastasen'))
+
+
+# e.g. TisN3M1, pT2 N1 M0, pT3 pN1 cM0 or T1a N0 M0, prefixes and subcategories aren't kept
+_TNM = re.compile(r'(?<![A-Za-z])[cpyra]{0,3}(TX|T0|Tis|T[1-4])[a-d]?'
+                  r'\s*[cpyra]{0,3}(NX|N[0-3])[a-c]?'
+                  r'\s*[cpyra]{0,3}(M[01])[a-c]?',
+                  re.IGNORECASE)
+
+_CODES = {code.upper(): (enum, code) for enum in (Tumor, Nodes, Metastases) for code in enum.values}
+
+
+def parse_staging(text: str) -> tuple[Tumor, Nodes, Metastases]:
+    """The first TNM classification in `text`, raises ValueError without one."""
+    match = _TNM.search(text)
+    if match is None:
+        raise ValueError('Not a valid TNM classification string')
+
+    return tuple(enum(code) for enum, code in (_CODES[group.upper()] for group in match.groups()))
+
+
+def format_staging(tumor: str, nodes: str, metastases: str) -> str:
+    return f'{tumor}{nodes}{metastases}'
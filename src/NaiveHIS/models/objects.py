@@ -1,7 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
-from .common import TimeStampedMixin, PersonMixin, AddressOptionalMixin
+from .common import TimeStampedMixin, PersonMixin, PersonQuerySet, AddressOptionalMixin
 from .medical import Discipline
 
 
@@ -31,13 +31,18 @@ class DepartmentQualifications(TimeStampedMixin):
         verbose_name_plural = _('Abteilungsqualifikationen')
 
 
-class PatientManager(models.Manager):
+class PatientManager(models.Manager.from_queryset(PersonQuerySet)):
     def cases(self):
         ...
 
 
 class Patient(PersonMixin, AddressOptionalMixin):
-    class Meta:
+    # tracked for incremental exports, patients last saved before it was added have none
+    updated_at = models.DateTimeField(auto_now=True, blank=True, null=True, verbose_name=_('Zuletzt bearbeitet'))
+
+    objects = PatientManager()
+
+    class Meta(PersonMixin.Meta):
         ordering = ('last_name',)
         verbose_name = _('Patient_in')
         verbose_name_plural = _('Patienten')
@@ -103,6 +103,10 @@ _report_perms = (
     'NaiveHIS.add_findingsreport',
     'NaiveHIS.view_findingsreport',
     'NaiveHIS.change_findingsreport',
+    'NaiveHIS.add_attachment',
+    'NaiveHIS.view_attachment',
+    'NaiveHIS.view_dicomstudy',
+    'NaiveHIS.change_dicomstudy',
 )
 
 DOCTOR_PERMS = (
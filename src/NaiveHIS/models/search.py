@@ -0,0 +1,37 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .common import TimeStampedMixin
+from .objects import Patient
+
+
+class PatientSearchIndex(TimeStampedMixin):
+    """Search keys of a patient, maintained by `services.search.index_patients`."""
+
+    patient = models.OneToOneField(to=Patient, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='search_index', verbose_name=_('Patient'))
+
+    first_name = models.CharField(max_length=64, verbose_name=_('Vorname (normalisiert)'))
+    last_name = models.CharField(max_length=64, db_index=True, verbose_name=_('Nachname (normalisiert)'))
+    first_name_phonetic = models.CharField(max_length=64, db_index=True, verbose_name=_('Vorname (phonetisch)'))
+    last_name_phonetic = models.CharField(max_length=64, db_index=True, verbose_name=_('Nachname (phonetisch)'))
+    date_of_birth = models.DateField(blank=True, null=True, db_index=True, verbose_name=_('Geburtsdatum'))
+
+    def __str__(self):
+        return f'{self.first_name} {self.last_name}'
+
+    class Meta(TimeStampedMixin.Meta):
+        verbose_name = _('Patientensuchindex')
+        verbose_name_plural = _('Patientensuchindex')
+
+
+class PatientTrigram(models.Model):
+    patient = models.ForeignKey(to=Patient, on_delete=models.CASCADE, related_name='search_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        verbose_name = _('Patiententrigramm')
+        verbose_name_plural = _('Patiententrigramme')
+        indexes = [
+            models.Index(fields=['trigram', 'patient']),
+        ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
 from datetime import datetime
@@ -7,6 +8,7 @@ from typing import Optional
 from .common import TimeStampedMixin, CloseableMixin, CloseableManager
 from .accounts import HISAccount, Employee, GeneralPersonnel, Doctor, AdministrativeEmployee
 from .objects import Patient, Department, Room
+from .medical import Tumor, Nodes, Metastases, format_staging
 
 
 class Case(CloseableMixin):
@@ -41,6 +43,37 @@ class Case(CloseableMixin):
 
         return None
 
+    def save(self, *args, **kwargs):
+        from ..services.discharge import discharge_cases, undo_discharge
+
+        # the discharge follows the saved closing time, `close` and `reopen` only set it
+        loaded = getattr(self, '_loaded_closed_at', None)
+        if loaded is models.DEFERRED:
+            loaded = Case._base_manager.filter(pk=self.pk).values_list('closed_at', flat=True).first()
+
+        with transaction.atomic(using=kwargs.get('using')):
+            # reopened or closed at another time, undone while the database still has the old closing time
+            if loaded is not None and loaded != self.closed_at:
+                undo_discharge(Case._base_manager.filter(pk=self.pk))
+
+            super().save(*args, **kwargs)
+
+            if self.closed_at is not None and self.closed_at != loaded:
+                discharge_cases(Case._base_manager.filter(pk=self.pk))
+
+    @classmethod
+    def on_bulk_close(cls, queryset, closed_at: datetime | dict[int, datetime], *args, **kwargs):
+        from ..services.discharge import discharge_cases
+
+        # at the closing times the cases have now
+        discharge_cases(queryset)
+
+    @classmethod
+    def on_bulk_reopen(cls, queryset, *args, **kwargs):
+        from ..services.discharge import undo_discharge
+
+        undo_discharge(queryset)
+
     class Meta(CloseableMixin.Meta):
         verbose_name = _('Fall')
         verbose_name_plural = _('Fälle')
@@ -80,6 +113,39 @@ class TransportOrder(Order):
     def __str__(self):
         return f'Transportauftrag für {self.case.patient}, von {self.from_room}, nach {self.to_room}'
 
+    def save(self, *args, **kwargs):
+        from ..services.discharge import transported
+
+        # carried out transports occupy their destination, see services.discharge
+        loaded = getattr(self, '_loaded_closed_at', None)
+        if loaded is models.DEFERRED:
+            loaded = TransportOrder._base_manager.filter(pk=self.pk).values_list('closed_at', flat=True).first()
+
+        with transaction.atomic(using=kwargs.get('using')):
+            if loaded is not None and loaded != self.closed_at:
+                transported(TransportOrder._base_manager.filter(pk=self.pk), sign=-1)
+
+            super().save(*args, **kwargs)
+
+            if self.closed_at is not None and self.closed_at != loaded:
+                transported(TransportOrder._base_manager.filter(pk=self.pk))
+
+    @classmethod
+    def on_bulk_close(cls, queryset, closed_at: datetime, *args, discharge: bool = False, **kwargs):
+        from ..hl7 import events
+        from ..services.discharge import transported
+
+        # orders that are still open on discharge weren't carried out
+        if not discharge:
+            events.transferred(queryset)
+            transported(queryset)
+
+    @classmethod
+    def on_bulk_reopen(cls, queryset, *args, **kwargs):
+        from ..services.discharge import transported
+
+        transported(queryset, sign=-1)
+
     class Meta(Order.Meta):
         verbose_name = _('Transportauftrag')
         verbose_name_plural = _('Transportaufträge')
@@ -91,6 +157,28 @@ class TransferOrder(Order):
     to_department: Department = models.ForeignKey(to=Department, on_delete=models.DO_NOTHING,
                                                   related_name='to_department', verbose_name=_('Nach'))
 
+    def clean(self):
+        from ..services.census import current_department
+
+        super().clean()
+
+        # the census books the transfer out of the department the case is in
+        if self.closed_at is None and self.case_id is not None and self.from_department_id is not None:
+            department = current_department(self.case)
+            if self.from_department_id != department:
+                raise ValidationError({'from_department': _('Der Fall liegt in %(department)s.') % {
+                    'department': Department.objects.get(pk=department)}})
+
+    @classmethod
+    def on_bulk_close(cls, queryset, closed_at: datetime, *args, discharge: bool = False, **kwargs):
+        from ..hl7 import events
+        from ..services import census
+
+        # orders that are still open on discharge weren't carried out
+        if not discharge:
+            events.transferred(queryset)
+            census.transferred(queryset)
+
     class Meta(Order.Meta):
         verbose_name = _('Überweisungsauftrag')
         verbose_name_plural = _('Überweisungsaufträge')
@@ -118,7 +206,8 @@ class Report(TimeStampedMixin):
     case: Case = models.ForeignKey(to=Case, on_delete=models.DO_NOTHING, verbose_name=_('Betroffener Fall'))
 
     def __str__(self):
-        return f'Report {self.id} von {self.written_by}, betreffend {self.patient}, geschrieben am {self.created_at.date()}'
+        return f'Report {self.id} von {self.written_by}, betreffend {self.case.patient}, ' \
+               f'geschrieben am {self.created_at.date()}'
 
     class Meta:
         abstract = True
@@ -149,6 +238,24 @@ class DiagnosisReport(Report):
                                                         on_delete=models.DO_NOTHING)  # , verbose_name=_('Behandlungsauftrag'))
     text: str = models.TextField(verbose_name=_('Diagnose'))
 
+    # TNM staging of tumor diagnoses, either all three or none
+    tumor: str = models.CharField(max_length=3, choices=Tumor.choices, blank=True, db_index=True,
+                                  verbose_name=_('T (Primärtumor)'))
+    nodes: str = models.CharField(max_length=2, choices=Nodes.choices, blank=True, db_index=True,
+                                  verbose_name=_('N (Lymphknoten)'))
+    metastases: str = models.CharField(max_length=2, choices=Metastases.choices, blank=True, db_index=True,
+                                       verbose_name=_('M (Fernmetastasen)'))
+
+    @property
+    def staging(self) -> str:
+        return format_staging(self.tumor, self.nodes, self.metastases) if self.tumor else ''
+
+    def clean(self):
+        super().clean()
+
+        if len({bool(self.tumor), bool(self.nodes), bool(self.metastases)}) > 1:
+            raise ValidationError(_('Das TNM-Stadium braucht T, N und M.'))
+
     class Meta(Report.Meta):
         verbose_name = _('Diagnosereport')
         verbose_name_plural = _('Diagnosereports')
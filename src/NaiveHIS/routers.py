@@ -0,0 +1,28 @@
+from .models.archive import ARCHIVE_DATABASE
+
+ARCHIVE_MODELS = {'archivedrecord'}
+
+
+class ArchiveRouter:
+    """Keeps archived records in the archive database, and everything else out of it."""
+
+    @staticmethod
+    def _is_archive(model) -> bool:
+        return model._meta.app_label == 'NaiveHIS' and model._meta.model_name in ARCHIVE_MODELS
+
+    def db_for_read(self, model, **hints):
+        return ARCHIVE_DATABASE if self._is_archive(model) else None
+
+    def db_for_write(self, model, **hints):
+        return ARCHIVE_DATABASE if self._is_archive(model) else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        is_archive = app_label == 'NaiveHIS' and model_name in ARCHIVE_MODELS
+
+        if db == ARCHIVE_DATABASE:
+            return is_archive
+
+        return False if is_archive else None
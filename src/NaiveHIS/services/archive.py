@@ -0,0 +1,203 @@
+"""
+Archiving closed cases.
+
+Cases closed for longer than `settings.ARCHIVE_CASES_AFTER_DAYS` are copied, together with their orders, reports and
+discharge summaries (see `ARCHIVED_MODELS`), into the archive database and then deleted from the hot tables, one chunk
+of cases at a time. Copying is idempotent, so an interrupted run is resumed by simply running it again.
+
+Archived rows are read back as model instances, linked to their archived case and to the departments and rooms they
+refer to. Rows that refer to archived ones but are kept in the hot tables keep their ids (see `KEPT_LINKS`).
+"""
+from datetime import timedelta
+from graphlib import TopologicalSorter
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .. import cache
+from ..models.archive import ARCHIVE_DATABASE, ArchivedRecord
+from ..models.attachments import Attachment
+from ..models.dicom import DicomStudy
+from ..models.discharge import DischargeSummary
+from ..models.hl7 import CaseIdentifier
+from ..models.objects import Department, Room
+from ..models.tasks import (
+    AnamnesisReport,
+    Case,
+    DiagnosisReport,
+    ExaminationOrder,
+    ExaminationReport,
+    FindingsReport,
+    TherapyReport,
+    TransferOrder,
+    TransportOrder,
+    TreatmentOrder,
+)
+
+
+# the archived models with the lookup to their case
+ARCHIVED_MODELS: dict[type[models.Model], str] = {
+    Case: 'pk',
+    DischargeSummary: 'case',
+    TransportOrder: 'case',
+    TransferOrder: 'case',
+    TreatmentOrder: 'case',
+    ExaminationOrder: 'case',
+    AnamnesisReport: 'case',
+    DiagnosisReport: 'case',
+    ExaminationReport: 'case',
+    TherapyReport: 'case',
+    FindingsReport: 'case',
+}
+
+# rows that only refer to archived ones are kept with the ids they refer to, without a database constraint: visit
+# numbers stay taken, blobs referenced and studies linked to the case and order they were acquired for
+KEPT_LINKS: dict[type[models.Model], tuple[str, ...]] = {
+    CaseIdentifier: ('case',),
+    DicomStudy: ('case', 'examination_order'),
+    Attachment: ('report',),
+}
+
+
+def _deletion_order(attached: dict[type[models.Model], str]) -> list[type[models.Model]]:
+    # rows have to go before the rows they reference
+    referencing = {model: set() for model in attached}
+    for model in attached:
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model in attached and field.related_model is not model:
+                referencing[field.related_model].add(model)
+
+    return list(TopologicalSorter(referencing).static_order())
+
+
+def _records(case_pks: list[int], attached: dict[type[models.Model], str]) -> Iterator[ArchivedRecord]:
+    cases = {pk: (patient, closed_at) for pk, patient, closed_at
+             in Case._base_manager.filter(pk__in=case_pks).values_list('pk', 'patient_id', 'closed_at')}
+
+    for model, lookup in attached.items():
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        rows = (model._base_manager
+                .filter(**{f'{lookup}__in': case_pks})
+                .annotate(archived_case=F(lookup))
+                .values('archived_case', *attnames))
+
+        for row in rows:
+            case = row.pop('archived_case')
+            patient, closed_at = cases[case]
+            yield ArchivedRecord(model=model._meta.label, object_id=row[model._meta.pk.attname], case_id=case,
+                                 patient_id=patient, closed_at=closed_at, data=row)
+
+
+def archive_cases(older_than: timedelta | None = None, chunk_size: int = 200, limit: int | None = None) -> int:
+    """Archive cases closed before `older_than` ago, returns how many were archived."""
+    if older_than is None:
+        older_than = timedelta(days=settings.ARCHIVE_CASES_AFTER_DAYS)
+
+    cutoff = timezone.now() - older_than
+    attached = ARCHIVED_MODELS
+    deletion_order = _deletion_order(attached)
+
+    archived = 0
+    while limit is None or archived < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - archived)
+
+        with transaction.atomic():
+            case_pks = list(Case._base_manager
+                            .filter(closed_at__lt=cutoff)
+                            .order_by('pk')
+                            .select_for_update()
+                            .values_list('pk', flat=True)[:size])
+
+            if not case_pks:
+                break
+
+            # the archive commits first, if deleting fails the chunk is copied again on the next run
+            with transaction.atomic(using=ARCHIVE_DATABASE):
+                ArchivedRecord.objects.bulk_create(_records(case_pks, attached), batch_size=500,
+                                                   ignore_conflicts=True)
+
+            for model in deletion_order:
+                model._base_manager.filter(**{f'{attached[model]}__in': case_pks}).delete()
+
+        archived += len(case_pks)
+
+    return archived
+
+
+def _instance(model: type[models.Model], data: dict) -> models.Model:
+    fields = [field for field in model._meta.concrete_fields if field.attname in data]
+    values = [field.to_python(data[field.attname]) for field in fields]
+
+    # loaded as if from the hot database, so foreign keys to patients, rooms or accounts can be followed
+    instance = model.from_db(DEFAULT_DB_ALIAS, [field.attname for field in fields], values)
+    instance.is_archived = True
+
+    return instance
+
+
+def _restore_links(model: type[models.Model], instances: list[models.Model]):
+    # set like select_related would, instead of querying once per instance when the links are followed
+    departments = {department.pk: department for department in cache.departments()}
+    rooms = {room.pk: room for room in cache.rooms()}
+    cases = {}
+
+    if model is not Case and instances:
+        case_ids = {instance.case_id for instance in instances}
+        cases = {case.pk: case for case in archived(Case, case_id__in=case_ids)}
+
+    linked = {Case: cases, Department: departments, Room: rooms}
+    for field in model._meta.concrete_fields:
+        # related_model is None for fields that aren't relations
+        related = linked.get(field.related_model)
+        if not related:
+            continue
+
+        for instance in instances:
+            obj = related.get(getattr(instance, field.attname))
+            if obj is not None:
+                field.set_cached_value(instance, obj)
+
+
+def instances(model: type[models.Model], data: Iterable[dict]) -> list[models.Model]:
+    """Instances of `model` from the data of its archived records, linked like the ones returned by `archived`."""
+    objs = [_instance(model, row) for row in data]
+    _restore_links(model, objs)
+
+    return objs
+
+
+def archived(model: type[models.Model], **filters) -> list[models.Model]:
+    """
+    Archived rows of `model` as instances marked with `is_archived`. They are meant to be read only,
+    saving one would put it back into the hot table. Their case, departments and rooms are loaded along.
+    Filters apply to `ArchivedRecord`, e.g. `archived(Case, patient_id=1)` or `archived(TransportOrder, case_id=2)`.
+    """
+    records = ArchivedRecord.objects.filter(model=model._meta.label, **filters).values_list('data', flat=True)
+    return instances(model, records)
+
+
+def patient_cases(patient_id: int) -> list[Case]:
+    """All cases of a patient, archived or not, oldest first."""
+    cases = [*Case.objects.filter(patient_id=patient_id), *archived(Case, patient_id=patient_id)]
+    return sorted(cases, key=lambda case: case.created_at)
+
+
+def kept_rows(case_id: int) -> dict[type[models.Model], list[models.Model]]:
+    """The rows of `KEPT_LINKS` that refer to the archived case `case_id` or to one of its archived rows."""
+    object_ids = {}
+    for label, object_id in ArchivedRecord.objects.filter(case_id=case_id).values_list('model', 'object_id'):
+        object_ids.setdefault(label, []).append(object_id)
+
+    rows = {}
+    for model, fields in KEPT_LINKS.items():
+        condition = Q()
+        for name in fields:
+            field = model._meta.get_field(name)
+            condition |= Q(**{f'{field.attname}__in': object_ids.get(field.related_model._meta.label, [])})
+
+        rows[model] = list(model._base_manager.filter(condition).order_by('pk'))
+
+    return rows
@@ -0,0 +1,61 @@
+"""
+Attachments of examination reports.
+
+Contents are streamed into the blob store chunk by chunk and never held in memory as a whole. Attachments only
+reference blobs, so a file attached twice is stored once. Blobs that nothing references anymore are removed by
+`collect_blobs`.
+"""
+from datetime import timedelta
+from typing import Iterable
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..blobs import blob_store
+from ..models.accounts import HISAccount
+from ..models.archive import ArchivedRecord
+from ..models.attachments import Attachment, Blob
+from ..models.tasks import ExaminationReport
+
+
+def attach(report: ExaminationReport, chunks: Iterable[bytes], filename: str, content_type: str,
+           uploaded_by: HISAccount | None = None) -> Attachment:
+    with blob_store.writer() as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+        with transaction.atomic():
+            # the row stays locked until the attachment is committed, collect_blobs can't remove the file meanwhile
+            blob, _created = Blob.objects.update_or_create(sha256=writer.digest,
+                                                           defaults={'size': writer.size, 'stored_at': timezone.now()})
+            writer.commit()
+            return Attachment.objects.create(report=report, blob=blob, filename=filename[:255],
+                                             content_type=content_type[:127] or 'application/octet-stream',
+                                             uploaded_by=uploaded_by)
+
+
+def collect_blobs(grace: timedelta = timedelta(hours=1)) -> int:
+    """
+    Delete blobs no attachment references, neither a current nor an archived one, and return their number.
+    Blobs stored within `grace` are kept, their attachment may not be committed yet.
+    """
+    archived = set()
+    for data in ArchivedRecord.objects.filter(model=Attachment._meta.label).values_list('data', flat=True):
+        archived.add(data['blob_id'])
+
+    cutoff = timezone.now() - grace
+    unreferenced = Blob.objects.filter(attachments=None, stored_at__lt=cutoff)
+    digests = [digest for digest in unreferenced.values_list('sha256', flat=True) if digest not in archived]
+
+    with transaction.atomic():
+        # checked again under the row locks, `attach` may have taken up a blob in the meantime
+        locked = list(Blob.objects.select_for_update().filter(pk__in=digests, stored_at__lt=cutoff)
+                      .values_list('sha256', flat=True))
+        deleted = list(Blob.objects.filter(pk__in=locked, attachments=None).values_list('sha256', flat=True))
+        Blob.objects.filter(pk__in=deleted).delete()
+
+        # before the locks are released, an upload of the same content waits and stores the file again
+        for digest in deleted:
+            blob_store.delete(digest)
+
+    return len(deleted)
@@ -0,0 +1,205 @@
+"""
+Daily census rollups per department, see `models.census.DailyCensus`.
+
+Admissions, transfers and discharges update the rows of their day as they happen: saved cases and transfer orders
+through signals, bulk closed transfer orders through their model hook and discharges through `services.discharge`.
+A movement adds to the flows of its day and to the census of its day and all later rows. Changes that bypass these,
+e.g. bulk inserted fixtures, migrated legacy cases, reopened transfers or edited departments, are caught up by
+`rebuild`, which recomputes the rows of the last days from the cases and is meant to run nightly.
+
+A case is in the department its carried out transfers lead it through: before the first transfer the one the transfer
+starts from, afterwards the one the last transfer leads to, and without transfers its assigned department. New
+transfers have to start from the department the case is in, see `current_department`, so that the live rows and
+`rebuild` agree. Transfer orders closed by a discharge weren't carried out, they share the closing time of their case.
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, NamedTuple
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models.census import FLOWS, DailyCensus
+from ..models.objects import Department
+from ..models.tasks import Case, TransferOrder
+
+# change of the census by a movement
+NET = {'admissions': 1, 'discharges': -1, 'transfers_in': 1, 'transfers_out': -1}
+
+
+class CensusDay(NamedTuple):
+    department: int
+    day: date
+    census: int
+    admissions: int
+    discharges: int
+    transfers_in: int
+    transfers_out: int
+
+
+def carried_out_transfers() -> models.QuerySet:
+    return TransferOrder.objects.exclude(closed_at=None).exclude(closed_at=F('case__closed_at'))
+
+
+def _day(when: datetime) -> date:
+    return timezone.localdate(when)
+
+
+def _ensure_row(department: int, day: date):
+    if DailyCensus.objects.filter(department=department, day=day).exists():
+        return
+
+    # a movement on an earlier day at the same time may leave this behind, until the next rebuild
+    carried = (DailyCensus.objects.filter(department=department, day__lt=day)
+               .order_by('-day').values_list('census', flat=True).first())
+    DailyCensus.objects.get_or_create(department_id=department, day=day, defaults={'census': carried or 0})
+
+
+@transaction.atomic
+def _record(movements: Counter, sign: int = 1):
+    """Add the `movements`, counts by department, day and flow, to the rows. A `sign` of -1 takes them back."""
+    by_row = defaultdict(Counter)
+    for (department, day, flow), count in movements.items():
+        by_row[department, day][flow] += sign * count
+
+    # in a fixed order, so concurrent updates lock the rows in the same order
+    for (department, day), flows in sorted(by_row.items()):
+        _ensure_row(department, day)
+        DailyCensus.objects.filter(department=department, day=day).update(
+            **{flow: F(flow) + count for flow, count in flows.items()}
+        )
+
+        net = sum(NET[flow] * count for flow, count in flows.items())
+        if net:
+            DailyCensus.objects.filter(department=department, day__gte=day).update(census=F('census') + net)
+
+
+def current_department(case: Case) -> int:
+    """The department `case` is in, where a new transfer of it has to start from."""
+    last_transfer = carried_out_transfers().filter(case=case).order_by('-closed_at').values_list('to_department',
+                                                                                                  flat=True).first()
+    return last_transfer if last_transfer is not None else case.assigned_department_id
+
+
+def admitted(cases: Iterable[Case]):
+    _record(Counter((case.assigned_department_id, _day(case.created_at), 'admissions') for case in cases))
+
+
+def transferred(orders: Iterable[TransferOrder]):
+    movements = Counter()
+    for order in orders:
+        movements[order.from_department_id, _day(order.closed_at), 'transfers_out'] += 1
+        movements[order.to_department_id, _day(order.closed_at), 'transfers_in'] += 1
+
+    _record(movements)
+
+
+def _discharges(summaries: models.QuerySet) -> Counter:
+    # the department the case was in right before the discharge
+    last_transfer = (carried_out_transfers()
+                     .filter(case=OuterRef('case'), closed_at__lt=OuterRef('discharged_at'))
+                     .order_by('-closed_at')
+                     .values('to_department')[:1])
+    departments = summaries.annotate(department=Coalesce(Subquery(last_transfer), 'case__assigned_department',
+                                                         output_field=models.IntegerField()))
+
+    return Counter((department, _day(discharged_at), 'discharges')
+                   for department, discharged_at in departments.values_list('department', 'discharged_at'))
+
+
+def discharged(summaries: models.QuerySet):
+    _record(_discharges(summaries))
+
+
+def discharge_cancelled(summaries: models.QuerySet):
+    """Take back the discharges of `summaries`, before they are deleted."""
+    _record(_discharges(summaries), sign=-1)
+
+
+def rebuild(since: date) -> int:
+    """Recompute the rows from `since` up to today from the cases and their transfers, return their number."""
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(since, time.min))
+
+    archived_before = timezone.now() - timedelta(days=settings.ARCHIVE_CASES_AFTER_DAYS)
+    if start < archived_before:
+        raise ValueError(f'Cases closed before {archived_before.date()} may be archived already, '
+                         f'the census can only be rebuilt from then on')
+
+    # the cases in a department on `since` or later
+    cases = Case._base_manager.filter(Q(closed_at=None) | Q(closed_at__gte=start))
+
+    transfers = defaultdict(list)
+    for transfer in (carried_out_transfers().filter(case__in=cases).order_by('closed_at')
+                     .values('case', 'closed_at', 'from_department', 'to_department')):
+        transfers[transfer['case']].append(transfer)
+
+    flows = defaultdict(Counter)
+    # census changes by department and day, the ones before `since` make up the census of `since`
+    changes = defaultdict(Counter)
+
+    def move(department: int, when: datetime, flow: str):
+        day = _day(when)
+        if day > today:
+            return
+
+        if day >= since:
+            flows[department, day][flow] += 1
+        changes[department][max(day, since)] += NET[flow]
+
+    for case in cases.values('pk', 'created_at', 'closed_at', 'assigned_department').iterator():
+        moves = transfers[case['pk']]
+        # transfers start from the department the case is in, the first one from where it was admitted to
+        move(moves[0]['from_department'] if moves else case['assigned_department'], case['created_at'], 'admissions')
+
+        for transfer in moves:
+            move(transfer['from_department'], transfer['closed_at'], 'transfers_out')
+            move(transfer['to_department'], transfer['closed_at'], 'transfers_in')
+
+        if case['closed_at'] is not None:
+            move(moves[-1]['to_department'] if moves else case['assigned_department'], case['closed_at'], 'discharges')
+
+    rows = []
+    for department in Department.objects.values_list('pk', flat=True):
+        census = 0
+        # every department gets a row on `since`, the census of the rows before may be off
+        for day in sorted({since, *(day for other, day in flows if other == department)}):
+            census += changes[department][day]
+            rows.append(DailyCensus(department_id=department, day=day, census=census, **flows[department, day]))
+
+    with transaction.atomic():
+        DailyCensus.objects.filter(day__gte=since).delete()
+        DailyCensus.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+
+def daily_census(start: date, end: date, departments: Iterable[int] | None = None) -> dict[int, list[CensusDay]]:
+    """Every day from `start` to `end` of every department, read from the rollups with two queries."""
+    rows = DailyCensus.objects.filter(day__range=(start, end))
+    carried = Department.objects.annotate(census=Subquery(
+        DailyCensus.objects.filter(department=OuterRef('pk'), day__lt=start).order_by('-day').values('census')[:1]
+    ))
+    if departments is not None:
+        rows, carried = rows.filter(department__in=departments), carried.filter(pk__in=departments)
+
+    by_day = {(row.department_id, row.day): row for row in rows}
+
+    series = {}
+    for department, census in carried.values_list('pk', 'census'):
+        census, days = census or 0, []
+
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            row = by_day.get((department, day))
+            if row is not None:
+                census = row.census
+
+            days.append(CensusDay(department, day, census, *(getattr(row, flow, 0) for flow in FLOWS)))
+
+        series[department] = days
+
+    return series
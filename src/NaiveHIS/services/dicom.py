@@ -0,0 +1,353 @@
+"""
+Indexing DICOM files.
+
+`index_directory` walks a directory tree and reads the header of every new or changed file in worker processes,
+stopping before the pixel data. Studies, series and files are written in batches while the workers read the next
+ones. Studies are linked to their patient by the patient id in the files, and to the case and examination order that
+were open when they were acquired. Files are recognized by size and modification time, so a rescan reads only what
+was added or changed since.
+"""
+import logging
+import os
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+import django
+import pydicom
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models.dicom import DicomInstance, DicomSeries, DicomStudy
+from ..models.hl7 import PatientIdentifier
+from ..models.objects import Patient
+from ..models.tasks import Case, ExaminationOrder
+from ..utils import Progress
+
+logger = logging.getLogger(__name__)
+
+# larger values, e.g. embedded thumbnails or private binary data, aren't copied into the stored header
+BULK_DATA_THRESHOLD = 1024
+
+
+class ScannedFile(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+
+
+class Header(NamedTuple):
+    study_instance_uid: str
+    series_instance_uid: str
+    sop_instance_uid: str
+    study: dict
+    series: dict
+    header: dict
+
+
+class IndexStats(NamedTuple):
+    indexed: int
+    unchanged: int
+    failed: int
+    removed: int
+
+
+def _scan(root: str) -> Iterator[ScannedFile]:
+    directories = [root]
+
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.name != 'DICOMDIR':
+                    stat = entry.stat(follow_symlinks=False)
+                    yield ScannedFile(entry.path, stat.st_size, stat.st_mtime_ns)
+
+
+def _text(dataset: pydicom.Dataset, keyword: str, length: int = 64) -> str:
+    value = dataset.get(keyword)
+    return str(value).strip()[:length] if value is not None else ''
+
+
+def _date(value: str) -> date | None:
+    try:
+        return datetime.strptime(value[:8], '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+def _time(value: str) -> time | None:
+    # HH, HHMM, HHMMSS and HHMMSS.FFFFFF are all valid
+    digits, _, fraction = value.partition('.')
+    if not digits.isdigit() or len(digits) not in (2, 4, 6):
+        return None
+
+    digits, fraction = digits.ljust(6, '0'), fraction[:6].ljust(6, '0')
+    try:
+        return time(int(digits[:2]), int(digits[2:4]), min(int(digits[4:6]), 59), int(fraction))
+    except ValueError:
+        return None
+
+
+def _name(dataset: pydicom.Dataset) -> str:
+    name = dataset.get('PatientName')
+    if not name:
+        return ''
+
+    return ', '.join(part for part in (name.family_name, name.given_name) if part)[:128]
+
+
+def _number(value: str) -> int | None:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def read_header(file: ScannedFile) -> tuple[ScannedFile, Header | None, str]:
+    """Parse a file's header, returns it or why the file can't be indexed. Runs in the worker processes."""
+    try:
+        dataset = pydicom.dcmread(file.path, stop_before_pixels=True)
+
+        uids = [_text(dataset, keyword) for keyword in ('StudyInstanceUID', 'SeriesInstanceUID', 'SOPInstanceUID')]
+        if not all(uids):
+            return file, None, 'not a DICOM image, it lacks study, series or instance UIDs'
+
+        uri = Path(file.path).as_uri()
+        header = dataset.to_json_dict(bulk_data_threshold=BULK_DATA_THRESHOLD,
+                                      bulk_data_element_handler=lambda element: uri)
+    except Exception as error:
+        return file, None, str(error) or error.__class__.__name__
+
+    study = {
+        'patient_identifier': _text(dataset, 'PatientID'),
+        'issuer': _text(dataset, 'IssuerOfPatientID'),
+        'patient_name': _name(dataset),
+        'patient_birth_date': _date(_text(dataset, 'PatientBirthDate')),
+        'accession_number': _text(dataset, 'AccessionNumber', 16),
+        'study_date': _date(_text(dataset, 'StudyDate')),
+        'study_time': _time(_text(dataset, 'StudyTime')),
+        'description': _text(dataset, 'StudyDescription'),
+    }
+    series = {
+        'modality': _text(dataset, 'Modality', 16),
+        'body_part': _text(dataset, 'BodyPartExamined', 16).upper(),
+        'number': _number(_text(dataset, 'SeriesNumber')),
+        'description': _text(dataset, 'SeriesDescription'),
+    }
+
+    return file, Header(*uids, study, series, header), ''
+
+
+def _init_worker():
+    # a no-op if the worker was forked from a process that is set up already
+    django.setup()
+
+
+def _acquired_at(study: DicomStudy) -> datetime | None:
+    if study.study_date is None:
+        return None
+
+    return timezone.make_aware(datetime.combine(study.study_date, study.study_time or time(12)))
+
+
+def _patients(studies: list[DicomStudy]) -> dict[tuple[str, str], int]:
+    """Patient pks by the (id, issuer) of the studies, only ids that name a single patient are resolved."""
+    values = {study.patient_identifier for study in studies}
+    candidates = {}
+
+    for value, authority, patient in (PatientIdentifier.objects
+                                      .filter(value__in=values)
+                                      .values_list('value', 'authority', 'patient_id')):
+        candidates.setdefault((value, authority), set()).add(patient)
+        # without an issuer in the file, the id has to be unambiguous across all authorities
+        candidates.setdefault((value, ''), set()).add(patient)
+
+    # our own patient numbers, e.g. from a modality worklist fed by the outbound HL7 interface
+    own = [int(value) for value in values if value.isdigit()]
+    for pk in Patient.objects.filter(pk__in=own).values_list('pk', flat=True):
+        candidates.setdefault((str(pk), settings.HL7_APPLICATION), set()).add(pk)
+
+    return {key: patients.pop() for key, patients in candidates.items() if len(patients) == 1}
+
+
+def link_studies(studies: Iterable[DicomStudy]) -> int:
+    """Link studies without a patient to their patient, case and examination order, returns how many were linked."""
+    studies = [study for study in studies if study.patient_id is None and study.patient_identifier]
+    if not studies:
+        return 0
+
+    patients = _patients(studies)
+    birth_dates = dict(Patient.objects.filter(pk__in=patients.values()).values_list('pk', 'date_of_birth'))
+    linked = []
+
+    for study in studies:
+        patient = patients.get((study.patient_identifier, study.issuer))
+        if patient is None:
+            continue
+
+        if study.patient_birth_date and birth_dates[patient] and study.patient_birth_date != birth_dates[patient]:
+            logger.warning('Study %s names patient %s, but with another date of birth', study.study_instance_uid,
+                           patient)
+            continue
+
+        study.patient_id = patient
+        acquired_at = _acquired_at(study)
+
+        if acquired_at is not None:
+            study.case = (Case.objects
+                          .filter(patient_id=patient, created_at__lte=acquired_at)
+                          .filter(Q(closed_at=None) | Q(closed_at__gte=acquired_at))
+                          .order_by('-created_at')
+                          .first())
+
+        if study.case_id is not None:
+            orders = ExaminationOrder.objects.filter(case_id=study.case_id)
+            study.examination_order = (
+                # an accession number that is one of the case's order numbers wins over the order's time
+                study.accession_number.isdigit() and orders.filter(pk=int(study.accession_number)).first()
+                or orders.filter(created_at__lte=acquired_at).order_by('-created_at').first()
+            )
+
+        linked.append(study)
+
+    DicomStudy.objects.bulk_update(linked, ['patient', 'case', 'examination_order'])
+    return len(linked)
+
+
+@transaction.atomic
+def _store(headers: list[tuple[ScannedFile, Header]]):
+    studies = DicomStudy.objects.in_bulk({header.study_instance_uid for _file, header in headers},
+                                         field_name='study_instance_uid')
+    created = {}
+
+    # the first file of a study or series in the batch describes it
+    for _file, header in headers:
+        if header.study_instance_uid not in studies:
+            studies[header.study_instance_uid] = created[header.study_instance_uid] = DicomStudy(
+                study_instance_uid=header.study_instance_uid, **header.study,
+            )
+
+    DicomStudy.objects.bulk_create(created.values())
+    studies.update(DicomStudy.objects.in_bulk(created, field_name='study_instance_uid'))
+
+    series = DicomSeries.objects.in_bulk({header.series_instance_uid for _file, header in headers},
+                                         field_name='series_instance_uid')
+    new_series = {}
+
+    for _file, header in headers:
+        if header.series_instance_uid not in series:
+            series[header.series_instance_uid] = new_series[header.series_instance_uid] = DicomSeries(
+                study=studies[header.study_instance_uid], series_instance_uid=header.series_instance_uid,
+                **header.series,
+            )
+
+    DicomSeries.objects.bulk_create(new_series.values())
+    series.update(DicomSeries.objects.in_bulk(new_series, field_name='series_instance_uid'))
+
+    now = timezone.now()
+    DicomInstance.objects.bulk_create(
+        [
+            DicomInstance(series=series[header.series_instance_uid], sop_instance_uid=header.sop_instance_uid,
+                          path=file.path, size=file.size, mtime_ns=file.mtime_ns, header=header.header,
+                          indexed_at=now)
+            for file, header in headers
+        ],
+        update_conflicts=True,
+        unique_fields=['path'],
+        update_fields=['series', 'sop_instance_uid', 'size', 'mtime_ns', 'header', 'indexed_at'],
+    )
+
+    # studies indexed before their patient was known get another chance whenever one of their files changes
+    link_studies(studies.values())
+
+
+def _batches(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _remove_missing(paths: Iterable[str]) -> int:
+    removed = 0
+
+    with transaction.atomic():
+        for batch in _batches(paths, 500):
+            removed += DicomInstance.objects.filter(path__in=batch).delete()[1].get(DicomInstance._meta.label, 0)
+
+        DicomSeries.objects.filter(instances=None).delete()
+        DicomStudy.objects.filter(series=None).delete()
+
+    return removed
+
+
+def index_directory(directory: str | os.PathLike, workers: int | None = None, batch_size: int = 500,
+                    prune: bool = False, progress: Progress | None = None) -> IndexStats:
+    """
+    Index the DICOM files below `directory`. Files that weren't changed since they were indexed are skipped, files
+    that can't be read are logged and tried again next time. With `prune`, files that are gone are removed from the
+    index, and with them series and studies left empty. `progress` is called whenever a batch is stored.
+    """
+    root = os.path.abspath(directory)
+    indexed_files = (DicomInstance.objects
+                     .filter(path__startswith=os.path.join(root, ''))
+                     .values_list('path', 'size', 'mtime_ns'))
+    known = {path: (size, mtime_ns) for path, size, mtime_ns in indexed_files.iterator()}
+    unchanged = indexed = failed = 0
+
+    def changed_files():
+        nonlocal unchanged
+
+        for file in _scan(root):
+            # what's left in `known` in the end is gone
+            if known.pop(file.path, None) == (file.size, file.mtime_ns):
+                unchanged += 1
+            else:
+                yield file
+
+    def store(results):
+        nonlocal indexed, failed
+        headers = []
+
+        for file, header, error in results:
+            if header is None:
+                logger.warning('Skipped %s: %s', file.path, error)
+                failed += 1
+            else:
+                headers.append((file, header))
+
+        if headers:
+            _store(headers)
+            indexed += len(headers)
+
+        if progress is not None:
+            progress(indexed + unchanged + failed, None, f'{indexed} Dateien indiziert, {unchanged} unverändert')
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for batch in _batches(changed_files(), batch_size):
+            store(map(read_header, batch))
+    else:
+        # connections must not be shared with the workers
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            # the workers read the next batches while the current one is written
+            pending = deque()
+            for batch in _batches(changed_files(), batch_size):
+                pending.append(executor.map(read_header, batch, chunksize=max(1, batch_size // (workers * 4))))
+                if len(pending) > 2:
+                    store(pending.popleft())
+
+            while pending:
+                store(pending.popleft())
+
+    removed = _remove_missing(known) if prune else 0
+    return IndexStats(indexed, unchanged, failed, removed)
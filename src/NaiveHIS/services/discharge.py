@@ -0,0 +1,122 @@
+"""
+Discharging patients.
+
+Closing cases runs through `Case.on_bulk_close`, or `Case.save` for a single case, which end up here. Per affected
+table there is one statement for the whole batch, even if the cases close at different times: open orders are closed
+with one UPDATE per order table, rooms are released with one UPDATE per distinct number of leaving patients and the
+discharge summaries are inserted at once.
+
+The usage of a room counts the open cases whose last carried out transport leads into it. Carrying out a transport
+moves the patient from the room they are in into its destination, see `transported`, the discharge releases the room.
+"""
+from collections import Counter
+from datetime import datetime
+
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery
+
+from ..hl7 import events
+from . import census
+from ..models.discharge import DischargeSummary
+from ..models.objects import Room
+from ..models.tasks import Order, TransportOrder
+
+
+def _occupied_rooms(cases: models.QuerySet) -> dict[int, tuple[datetime, int | None]]:
+    """
+    Closing time and room of every closed case, the room is the destination of its last transport that was carried
+    out before the case closed.
+    """
+    last_transport = (TransportOrder.objects
+                      .filter(case=OuterRef('pk'), closed_at__lt=OuterRef('closed_at'))
+                      .order_by('-closed_at')
+                      .values('to_room')[:1])
+
+    return {pk: (closed_at, room) for pk, closed_at, room
+            in cases.annotate(room=Subquery(last_transport)).values_list('pk', 'closed_at', 'room')}
+
+
+def change_room_usage(rooms: Counter, sign: int):
+    """Add `sign` times the count of every room to its usage."""
+    by_count = {}
+    for room, count in rooms.items():
+        by_count.setdefault(count, []).append(room)
+
+    # usually every room loses one patient, which makes this a single UPDATE
+    for count, room_pks in by_count.items():
+        Room.objects.filter(pk__in=room_pks).update(usage=F('usage') + sign * count)
+
+
+def transported(transports: models.QuerySet, sign: int = 1):
+    """
+    Move the patients of the carried out `transports` from the room they were in into the destinations, with a `sign`
+    of -1 back again. The room they were in is the destination of the transport before, not the `from_room`, which
+    the first transport of a case doesn't leave.
+    """
+    previous = (TransportOrder.objects
+                .filter(case=OuterRef('case'), closed_at__lt=OuterRef('closed_at'))
+                .order_by('-closed_at')
+                .values('to_room')[:1])
+    rows = (transports.exclude(closed_at=None)
+            # orders closed by the discharge of their case weren't carried out
+            .exclude(closed_at=F('case__closed_at'))
+            .annotate(previous=Subquery(previous))
+            .order_by('case', 'closed_at', 'pk')
+            .values_list('case', 'to_room', 'previous'))
+
+    arriving, leaving = Counter(), Counter()
+    last_case = last_room = None
+    for case, to_room, room in rows:
+        # several transports of a case in one batch follow each other
+        if case == last_case:
+            room = last_room
+        if room != to_room:
+            arriving[to_room] += 1
+            if room is not None:
+                leaving[room] += 1
+        last_case, last_room = case, to_room
+
+    change_room_usage(arriving, sign)
+    change_room_usage(leaving, -sign)
+
+
+@transaction.atomic
+def discharge_cases(cases: models.QuerySet) -> list[DischargeSummary]:
+    """
+    Close the open orders of the closed `cases` at the closing time of their case, release the rooms of their
+    patients and write discharge summaries.
+    """
+    rooms = _occupied_rooms(cases)
+
+    closed_orders = Counter()
+    for order_model in Order.__subclasses__():
+        open_orders = dict(order_model.objects.filter(case__in=cases, closed_at=None).values_list('pk', 'case'))
+        closed_orders.update(open_orders.values())
+
+        # same closing time as the cases, so reopening the cases can find these orders again
+        order_model.objects.close(closed_at={pk: rooms[case][0] for pk, case in open_orders.items()}, discharge=True)
+
+    change_room_usage(Counter(room for _closed_at, room in rooms.values() if room is not None), sign=-1)
+
+    summaries = DischargeSummary.objects.bulk_create([
+        DischargeSummary(case_id=case, discharged_at=closed_at, room_id=room, closed_orders=closed_orders[case])
+        for case, (closed_at, room) in rooms.items()
+    ])
+    events.discharged(summaries)
+    census.discharged(DischargeSummary.objects.filter(case__in=cases))
+
+    return summaries
+
+
+@transaction.atomic
+def undo_discharge(cases: models.QuerySet):
+    """Reopen the orders closed by the discharge of `cases` and occupy their rooms again, before the cases reopen."""
+    for order_model in Order.__subclasses__():
+        order_model.objects.filter(case__in=cases, closed_at=F('case__closed_at')).reopen()
+
+    summaries = DischargeSummary.objects.filter(case__in=cases)
+    census.discharge_cancelled(summaries)
+    change_room_usage(Counter(summaries.exclude(room=None).values_list('room', flat=True)), sign=1)
+    summaries.delete()
+
+    events.discharge_cancelled(cases)
@@ -0,0 +1,206 @@
+"""
+Duplicate patient detection.
+
+Patients are only compared within blocks of records sharing a blocking key, e.g. phonetic last name, birth year and
+zip code, instead of comparing all pairs. Blocks are streamed from the search index in key order and scored in
+parallel worker processes. Pairs above the threshold end up in the review queue (`DuplicateCandidate`).
+"""
+import os
+
+from datetime import date, datetime
+from itertools import combinations, groupby, islice
+from typing import Iterable, Iterator, NamedTuple
+
+from django.db.models import F, Q
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from ..models.duplicates import DuplicateCandidate, DuplicateScan
+from ..models.search import PatientSearchIndex
+from ..utils import Progress, process_pool
+from .search import trigrams
+
+
+class Blocking(NamedTuple):
+    name: str
+    fields: tuple[str, ...]
+
+
+BLOCKINGS = (
+    Blocking('name_year_zip', ('last_name_phonetic', 'birth_year', 'zip_code')),
+    # catches patients that moved in between
+    Blocking('name_dob', ('last_name_phonetic', 'first_name_phonetic', 'date_of_birth')),
+)
+
+# (patient id, normalized first name, normalized last name, date of birth, zip code)
+Row = tuple[int, str, str, date | None, str | None]
+ROW_FIELDS = ('patient_id', 'first_name', 'last_name', 'date_of_birth', 'zip_code')
+
+
+class Block(NamedTuple):
+    key: str
+    rows: list[Row]
+    # only pairs with one of these patients are compared, all pairs if None
+    focus: frozenset[int] | None = None
+
+
+def _index_rows():
+    return PatientSearchIndex.objects.exclude(last_name_phonetic='').annotate(
+        birth_year=ExtractYear('date_of_birth'),
+        zip_code=F('patient__zip_code'),
+    )
+
+
+def _block_key(blocking: Blocking, values: Iterable) -> str:
+    return blocking.name + ':' + '|'.join('' if value is None else str(value) for value in values)
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def score_pair(a: Row, b: Row) -> float:
+    _a_id, a_first, a_last, a_dob, a_zip = a
+    _b_id, b_first, b_last, b_dob, b_zip = b
+
+    score = 0.45 * _jaccard(trigrams(a_last), trigrams(b_last))
+    score += 0.3 * _jaccard(trigrams(a_first), trigrams(b_first))
+    score += 0.15 if a_dob is not None and a_dob == b_dob else 0.0
+    score += 0.1 if a_zip and a_zip == b_zip else 0.0
+
+    return score
+
+
+def _score_blocks(blocks: list[Block], threshold: float) -> list[tuple[int, int, float, str]]:
+    found = []
+
+    for block in blocks:
+        for a, b in combinations(block.rows, 2):
+            if block.focus is not None and a[0] not in block.focus and b[0] not in block.focus:
+                continue
+
+            score = score_pair(a, b)
+            if score >= threshold:
+                found.append((min(a[0], b[0]), max(a[0], b[0]), score, block.key))
+
+    return found
+
+
+def _all_blocks(blocking: Blocking, max_block_size: int) -> Iterator[Block]:
+    rows = (_index_rows()
+            .order_by(*blocking.fields)
+            .values_list(*blocking.fields, *ROW_FIELDS)
+            .iterator(chunk_size=5000))
+
+    key_length = len(blocking.fields)
+    for key, group in groupby(rows, key=lambda row: row[:key_length]):
+        block = [row[key_length:] for row in islice(group, max_block_size + 1)]
+        # oversized blocks mean the key isn't selective (e.g. lots of unknown birth dates), comparing is pointless
+        if 1 < len(block) <= max_block_size:
+            yield Block(_block_key(blocking, key), block)
+
+
+def _changed_blocks(blocking: Blocking, since: datetime, max_block_size: int,
+                    chunk_size: int = 500) -> Iterator[Block]:
+    changed = (_index_rows()
+               .filter(updated_at__gte=since)
+               .values_list('patient_id', *blocking.fields)
+               .iterator(chunk_size=chunk_size))
+
+    while chunk := list(islice(changed, chunk_size)):
+        focus_by_key = {}
+        for patient_id, *key in chunk:
+            focus_by_key.setdefault(tuple(key), set()).add(patient_id)
+
+        members = Q()
+        for key in focus_by_key:
+            members |= Q(**dict(zip(blocking.fields, key)))
+
+        rows = _index_rows().filter(members).values_list(*blocking.fields, *ROW_FIELDS)
+
+        blocks = {}
+        for row in rows:
+            blocks.setdefault(tuple(row[:len(blocking.fields)]), []).append(row[len(blocking.fields):])
+
+        for key, block in blocks.items():
+            if 1 < len(block) <= max_block_size:
+                yield Block(_block_key(blocking, key), block, frozenset(focus_by_key.get(key, ())))
+
+
+def _batches(blocks: Iterator[Block], batch_size: int) -> Iterator[list[Block]]:
+    while batch := list(islice(blocks, batch_size)):
+        yield batch
+
+
+def _save_candidates(found: list[tuple[int, int, float, str]]):
+    candidates = [
+        DuplicateCandidate(patient_id=patient_id, duplicate_id=duplicate_id, score=score, blocking_key=key)
+        for patient_id, duplicate_id, score, key in found
+    ]
+
+    # pairs that are already queued, or were reviewed before, are skipped
+    DuplicateCandidate.objects.bulk_create(candidates, batch_size=1000, ignore_conflicts=True)
+
+
+def find_duplicates(since: datetime | None = None, threshold: float = 0.7, workers: int | None = None,
+                    max_block_size: int = 200, batch_size: int = 1000,
+                    progress: Progress | None = None) -> DuplicateScan:
+    """
+    Queue possible duplicates for review.
+
+    Compares all patients if `since` is None, otherwise only patients created or changed since then
+    (the search index entry of a patient is rewritten on every save) against the rest of their blocks.
+    `progress` is called whenever the candidates of a batch of blocks are saved.
+    """
+    scan = DuplicateScan.objects.create(incremental=since is not None, since=since)
+    compared = 0
+
+    def save(found: list[tuple[int, int, float, str]], blocks_in_batch: int):
+        nonlocal compared
+        _save_candidates(found)
+        compared += blocks_in_batch
+
+        if progress is not None:
+            progress(compared, None, f'{compared} Blöcke verglichen')
+
+    def blocks() -> Iterator[Block]:
+        for blocking in BLOCKINGS:
+            if since is None:
+                yield from _all_blocks(blocking, max_block_size)
+            else:
+                yield from _changed_blocks(blocking, since, max_block_size)
+
+    if workers == 1:
+        for batch in _batches(blocks(), batch_size):
+            save(_score_blocks(batch, threshold), len(batch))
+    else:
+        workers = workers or os.cpu_count()
+
+        with process_pool(workers) as pool:
+            pending = []
+            for batch in _batches(blocks(), batch_size):
+                pending.append((pool.submit(_score_blocks, batch, threshold), len(batch)))
+
+                # keep the number of batches in flight bounded
+                if len(pending) >= 2 * workers:
+                    future, size = pending.pop(0)
+                    save(future.result(), size)
+
+            for future, size in pending:
+                save(future.result(), size)
+
+    changed = _index_rows()
+    if since is not None:
+        changed = changed.filter(updated_at__gte=since)
+
+    scan.patients_checked = changed.count()
+    scan.candidates_found = DuplicateCandidate.objects.filter(created_at__gte=scan.created_at).count()
+    scan.finished_at = timezone.now()
+    scan.save()
+
+    return scan
+
+
+def last_scan_start() -> datetime | None:
+    last = DuplicateScan.objects.exclude(finished_at=None).order_by('-created_at').first()
+    return last.created_at if last else None
@@ -0,0 +1,133 @@
+"""
+Bulk loading of fixtures, e.g. the demo data of init_data.py.
+
+Fixtures are declared per model, as the field values of its objects by a key that is unique across the fixtures.
+Foreign keys are given as the key of the object they point to, or as the primary key of an object that exists
+already. The models are inserted in the order their references require, each with one bulk insert, all in one
+transaction. Models with multi-table inheritance, e.g. the employee accounts, are bulk inserted table by table.
+
+Bulk inserts don't send signals. The search index of loaded patients and the reference data caches are updated
+afterwards, but loaded cases, orders and reports aren't sent to the outbound HL7 feed.
+"""
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from graphlib import TopologicalSorter
+
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+
+from ..cache import INVALIDATED_BY, reference_cache
+from ..models.objects import Patient
+from .search import index_patients
+
+# e.g. {Room: {'op1': {'name': 'OP-Raum 1', 'department': 'intensive_care', 'capacity': 1}}}
+Fixtures = dict[type[models.Model], dict[str, dict]]
+
+
+def _build(fixtures: Fixtures) -> tuple[dict[str, models.Model], dict[type[models.Model], set]]:
+    """The unsaved objects by key, and the models each model references."""
+    objects, references = {}, {}
+
+    for model, rows in fixtures.items():
+        for key, values in rows.items():
+            if key in objects:
+                raise ValueError(f'Fixture key {key!r} is used twice')
+
+            fields, keys = {}, {}
+            for name, value in values.items():
+                field = model._meta.get_field(name)
+                if isinstance(field, models.ForeignKey) and isinstance(value, str):
+                    keys[name] = value
+                elif isinstance(field, models.ForeignKey) and not isinstance(value, models.Model):
+                    fields[field.attname] = value
+                else:
+                    fields[name] = value
+
+            objects[key] = model(**fields)
+            references[key] = keys
+
+    dependencies = {model: set() for model in fixtures}
+    for key, keys in references.items():
+        obj = objects[key]
+        for name, target in keys.items():
+            if target not in objects:
+                raise ValueError(f'{key}.{name} references the unknown fixture {target!r}')
+
+            if type(objects[target]) is type(obj):
+                # the objects of a model are inserted at once
+                raise ValueError(f'{key}.{name} references {target!r}, which is of the same model')
+
+            setattr(obj, name, objects[target])
+            dependencies[type(obj)].add(type(objects[target]))
+
+    return objects, dependencies
+
+
+def _hash_passwords(objects: list[models.Model], workers: int | None = None):
+    """Replace the plain text passwords of accounts by their hashes. Hashing releases the GIL, so threads suffice."""
+    accounts = [obj for obj in objects if isinstance(obj, AbstractBaseUser) and obj.password]
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for account, password in zip(accounts, executor.map(make_password, (obj.password for obj in accounts))):
+            account.password = password
+
+
+def _insert_inherited(model: type[models.Model], objects: list[models.Model], using: str):
+    """bulk_create refuses models with multi-table inheritance, their tables are inserted one after the other."""
+    root, *tables = [*reversed(model._meta.get_parent_list()), model]
+
+    # the root table hands out the primary keys, which the other tables share
+    rows = root._base_manager.using(using).bulk_create([
+        root(**{field.attname: getattr(obj, field.attname) for field in root._meta.concrete_fields})
+        for obj in objects
+    ])
+
+    for obj, row in zip(objects, rows):
+        for field in root._meta.concrete_fields:
+            setattr(obj, field.attname, getattr(row, field.attname))
+        for table in tables:
+            setattr(obj, table._meta.pk.attname, row.pk)
+        obj._prepare_related_fields_for_save(operation_name='bulk_create')
+
+    connection = connections[using]
+    for table in tables:
+        fields = table._meta.local_concrete_fields
+        batch_size = connection.ops.bulk_batch_size(fields, objects) or len(objects)
+        for start in range(0, len(objects), batch_size):
+            # what bulk_create does for each batch of a model without parents
+            table._base_manager._insert(objects[start:start + batch_size], fields=fields, using=using)
+
+    for obj in objects:
+        obj._state.adding = False
+        obj._state.db = using
+
+
+def load_fixtures(fixtures: Fixtures, using: str = DEFAULT_DB_ALIAS,
+                  hashing_workers: int | None = None) -> dict[str, models.Model]:
+    """Insert `fixtures` and return the created objects by key. Passwords of accounts are given in plain text."""
+    objects, dependencies = _build(fixtures)
+    by_model = {model: [] for model in fixtures}
+    for obj in objects.values():
+        by_model[type(obj)].append(obj)
+
+    _hash_passwords(list(objects.values()), hashing_workers)
+
+    with transaction.atomic(using=using):
+        for model in TopologicalSorter(dependencies).static_order():
+            if not by_model[model]:
+                continue
+
+            if model._meta.parents:
+                _insert_inherited(model, by_model[model], using)
+            else:
+                model._base_manager.using(using).bulk_create(by_model[model])
+
+        index_patients([obj for obj in objects.values() if isinstance(obj, Patient)])
+
+        for model in fixtures:
+            for namespace in INVALIDATED_BY.get(model.__name__, ()):
+                reference_cache.bump_on_commit(namespace)
+
+    return objects
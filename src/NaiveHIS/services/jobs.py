@@ -0,0 +1,247 @@
+"""
+Background jobs without a broker.
+
+Jobs are rows of the `Job` table. `enqueue` writes them in the transaction of whatever asks for them, so a job exists
+exactly if that transaction commits. The `run_jobs` command runs them in a pool of worker processes, by priority and
+then by their earliest start. A worker claims a job with an UPDATE that only matches while the job is still queued,
+so of several workers racing for the same job exactly one changes the row and runs it.
+
+A job that raises is queued again with exponential backoff until it used up its attempts. Tasks report their progress
+through the `JobContext` they're called with, which is also where a requested cancellation stops them. Every claim
+counts an attempt, and the attempt a run was started with fences its updates: a run that was given up on, because its
+worker stopped writing heartbeats, can't overwrite the state of the next one.
+"""
+import logging
+import os
+import socket
+import traceback
+
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from time import monotonic, sleep
+from typing import Callable, Iterable
+
+from django.db import close_old_connections
+from django.db.models import F, QuerySet
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models.accounts import HISAccount
+from ..models.jobs import Job
+from ..utils import process_pool
+
+logger = logging.getLogger(__name__)
+
+# registered with `task`, see NaiveHIS.jobs
+TASKS: dict[str, Callable] = {}
+
+RETRY_DELAY = timedelta(seconds=30)
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def task(name: str):
+    """Register a function as the task `name`, it is called with a `JobContext` and the arguments of the job."""
+
+    def register(function: Callable) -> Callable:
+        TASKS[name] = function
+        return function
+
+    return register
+
+
+def enqueue(task_name: str, *, priority: int = 0, max_attempts: int = 1, run_after: datetime | None = None,
+            created_by: HISAccount | None = None, **arguments) -> Job:
+    """Queue the task `task_name` to be called with `arguments`, which have to be serializable to JSON."""
+    if task_name not in TASKS:
+        raise ValueError(f'Unknown task {task_name!r}')
+
+    return Job.objects.create(task=task_name, arguments=arguments, priority=priority, max_attempts=max_attempts,
+                              run_after=run_after or timezone.now(), created_by=created_by)
+
+
+def cancel(jobs: QuerySet) -> int:
+    """Cancel queued jobs and ask running ones to stop at their next progress report, returns how many there were."""
+    cancelled = jobs.filter(status=Job.Status.QUEUED).update(status=Job.Status.CANCELLED,
+                                                            finished_at=timezone.now())
+    return cancelled + jobs.filter(status=Job.Status.RUNNING).update(cancel_requested=True)
+
+
+def requeue(jobs: QuerySet) -> int:
+    """Queue failed and cancelled jobs again, with all their attempts, returns how many there were."""
+    return jobs.filter(status__in=(Job.Status.FAILED, Job.Status.CANCELLED)).update(
+        status=Job.Status.QUEUED, run_after=timezone.now(), attempts=0, worker='', heartbeat_at=None,
+        cancel_requested=False, progress=0, total=None, message='', result=None, error='', started_at=None,
+        finished_at=None,
+    )
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def _give_up(jobs: QuerySet, error: str) -> int:
+    """Queue running jobs again that lost their worker, or fail them if they are out of attempts."""
+    now = timezone.now()
+    failed = jobs.filter(attempts__gte=F('max_attempts')).update(status=Job.Status.FAILED, finished_at=now,
+                                                                 error=error)
+    requeued = jobs.filter(attempts__lt=F('max_attempts')).update(status=Job.Status.QUEUED, run_after=now, worker='',
+                                                                  heartbeat_at=None, error=error)
+    return failed + requeued
+
+
+class JobContext:
+    # progress is written at most this often, in seconds
+    progress_interval: float = 1.0
+
+    def __init__(self, job: Job):
+        self.job = job
+        self._reported_at = float('-inf')
+
+    @property
+    def _run(self) -> QuerySet:
+        # matches only while this run of the job is the current one
+        return Job.objects.filter(pk=self.job.pk, status=Job.Status.RUNNING, attempts=self.job.attempts)
+
+    def progress(self, progress: int, total: int | None = None, message: str = ''):
+        """Report how far the task got, raises `JobCancelled` if the job was cancelled in the meantime."""
+        if monotonic() - self._reported_at < self.progress_interval:
+            return
+
+        self._reported_at = monotonic()
+        if not self._run.filter(cancel_requested=False).update(progress=progress, total=total, message=message[:255]):
+            raise JobCancelled
+
+    def check_cancelled(self):
+        """Raises `JobCancelled` if the job was cancelled, for tasks that have no progress to report."""
+        if not self._run.filter(cancel_requested=False).exists():
+            raise JobCancelled
+
+
+def run_job(pk: int) -> str:
+    """Run a claimed job and return the status it ended with. Runs in the worker processes."""
+    close_old_connections()
+
+    job = Job.objects.get(pk=pk)
+    context = JobContext(job)
+
+    try:
+        result = TASKS[job.task](context, **job.arguments)
+    except JobCancelled:
+        context._run.update(status=Job.Status.CANCELLED, finished_at=timezone.now())
+        return Job.Status.CANCELLED
+    except Exception:
+        logger.exception('Job %s failed in attempt %d of %d', job, job.attempts, job.max_attempts)
+        error = traceback.format_exc()
+
+        if job.attempts < job.max_attempts:
+            context._run.update(status=Job.Status.QUEUED, run_after=timezone.now() + _retry_delay(job.attempts),
+                                worker='', heartbeat_at=None, error=error)
+            return Job.Status.QUEUED
+
+        context._run.update(status=Job.Status.FAILED, finished_at=timezone.now(), error=error)
+        return Job.Status.FAILED
+
+    context._run.update(status=Job.Status.SUCCEEDED, finished_at=timezone.now(), result=result,
+                        progress=Coalesce(F('total'), F('progress')), error='')
+    return Job.Status.SUCCEEDED
+
+
+class JobWorker:
+    processes: int = 1
+    poll_interval: float = 1.0
+    heartbeat_interval: float = 30
+    # a running job without a heartbeat for this long is taken to have lost its worker
+    stale_after: timedelta = timedelta(minutes=5)
+    # queued jobs looked at per claim, more than the number of workers that compete for them
+    claim_candidates: int = 10
+
+    def __init__(self, **options):
+        for name, value in options.items():
+            if value is not None:
+                setattr(self, name, value)
+
+        self.name = f'{socket.gethostname()}:{os.getpid()}'[:64]
+
+    def claim(self) -> Job | None:
+        """Claim the next job that is due, None if there is none."""
+        now = timezone.now()
+        candidates = (Job.objects
+                      .filter(status=Job.Status.QUEUED, run_after__lte=now)
+                      .order_by('-priority', 'run_after', 'id')
+                      .only('pk', 'attempts')[:self.claim_candidates])
+
+        for job in candidates:
+            # the row only still matches for the first worker to update it
+            if Job.objects.filter(pk=job.pk, status=Job.Status.QUEUED, attempts=job.attempts).update(
+                    status=Job.Status.RUNNING, attempts=job.attempts + 1, worker=self.name, started_at=now,
+                    heartbeat_at=now, cancel_requested=False):
+                return job
+
+        return None
+
+    def heartbeat(self, pks: Iterable[int]):
+        Job.objects.filter(pk__in=pks, status=Job.Status.RUNNING, worker=self.name).update(
+            heartbeat_at=timezone.now(),
+        )
+
+    def recover_stale(self) -> int:
+        """Give up on running jobs whose worker stopped writing heartbeats, returns how many there were."""
+        stale = Job.objects.filter(status=Job.Status.RUNNING, heartbeat_at__lt=timezone.now() - self.stale_after)
+        return _give_up(stale, 'The worker stopped sending heartbeats')
+
+    def run(self, once: bool = False):
+        """Run jobs until interrupted, or with `once` until no job is due."""
+        running = {}
+
+        try:
+            while True:
+                with process_pool(self.processes) as pool:
+                    if self._run_pool(pool, running, once):
+                        return
+
+                # a worker process died and took the pool with it
+                _give_up(Job.objects.filter(pk__in=running.values(), status=Job.Status.RUNNING, worker=self.name),
+                         'The worker process died')
+                running.clear()
+        finally:
+            # interrupted, the jobs of the pool's processes won't finish
+            _give_up(Job.objects.filter(pk__in=running.values(), status=Job.Status.RUNNING, worker=self.name),
+                     'The worker was stopped')
+
+    def _run_pool(self, pool, running: dict, once: bool) -> bool:
+        heartbeat_at = float('-inf')
+
+        while True:
+            close_old_connections()
+
+            if monotonic() - heartbeat_at >= self.heartbeat_interval:
+                self.heartbeat(running.values())
+                if recovered := self.recover_stale():
+                    logger.warning('Gave up on %d jobs that lost their worker', recovered)
+                heartbeat_at = monotonic()
+
+            while len(running) < self.processes and (job := self.claim()) is not None:
+                running[pool.submit(run_job, job.pk)] = job.pk
+
+            if not running:
+                if once:
+                    return True
+                sleep(self.poll_interval)
+                continue
+
+            done, _pending = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    future.result()
+                except BrokenProcessPool:
+                    logger.error('A worker process died while running job %s', running[future])
+                    return False
+                except Exception:
+                    logger.exception('Job %s could not be run', running[future])
+
+                del running[future]
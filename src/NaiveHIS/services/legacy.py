@@ -0,0 +1,349 @@
+"""
+Migrating the database of the old SQLAlchemy based system, see `old/model.py`.
+
+The legacy SQLite database is read table by table in chunks of ascending ids, in the order the tables reference each
+other: doctors, patients, cases and reports. Each chunk is written with batched inserts in one transaction, together
+with the `LegacyRecord` rows that map its old ids to the new objects. Those are the checkpoints as well: a migration
+that was interrupted, or is run again later, continues after the last migrated id of every table.
+Migrated rows don't go through the signals, so they aren't sent to the outbound HL7 feed as new admissions or reports.
+"""
+import sqlite3
+
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Iterator
+
+from django.db import models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from ..hashers import LegacyPBKDF2PasswordHasher
+from ..models.accounts import Doctor, DoctorQualification, HISAccount
+from ..models.legacy import LegacyRecord
+from ..models.medical import Discipline, parse_staging
+from ..models.objects import Department, Patient
+from ..models.tasks import (
+    Case,
+    AnamnesisReport,
+    DiagnosisReport,
+    ExaminationOrder,
+    ExaminationReport,
+    TherapyReport,
+    TreatmentOrder,
+)
+from ..utils import Progress
+from .attachments import attach
+from .search import index_patients
+
+# the old roles that are medical disciplines, ADMIN and ADMISSIONS have no counterpart and are granted by hand
+QUALIFICATIONS = {
+    'PATHOLOGIST': Discipline.PATHOLOGY,
+    'RADIOLOGIST': Discipline.RADIOLOGY,
+    'SURGEON': Discipline.SURGERY,
+}
+
+# the report types of the old system and the report models they become
+REPORT_MODELS = {
+    'REPORT': AnamnesisReport,
+    'RADIOLOGY': ExaminationReport,
+    'PATHOLOGY': DiagnosisReport,
+    'SURGERY': TherapyReport,
+}
+
+# the old system didn't know these about doctors, they have to be completed in the admin
+PLACEHOLDER_DATE_OF_BIRTH = date(1900, 1, 1)
+
+
+def _timestamp(value: str | None) -> datetime | None:
+    # SQLAlchemy stored naive UTC timestamps
+    return datetime.fromisoformat(value).replace(tzinfo=dt_timezone.utc) if value else None
+
+
+def _restore_created_at(model: type[models.Model], objects: list[models.Model], rows: list[sqlite3.Row]):
+    """Bulk inserts set `auto_now_add` fields to now, the creation times of the old rows are written afterwards."""
+    for obj, row in zip(objects, rows):
+        obj.created_at = _timestamp(row['created']) or obj.created_at
+
+    model.objects.bulk_update(objects, ['created_at'])
+
+
+class LegacyMigrator:
+    chunk_size: int = 1000
+    rank: str = Doctor.Rank.SPECIALIST_PHYSICIAN
+
+    def __init__(self, path: str, department: Department, close_cases: bool = False, chunk_size: int | None = None):
+        # opened read-only, the old system may still be in use while its data is moved over
+        self.connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        self.connection.row_factory = sqlite3.Row
+        self.department = department
+        self.close_cases = close_cases
+        self.chunk_size = chunk_size or self.chunk_size
+        self.hasher = LegacyPBKDF2PasswordHasher()
+        self.stats = Counter()
+
+    def migrate(self, progress: Progress | None = None) -> Counter:
+        """
+        Migrate everything not migrated yet, returns the number of migrated and skipped rows per table.
+        `progress` is called whenever a chunk is committed.
+        """
+        self._migrate_table('doctors', 'doctor_id', self._doctors, progress)
+        self._migrate_table('patients', 'patient_id', self._patients, progress)
+        self._migrate_table('cases', 'case_id', self._cases, progress)
+        self._migrate_table('reports', 'report_id', self._reports, progress)
+
+        return self.stats
+
+    def close(self):
+        self.connection.close()
+
+    def _chunks(self, table: str, id_column: str) -> Iterator[list[sqlite3.Row]]:
+        last = LegacyRecord.objects.filter(table=table).aggregate(last=Max('legacy_id'))['last'] or 0
+
+        while True:
+            rows = self.connection.execute(
+                f'SELECT * FROM {table} WHERE {id_column} > ? ORDER BY {id_column} LIMIT ?', (last, self.chunk_size),
+            ).fetchall()
+
+            if not rows:
+                return
+
+            yield rows
+            last = rows[-1][id_column]
+
+    def _migrate_table(self, table: str, id_column: str,
+                       migrate: Callable[[list[sqlite3.Row]], dict[int, models.Model | None]],
+                       progress: Progress | None = None):
+        for rows in self._chunks(table, id_column):
+            with transaction.atomic():
+                objects = migrate(rows)
+                LegacyRecord.objects.bulk_create([
+                    LegacyRecord(table=table, legacy_id=legacy_id, model=obj._meta.label if obj else '',
+                                 object_id=obj.pk if obj else None)
+                    for legacy_id, obj in objects.items()
+                ])
+
+            migrated = sum(obj is not None for obj in objects.values())
+            self.stats[table] += migrated
+            self.stats[f'{table} skipped'] += len(objects) - migrated
+
+            if progress is not None:
+                progress(sum(self.stats.values()), None, f'{self.stats[table]} Zeilen aus {table} übernommen')
+
+    @staticmethod
+    def _new_ids(table: str, legacy_ids) -> dict[int, int]:
+        return dict(LegacyRecord.objects
+                    .filter(table=table, legacy_id__in={legacy_id for legacy_id in legacy_ids if legacy_id})
+                    .exclude(object_id=None)
+                    .values_list('legacy_id', 'object_id'))
+
+    def _doctors(self, rows: list[sqlite3.Row]) -> dict[int, Doctor]:
+        doctors = {}
+
+        # doctors inherit from accounts, which bulk inserts don't support, but there are only a few of them
+        for row in rows:
+            username = row['username']
+            if not username or len(username) > 33 or not HISAccount.objects.is_valid_username(username):
+                username = HISAccount.objects.get_valid_username(row['first_name'], row['last_name'])
+
+            doctor = Doctor(
+                username=username,
+                password=self.hasher.from_legacy(row['salt'], row['pw_hash']),
+                first_name=row['first_name'][:32],
+                last_name=row['last_name'][:32],
+                date_of_birth=PLACEHOLDER_DATE_OF_BIRTH,
+                city='',
+                street='',
+                street_number=0,
+                zip_code='',
+                department=self.department,
+                rank=self.rank,
+            )
+            doctor.save()
+            HISAccount.objects.filter(pk=doctor.pk).update(created_at=_timestamp(row['created']) or doctor.created_at)
+            doctors[row['doctor_id']] = doctor
+
+        roles = self.connection.execute(
+            f'SELECT doctors_roles.doctor_id, roles.role FROM doctors_roles '
+            f'JOIN roles ON roles.role_id = doctors_roles.role_id '
+            f'WHERE doctors_roles.doctor_id IN ({", ".join("?" * len(doctors))})',
+            list(doctors),
+        )
+        DoctorQualification.objects.bulk_create([
+            DoctorQualification(doctor=doctors[doctor_id], qualification=QUALIFICATIONS[role])
+            for doctor_id, role in roles if role in QUALIFICATIONS
+        ])
+
+        return doctors
+
+    def _patients(self, rows: list[sqlite3.Row]) -> dict[int, Patient | None]:
+        # patients need a date of birth, which the old system didn't require
+        patients = {
+            row['patient_id']: Patient(first_name=row['first_name'][:32], last_name=row['last_name'][:32],
+                                       date_of_birth=date.fromisoformat(row['date_of_birth']))
+            if row['date_of_birth'] else None
+            for row in rows
+        }
+
+        created = Patient.objects.bulk_create([patient for patient in patients.values() if patient is not None])
+        index_patients(created)
+
+        return patients
+
+    def _cases(self, rows: list[sqlite3.Row]) -> dict[int, Case | None]:
+        patients = self._new_ids('patients', (row['patient_id'] for row in rows))
+
+        # the doctor assigned first is the case's doctor
+        assignments = self.connection.execute(
+            f'SELECT case_id, doctor_id FROM doctors_cases WHERE case_id IN ({", ".join("?" * len(rows))}) '
+            f'ORDER BY created DESC',
+            [row['case_id'] for row in rows],
+        ).fetchall()
+        legacy_doctors = dict(assignments)
+        doctors = self._new_ids('doctors', legacy_doctors.values())
+
+        cases = {}
+        migrated = []
+        for row in rows:
+            if row['patient_id'] not in patients:
+                cases[row['case_id']] = None
+                continue
+
+            cases[row['case_id']] = Case(
+                patient_id=patients[row['patient_id']],
+                assigned_department=self.department,
+                assigned_doctor_id=doctors.get(legacy_doctors.get(row['case_id'])),
+            )
+            migrated.append(row)
+
+        created = [case for case in cases.values() if case is not None]
+        self._close_cases(created, migrated)
+        created = Case.objects.bulk_create(created)
+        _restore_created_at(Case, created, migrated)
+
+        return cases
+
+    def _close_cases(self, cases: list[Case], rows: list[sqlite3.Row]):
+        """
+        Close the new cases at their last change, with `close_cases` all of them, otherwise all but the newest case of
+        every patient, cases migrated before included. Closing times are unique per patient, so cases that changed
+        last at the same time close a microsecond after each other.
+        """
+        existing = Case.objects.filter(patient_id__in={case.patient_id for case in cases})
+        taken = set(existing.exclude(closed_at=None).values_list('patient_id', 'closed_at'))
+
+        # (created, last changed, case)
+        entries = [(_timestamp(row['created']) or timezone.now(), _timestamp(row['updated']), case)
+                   for case, row in zip(cases, rows)]
+        entries = [(created, updated or created, case) for created, updated, case in entries]
+
+        if self.close_cases:
+            closing = entries
+        else:
+            by_patient = {}
+            open_cases = list(existing.filter(closed_at=None))
+            for case, updated in zip(open_cases, self._last_changes(open_cases)):
+                by_patient.setdefault(case.patient_id, []).append((case.created_at, updated or case.updated_at, case))
+            for entry in entries:
+                by_patient.setdefault(entry[2].patient_id, []).append(entry)
+
+            closing = [entry for patient_entries in by_patient.values()
+                       for entry in sorted(patient_entries, key=lambda item: item[0])[:-1]]
+
+        reclosed = []
+        for _created, closed_at, case in closing:
+            while (case.patient_id, closed_at) in taken:
+                closed_at += timedelta(microseconds=1)
+
+            taken.add((case.patient_id, closed_at))
+            case.closed_at = closed_at
+            if case.pk is not None:
+                reclosed.append(case)
+
+        # migrated before as the newest case of their patient, which they aren't anymore
+        Case.objects.bulk_update(reclosed, ['closed_at'])
+
+    def _last_changes(self, cases: list[Case]) -> list[datetime | None]:
+        """When the old system last changed `cases`, None for cases that weren't migrated."""
+        legacy_ids = dict(LegacyRecord.objects
+                          .filter(table='cases', object_id__in=[case.pk for case in cases])
+                          .values_list('object_id', 'legacy_id'))
+        updated = dict(self.connection.execute(
+            f'SELECT case_id, updated FROM cases WHERE case_id IN ({", ".join("?" * len(legacy_ids))})',
+            list(legacy_ids.values()),
+        ).fetchall()) if legacy_ids else {}
+
+        return [_timestamp(updated.get(legacy_ids.get(case.pk))) for case in cases]
+
+    def _reports(self, rows: list[sqlite3.Row]) -> dict[int, models.Model | None]:
+        cases = self._new_ids('cases', (row['case_id'] for row in rows))
+        doctors = self._new_ids('doctors', (row['doctor_id'] for row in rows))
+
+        rows_by_model = {}
+        for row in rows:
+            if row['case_id'] in cases and row['doctor_id'] in doctors:
+                rows_by_model.setdefault(REPORT_MODELS.get(row['report_type'], AnamnesisReport), []).append(row)
+
+        reports = dict.fromkeys((row['report_id'] for row in rows), None)
+        for model, model_rows in rows_by_model.items():
+            for row, report in zip(model_rows, self._create_reports(model, model_rows, cases, doctors)):
+                reports[row['report_id']] = report
+
+        return reports
+
+    def _create_reports(self, model: type[models.Model], rows: list[sqlite3.Row], cases: dict[int, int],
+                        doctors: dict[int, int]) -> list[models.Model]:
+        # reports of the new system answer orders, the old ones get a closed order each
+        order_model, order_field = ((ExaminationOrder, 'examination_order') if model is ExaminationReport
+                                    else (TreatmentOrder, 'treatment_order'))
+        orders = []
+        for row in rows:
+            doctor, written_at = doctors[row['doctor_id']], _timestamp(row['created']) or timezone.now()
+            order = order_model(case_id=cases[row['case_id']], issued_by_id=doctor, assigned_to_id=doctor,
+                                assigned_at=written_at, closed_at=written_at)
+            if order_model is TreatmentOrder:
+                order.doctor_id = doctor
+            else:
+                order.description = str(model._meta.verbose_name)
+            orders.append(order)
+
+        orders = order_model.objects.bulk_create(orders)
+        _restore_created_at(order_model, orders, rows)
+
+        reports = []
+        for row, order in zip(rows, orders):
+            report = model(case_id=order.case_id, written_by_id=order.issued_by_id, text=row['text'],
+                           **{order_field: order})
+            self._legacy_data(report, row['data'])
+            reports.append(report)
+
+        reports = model.objects.bulk_create(reports)
+        _restore_created_at(model, reports, rows)
+
+        for report, row in zip(reports, rows):
+            if model is ExaminationReport and row['data']:
+                # the DICOM header the old system kept, Dataset.to_json()
+                attach(report, [row['data'].encode()], 'dicom.json', 'application/dicom+json')
+
+        return reports
+
+    @staticmethod
+    def _legacy_data(report: models.Model, data: str | None):
+        if not data:
+            return
+
+        if isinstance(report, DiagnosisReport):
+            try:
+                report.tumor, report.nodes, report.metastases = parse_staging(data)
+                return
+            except ValueError:
+                pass
+        elif isinstance(report, ExaminationReport):
+            # attached as a file once the report exists
+            return
+        elif isinstance(report, TherapyReport) and data.count(';') == 1:
+            # resected organ and date, see ResectionMetaData
+            organ, resected_on = data.split(';')
+            report.text += f'\n\nResektion: {organ}, am {resected_on}'
+            return
+
+        report.text += f'\n\n{data}'
@@ -0,0 +1,128 @@
+"""
+Merging duplicate patients.
+
+All foreign keys pointing to the merged patient are repointed to the surviving patient with one UPDATE per
+referencing table, so the number of statements doesn't depend on how many cases, orders or reports are attached.
+Orders and reports reference the case and not the patient, so they follow their case without being touched.
+The audit log and earlier merges are history, they keep the id of the merged patient.
+"""
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models.accounts import HISAccount
+from ..models.audit import AuditEvent
+from ..models.duplicates import DuplicateCandidate, PatientMerge
+from ..models.objects import Patient
+from ..models.search import PatientSearchIndex, PatientTrigram
+from ..models.tasks import Case
+
+# rows derived from the patient itself, these are dropped with the merged patient instead of being moved
+DERIVED_MODELS = (PatientSearchIndex, PatientTrigram, DuplicateCandidate)
+# records of what happened to the patient, these aren't moved
+HISTORY_MODELS = (AuditEvent, PatientMerge)
+
+_SHIFT = timedelta(microseconds=1)
+
+
+def _patient_relations() -> list[models.ForeignKey]:
+    return [
+        relation.field for relation in Patient._meta.get_fields(include_hidden=True)
+        if relation.one_to_many and relation.auto_created
+        and relation.related_model not in DERIVED_MODELS + HISTORY_MODELS
+    ]
+
+
+def _changes(model: type[models.Model], **values) -> dict:
+    # moved rows count as changed, so incremental exports pick them up
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        values['updated_at'] = timezone.now()
+    return values
+
+
+def _relation_key(field: models.ForeignKey) -> str:
+    return f'{field.model._meta.label_lower}.{field.name}'
+
+
+def _resolve_case_conflicts(survivor: Patient, merged: Patient) -> tuple[list[int], list[int]]:
+    """
+    Cases are unique per patient and closing time, and a patient should only have one open case.
+    Open cases of the merged patient are discharged if the survivor has an open case as well,
+    cases closed at the exact same time as one of the survivor's cases are shifted by a microsecond.
+    """
+    survivor_closing_times = set(Case.objects.filter(patient=survivor).values_list('closed_at', flat=True))
+
+    closed = []
+    if None in survivor_closing_times:
+        closed = list(Case.objects.filter(patient=merged, closed_at=None).values_list('pk', flat=True))
+        # releases their rooms and orders, the closing times are distinct per patient
+        Case.objects.filter(pk__in=closed).close()
+
+    shifted = list(Case.objects.filter(patient=merged, closed_at__in=survivor_closing_times - {None})
+                   .values_list('pk', flat=True))
+    if shifted:
+        Case.objects.filter(pk__in=shifted).update(**_changes(Case, closed_at=F('closed_at') + _SHIFT))
+
+    return closed, shifted
+
+
+@transaction.atomic
+def merge_patients(survivor: Patient, merged: Patient, merged_by: HISAccount | None = None) -> PatientMerge:
+    """Move everything attached to `merged` over to `survivor` and delete `merged`."""
+    if survivor.pk == merged.pk:
+        raise ValueError('Ein_e Patient_in kann nicht mit sich selbst zusammengeführt werden')
+
+    # lock both rows, so concurrent merges of the same patients are serialized
+    list(Patient.objects.select_for_update().filter(pk__in=(survivor.pk, merged.pk)))
+
+    closed, shifted = _resolve_case_conflicts(survivor, merged)
+
+    moved = {}
+    for field in _patient_relations():
+        rows = field.model._base_manager.filter(**{field.attname: merged.pk})
+        moved[_relation_key(field)] = list(rows.values_list('pk', flat=True))
+        rows.update(**_changes(field.model, **{field.attname: survivor.pk}))
+
+    # the survivor's resource shows the moved identifiers
+    Patient.objects.filter(pk=survivor.pk).update(**_changes(Patient))
+
+    merge = PatientMerge.objects.create(
+        survivor=survivor,
+        merged_patient_id=merged.pk,
+        merged_patient_data={field.attname: field.value_from_object(merged) for field in Patient._meta.concrete_fields},
+        moved=moved,
+        closed_cases=closed,
+        shifted_cases=shifted,
+        merged_by=merged_by,
+    )
+
+    # drops the derived rows, including the duplicate candidates of the merged patient
+    merged.delete()
+
+    return merge
+
+
+@transaction.atomic
+def undo_merge(merge: PatientMerge) -> Patient:
+    """Restore the merged patient and move its rows back."""
+    if merge.undone_at is not None:
+        raise ValueError('Die Zusammenführung wurde bereits rückgängig gemacht')
+
+    merged = Patient(**merge.merged_patient_data)
+    merged.save(force_insert=True)
+
+    relations = {_relation_key(field): field for field in _patient_relations()}
+    for key, pks in merge.moved.items():
+        field = relations[key]
+        field.model._base_manager.filter(pk__in=pks).update(**_changes(field.model, **{field.attname: merged.pk}))
+    Patient.objects.filter(pk=merge.survivor_id).update(**_changes(Patient))
+
+    Case.objects.filter(pk__in=merge.shifted_cases).update(**_changes(Case, closed_at=F('closed_at') - _SHIFT))
+    Case.objects.filter(pk__in=merge.closed_cases).reopen()
+
+    merge.undone_at = timezone.now()
+    merge.save()
+
+    return merged
@@ -0,0 +1,259 @@
+"""
+Fuzzy patient search.
+
+Patients are indexed by normalized names, Kölner Phonetik codes and name trigrams. A lookup collects candidates
+through the indexed phonetic columns and the rarest trigrams of the query, and only ranks those candidates in python.
+Common trigrams, e.g. the padded initial `  m`, are shared by a large part of all patients, looking them up would
+make a search as slow as the table is large.
+"""
+import unicodedata
+
+from contextlib import contextmanager
+from datetime import date
+from threading import local
+from typing import Iterable, NamedTuple
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from ..models.objects import Patient
+from ..models.search import PatientSearchIndex, PatientTrigram
+
+_FOLDED = {'ß': 'ss', 'æ': 'ae', 'ø': 'o', 'œ': 'oe'}
+
+# trigrams of more patients than this are too common to narrow down the candidates
+COMMON_TRIGRAM_PATIENTS = 2000
+# the rarest trigrams of a query that candidates are looked up by
+RARE_TRIGRAMS = 6
+
+
+def normalize_name(name: str | None) -> str:
+    """Lowercase ascii letters only, so `van Gogh`, `Van-Gogh` and `vanGogh` all become `vangogh`."""
+    if not name:
+        return ''
+
+    name = ''.join(_FOLDED.get(char, char) for char in name.lower())
+    # decompose accented characters and drop the accents
+    name = unicodedata.normalize('NFKD', name)
+
+    return ''.join(char for char in name if 'a' <= char <= 'z')
+
+
+def cologne_phonetics(name: str | None) -> str:
+    """Kölner Phonetik code of a name, e.g. `Müller-Lüdenscheidt` -> `65752682`."""
+    letters = normalize_name(name)
+    codes = []
+
+    for i, char in enumerate(letters):
+        previous = letters[i - 1] if i > 0 else None
+        following = letters[i + 1] if i + 1 < len(letters) else None
+
+        if char in 'aeijouy':
+            code = '0'
+        elif char == 'h':
+            code = ''
+        elif char == 'b':
+            code = '1'
+        elif char == 'p':
+            code = '3' if following == 'h' else '1'
+        elif char in 'dt':
+            code = '8' if following in ('c', 's', 'z') else '2'
+        elif char in 'fvw':
+            code = '3'
+        elif char in 'gkq':
+            code = '4'
+        elif char == 'c':
+            if previous is None:
+                code = '4' if following in ('a', 'h', 'k', 'l', 'o', 'q', 'r', 'u', 'x') else '8'
+            elif previous in ('s', 'z'):
+                code = '8'
+            else:
+                code = '4' if following in ('a', 'h', 'k', 'o', 'q', 'u', 'x') else '8'
+        elif char == 'x':
+            code = '8' if previous in ('c', 'k', 'q') else '48'
+        elif char == 'l':
+            code = '5'
+        elif char in 'mn':
+            code = '6'
+        elif char == 'r':
+            code = '7'
+        else:
+            # s, z
+            code = '8'
+
+        codes.append(code)
+
+    # collapse repeated codes, then drop all vowels except a leading one
+    collapsed = []
+    for digit in ''.join(codes):
+        if not collapsed or collapsed[-1] != digit:
+            collapsed.append(digit)
+
+    return ''.join(digit for i, digit in enumerate(collapsed) if digit != '0' or i == 0)
+
+
+def trigrams(name: str | None) -> set[str]:
+    normalized = normalize_name(name)
+    if not normalized:
+        return set()
+
+    padded = f'  {normalized} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _index_entries(patient: Patient) -> tuple[PatientSearchIndex, list[PatientTrigram]]:
+    entry = PatientSearchIndex(
+        patient=patient,
+        first_name=normalize_name(patient.first_name),
+        last_name=normalize_name(patient.last_name),
+        first_name_phonetic=cologne_phonetics(patient.first_name),
+        last_name_phonetic=cologne_phonetics(patient.last_name),
+        date_of_birth=patient.date_of_birth,
+    )
+
+    grams = trigrams(patient.first_name) | trigrams(patient.last_name)
+    return entry, [PatientTrigram(patient=patient, trigram=gram) for gram in grams]
+
+
+_deferred = local()
+
+
+@contextmanager
+def deferred_indexing():
+    """Collect the patients indexed inside the block, e.g. on save, and index them all at once at its end."""
+    if getattr(_deferred, 'patients', None) is not None:
+        # nested blocks are indexed by the outermost one
+        yield
+        return
+
+    _deferred.patients = set()
+    try:
+        yield
+        patient_ids = _deferred.patients
+    finally:
+        _deferred.patients = None
+
+    # reloaded, as savepoints inside the block may have rolled back some of the changes, or the patient itself
+    if patient_ids:
+        index_patients(Patient.objects.filter(pk__in=patient_ids))
+
+
+def index_patients(patients: Iterable[Patient]):
+    """(Re)build the search keys of the given patients with a fixed number of statements."""
+    patients = list(patients)
+    if not patients:
+        return
+
+    deferred = getattr(_deferred, 'patients', None)
+    if deferred is not None:
+        deferred.update(patient.pk for patient in patients)
+        return
+
+    entries, grams = [], []
+    for patient in patients:
+        entry, patient_grams = _index_entries(patient)
+        entries.append(entry)
+        grams.extend(patient_grams)
+
+    patient_ids = [patient.pk for patient in patients]
+
+    with transaction.atomic():
+        PatientSearchIndex.objects.filter(patient_id__in=patient_ids).delete()
+        PatientTrigram.objects.filter(patient_id__in=patient_ids).delete()
+        PatientSearchIndex.objects.bulk_create(entries)
+        PatientTrigram.objects.bulk_create(grams)
+
+
+def rebuild_index(chunk_size: int = 2000) -> int:
+    count = 0
+    chunk = []
+
+    for patient in Patient.objects.order_by('pk').iterator(chunk_size=chunk_size):
+        chunk.append(patient)
+        if len(chunk) >= chunk_size:
+            index_patients(chunk)
+            count += len(chunk)
+            chunk = []
+
+    index_patients(chunk)
+    return count + len(chunk)
+
+
+class PatientMatch(NamedTuple):
+    patient: Patient
+    score: float
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _query_keys(query: str) -> set[str]:
+    # the query may be a full name, a last name with particles, or both in any order,
+    # so every contiguous span of words is a possible name
+    words = query.replace(',', ' ').split()
+    return {''.join(words[i:j]) for i in range(len(words)) for j in range(i + 1, len(words) + 1)}
+
+
+def _rare_trigrams(grams: set[str]) -> list[str]:
+    """The least common of `grams`, leaving out the common ones. Counted in one query, grouped by trigram."""
+    patients = (PatientTrigram.objects
+                .filter(trigram__in=grams)
+                .values('trigram')
+                .annotate(patients=Count('patient_id'))
+                .values_list('trigram', 'patients'))
+    rare = sorted((count, gram) for gram, count in patients if count <= COMMON_TRIGRAM_PATIENTS)
+
+    return [gram for _count, gram in rare[:RARE_TRIGRAMS]]
+
+
+def search_patients(query: str, date_of_birth: date | None = None,
+                    limit: int = 20, candidate_limit: int = 500) -> list[PatientMatch]:
+    """Patients whose name sounds or is spelled similar to the query, best matches first."""
+    keys = {key for key in _query_keys(query) if normalize_name(key)}
+    if not keys:
+        return []
+
+    codes = {cologne_phonetics(key) for key in keys}
+    query_grams = set().union(*(trigrams(word) for word in query.replace(',', ' ').split()))
+
+    phonetic_hits = PatientSearchIndex.objects.filter(
+        Q(last_name_phonetic__in=codes) | Q(first_name_phonetic__in=codes)
+    ).values_list('patient_id', flat=True)[:candidate_limit]
+
+    rare_grams = _rare_trigrams(query_grams)
+    if rare_grams:
+        trigram_hits = (PatientTrigram.objects
+                        .filter(trigram__in=rare_grams)
+                        .values('patient_id')
+                        .annotate(hits=Count('patient_id'))
+                        .order_by('-hits')
+                        .values_list('patient_id', flat=True)[:candidate_limit])
+    else:
+        # a short query of common trigrams only, the first candidates are as good as any
+        trigram_hits = (PatientTrigram.objects
+                        .filter(trigram__in=query_grams)
+                        .values_list('patient_id', flat=True)[:candidate_limit])
+
+    candidate_ids = set(phonetic_hits) | set(trigram_hits)
+    candidates = PatientSearchIndex.objects.filter(patient_id__in=candidate_ids)
+
+    scored = []
+    for entry in candidates:
+        score = _jaccard(query_grams, trigrams(entry.first_name) | trigrams(entry.last_name))
+
+        if entry.last_name_phonetic in codes:
+            score += 0.5
+        if entry.first_name_phonetic in codes:
+            score += 0.25
+
+        if date_of_birth is not None and entry.date_of_birth is not None:
+            score += 0.5 if entry.date_of_birth == date_of_birth else -0.5
+
+        scored.append((score, entry.patient_id))
+
+    scored.sort(reverse=True)
+    scored = scored[:limit]
+
+    patients = Patient.objects.in_bulk([patient_id for _score, patient_id in scored])
+    return [PatientMatch(patients[patient_id], score) for score, patient_id in scored if patient_id in patients]
@@ -0,0 +1,65 @@
+"""
+TNM staging of diagnosis reports.
+
+Staging is kept in three indexed columns, so statistics like "M1 cases per department" are grouped and counted by
+the database. `stage_reports` fills them from the text of reports written before staging had columns of its own.
+"""
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, F, QuerySet
+from django.utils import timezone
+
+from ..models.medical import parse_staging
+from ..models.tasks import DiagnosisReport
+
+STAGING_FIELDS = ('tumor', 'nodes', 'metastases')
+
+
+def stage_reports(reports: QuerySet | None = None, overwrite: bool = False, batch_size: int = 2000) -> tuple[int, int]:
+    """
+    Parse the staging from the text of `reports`, all diagnosis reports by default, and return how many were staged
+    and how many have no TNM classification in their text. Already staged reports are kept unless `overwrite`.
+    """
+    if reports is None:
+        reports = DiagnosisReport.objects.all()
+    if not overwrite:
+        reports = reports.filter(tumor='')
+
+    texts = reports.order_by('pk').values_list('pk', 'text').iterator(chunk_size=batch_size)
+    staged = unparseable = 0
+
+    while batch := list(islice(texts, batch_size)):
+        # there are only 70 stagings, reports with the same one are updated together
+        by_staging = {}
+        for pk, text in batch:
+            try:
+                by_staging.setdefault(parse_staging(text), []).append(pk)
+            except ValueError:
+                unparseable += 1
+
+        now = timezone.now()
+        with transaction.atomic():
+            for (tumor, nodes, metastases), pks in by_staging.items():
+                staged += DiagnosisReport.objects.filter(pk__in=pks).update(tumor=tumor, nodes=nodes,
+                                                                            metastases=metastases, updated_at=now)
+
+    return staged, unparseable
+
+
+def staging_by_department(*fields: str, **filters) -> list[dict]:
+    """
+    Number of cases per department and per value of the staging `fields`, e.g. `staging_by_department('tumor',
+    metastases='M1')` for the M1 cases by department and T. `filters` are lookups on the diagnosis reports.
+    A case counts once per group, however many of its reports match.
+    """
+    unknown = set(fields) - set(STAGING_FIELDS)
+    if unknown:
+        raise ValueError(f'Not a staging field: {", ".join(sorted(unknown))}')
+
+    return list(DiagnosisReport.objects
+                .exclude(tumor='')
+                .filter(**filters)
+                .values(*fields, department=F('case__assigned_department__name'))
+                .annotate(cases=Count('case', distinct=True))
+                .order_by('department', *fields))
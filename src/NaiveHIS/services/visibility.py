@@ -0,0 +1,57 @@
+"""
+Row-level visibility of cases and of the orders and reports attached to them.
+
+Employees see the cases of their department, the cases they are the assigned doctor of and the cases with an open
+order assigned to them. The rules compile into a single filter, so a restricted changelist is the same query as an
+unrestricted one with a longer WHERE clause, and needs no queries of its own. Admins and administrative staff, who
+admit patients to every department, see all cases.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from ..models.accounts import AdministrativeEmployee, HISAccount
+from ..models.tasks import ExaminationOrder, TransferOrder, TransportOrder, TreatmentOrder
+
+ORDER_MODELS = (TransportOrder, TransferOrder, TreatmentOrder, ExaminationOrder)
+
+UNRESTRICTED_ROLES = (AdministrativeEmployee,)
+
+
+def visibility_scope(user: HISAccount) -> tuple[int, int | None] | None:
+    """What decides about the cases `user` sees, the user and their department, or None if they see all cases."""
+    if user.is_admin or user.is_superuser or user.role in UNRESTRICTED_ROLES:
+        return None
+
+    # the employee row was loaded and cached by looking up the role
+    employee = getattr(user, user.role.__name__.lower()) if user.role is not HISAccount else None
+    return user.pk, employee.department_id if employee is not None else None
+
+
+def _assigned_orders(model, user_pk: int, case: OuterRef) -> Exists:
+    assigned = Q(assigned_to=user_pk)
+    if model is TreatmentOrder:
+        assigned |= Q(doctor=user_pk)
+
+    return Exists(model.objects.filter(assigned, case=case, closed_at=None))
+
+
+def visible_cases(user: HISAccount, lookup: str = '') -> Q | None:
+    """
+    Filter for the rows whose case `user` may see, None if they may see all. `lookup` leads from the filtered model
+    to the case, e.g. 'case' for orders, and is empty for cases themselves.
+    """
+    scope = visibility_scope(user)
+    if scope is None:
+        return None
+
+    user_pk, department = scope
+    prefix = f'{lookup}__' if lookup else ''
+    case = OuterRef(lookup or 'pk')
+
+    condition = Q(**{f'{prefix}assigned_doctor': user_pk})
+    if department is not None:
+        condition |= Q(**{f'{prefix}assigned_department': department})
+
+    for model in ORDER_MODELS:
+        condition |= Q(_assigned_orders(model, user_pk, case))
+
+    return condition
@@ -91,7 +91,54 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # closed cases are moved here by the archive_cases command, set up with `migrate --database archive`
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'archive.sqlite3',
+    },
+}
+
+DATABASE_ROUTERS = ['NaiveHIS.routers.ArchiveRouter']
+
+# cases closed for longer than this are archived
+ARCHIVE_CASES_AFTER_DAYS = 730
+
+# days of the daily census the nightly catch-up recomputes, see NaiveHIS.services.census
+CENSUS_CATCH_UP_DAYS = 3
+
+# content-addressed store for report attachments, see NaiveHIS.blobs
+BLOB_STORE_ROOT = BASE_DIR / 'blobs'
+
+# tests start from migrated and seeded template databases kept here, see NaiveHIS.test_runner
+TEST_RUNNER = 'NaiveHIS.test_runner.SnapshotTestRunner'
+TEST_TEMPLATE_DIR = BASE_DIR / '.test-templates'
+
+# results of the benchmark command are compared against this baseline, slower by more than the threshold fails
+BENCHMARK_BASELINE = BASE_DIR / 'benchmarks.json'
+BENCHMARK_THRESHOLD = 0.25
+
+# HL7 v2 interfaces
+HL7_APPLICATION = 'NaiveHIS'
+HL7_FACILITY = environment.get('HL7_FACILITY', '')
+
+# downstream systems receiving the outbound feed, delivered by the hl7_send_outbound command, e.g.
+# {'lab': {'host': 'lab.local', 'port': 2575, 'messages': ['ADT', 'ORU']}}, without 'messages' a system gets everything
+HL7_OUTBOUND_DESTINATIONS = {}
+
+# Caches
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # shared between worker processes, holds the version tokens of the reference data cache
+    'reference': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'reference',
+        'TIMEOUT': None,
+    },
 }
 
 # Password validation
@@ -112,6 +159,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    # accounts migrated from the old system by the migrate_legacy command, rehashed on their next login
+    'NaiveHIS.hashers.LegacyPBKDF2PasswordHasher',
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
@@ -0,0 +1,76 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import reference_cache, INVALIDATED_BY
+from .hl7 import events
+from .models.accounts import Doctor, DoctorQualification
+from .models.hl7 import PatientIdentifier
+from .models.objects import Patient
+from .models.tasks import Case, Report, TransferOrder, TransportOrder
+from .services import census
+from .services.search import index_patients
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_reference_data(sender, **kwargs):
+    if sender._meta.app_label != 'NaiveHIS':
+        return
+
+    for namespace in INVALIDATED_BY.get(sender.__name__, ()):
+        reference_cache.bump_on_commit(namespace)
+
+
+@receiver(post_save, sender=Patient)
+def update_patient_search_index(sender, instance, raw=False, **kwargs):
+    # fixtures are loaded as they are, their index is rebuilt with the rebuild_patient_index command
+    if not raw:
+        index_patients([instance])
+
+
+@receiver(post_save, sender=PatientIdentifier)
+@receiver(post_delete, sender=PatientIdentifier)
+def touch_patient(sender, instance, raw=False, **kwargs):
+    # identifiers are part of the patient's FHIR resource, incremental exports go by the patient's updated_at
+    if not raw:
+        Patient.objects.filter(pk=instance.patient_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=DoctorQualification)
+@receiver(post_delete, sender=DoctorQualification)
+def touch_doctor(sender, instance, raw=False, **kwargs):
+    # qualifications are part of the practitioner's FHIR resource, like identifiers are of the patient's
+    if not raw:
+        Doctor.objects.filter(pk=instance.doctor_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Case)
+def feed_admission(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events.admitted([instance])
+
+
+@receiver(post_save, sender=Case)
+def count_admission(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        census.admitted([instance])
+
+
+@receiver(post_save, sender=TransferOrder)
+def count_transfer(sender, instance, raw=False, **kwargs):
+    if instance.closed_by_save and not raw:
+        census.transferred([instance])
+
+
+@receiver(post_save, sender=TransferOrder)
+@receiver(post_save, sender=TransportOrder)
+def feed_transfer(sender, instance, raw=False, **kwargs):
+    if instance.closed_by_save and not raw:
+        events.transferred([instance])
+
+
+@receiver(post_save)
+def feed_report(sender, instance, created, raw=False, **kwargs):
+    if issubclass(sender, Report) and not raw:
+        events.reported([instance], corrected=not created)
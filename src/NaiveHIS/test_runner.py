@@ -0,0 +1,151 @@
+"""
+Test runner that starts every run from a snapshot of a migrated and seeded database.
+
+Migrating a fresh database and seeding it with the demo data of init_data.py is the slow part of starting a test run.
+The runner does it once, into a template file per database, and restores the test databases from the templates
+afterwards: with SQLite's backup API into memory, or as a file copy if TEST['NAME'] names a file. Workers of parallel
+runs are cloned from the restored databases as usual.
+
+Templates are named after a fingerprint of the migrations and the seed data, so changing either builds new ones on
+the next run, `--rebuild-templates` forces it. Other database backends are set up the usual way.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from importlib import import_module
+from pathlib import Path
+
+import django
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.migrations.loader import MigrationLoader
+from django.test.runner import DiscoverRunner
+from django.test.utils import get_unique_databases_and_mirrors
+from django.utils.module_loading import import_string
+
+
+class SnapshotTestRunner(DiscoverRunner):
+    # called once on the default database of a new template
+    seed: str | None = 'init_data.init_data'
+
+    def __init__(self, *args, rebuild_templates: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rebuild_templates = rebuild_templates
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--rebuild-templates', action='store_true',
+                            help='migrate and seed the template databases anew')
+
+    def fingerprint(self) -> str:
+        """Hash of what the templates are built from, the migrations of all apps and the seed data."""
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        paths = sorted({sys.modules[migration.__module__].__file__ for migration in loader.disk_migrations.values()})
+        if self.seed:
+            paths.append(import_module(self.seed.rpartition('.')[0]).__file__)
+
+        digest = hashlib.sha256(django.get_version().encode())
+        for path in paths:
+            digest.update(path.encode())
+            digest.update(Path(path).read_bytes())
+
+        return digest.hexdigest()[:16]
+
+    def setup_databases(self, aliases=None, serialized_aliases=None, **kwargs):
+        test_databases, mirrored_aliases = get_unique_databases_and_mirrors(aliases)
+        if any(connections[alias].vendor != 'sqlite' for _name, group in test_databases.values() for alias in group):
+            return super().setup_databases(aliases=aliases, serialized_aliases=serialized_aliases, **kwargs)
+
+        fingerprint = self.fingerprint()
+        templates = {
+            group[0]: Path(settings.TEST_TEMPLATE_DIR) / f'{group[0]}-{fingerprint}.sqlite3'
+            for _name, group in test_databases.values()
+        }
+        missing = {alias: path for alias, path in templates.items() if self.rebuild_templates or not path.exists()}
+        if missing:
+            with self.time_keeper.timed('  Building templates'):
+                self._build_templates(missing)
+
+        old_names = []
+        for name, (first, *mirrors) in test_databases.values():
+            connection = connections[first]
+            old_names.append((connection, name, True))
+
+            with self.time_keeper.timed(f"  Restoring '{first}'"):
+                self._restore(connection, templates[first])
+
+            if serialized_aliases is None or first in serialized_aliases:
+                connection._test_serialized_contents = connection.creation.serialize_db_to_string()
+
+            if self.parallel > 1:
+                for index in range(self.parallel):
+                    with self.time_keeper.timed(f"  Cloning '{first}'"):
+                        connection.creation.clone_test_db(suffix=str(index + 1), verbosity=self.verbosity)
+
+            for alias in mirrors:
+                old_names.append((connections[alias], name, False))
+                connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+
+        for alias, mirror in mirrored_aliases.items():
+            connections[alias].creation.set_as_test_mirror(connections[mirror].settings_dict)
+
+        if self.debug_sql:
+            for alias in connections:
+                connections[alias].force_debug_cursor = True
+
+        return old_names
+
+    def _build_templates(self, templates: dict[str, Path]):
+        building, names = {}, {}
+
+        for alias, path in templates.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # built under a temporary name, concurrent runs never see a template that isn't complete
+            file, building[alias] = tempfile.mkstemp(prefix=f'{alias}-', suffix='.building', dir=path.parent)
+            os.close(file)
+
+            connection = connections[alias]
+            # create_test_db points the connection to the new database, it's pointed back when the template is done
+            names[alias], test_name = connection.settings_dict['NAME'], connection.settings_dict['TEST']['NAME']
+            connection.settings_dict['TEST']['NAME'] = building[alias]
+            try:
+                connection.creation.create_test_db(verbosity=self.verbosity, autoclobber=True, serialize=False)
+            finally:
+                connection.settings_dict['TEST']['NAME'] = test_name
+
+        if self.seed and DEFAULT_DB_ALIAS in building:
+            import_string(self.seed)()
+
+        for alias, path in templates.items():
+            connection = connections[alias]
+            connection.close()
+            settings.DATABASES[alias]['NAME'] = connection.settings_dict['NAME'] = names[alias]
+
+            for stale in path.parent.glob(f'{alias}-*.sqlite3'):
+                stale.unlink(missing_ok=True)
+            os.replace(building[alias], path)
+
+    @staticmethod
+    def _restore(connection: BaseDatabaseWrapper, template: Path):
+        test_name = connection.creation._get_test_db_name()
+        connection.close()
+        settings.DATABASES[connection.alias]['NAME'] = connection.settings_dict['NAME'] = test_name
+
+        if not connection.creation.is_in_memory_db(test_name):
+            shutil.copyfile(template, test_name)
+            return
+
+        # the in-memory database lives as long as the connection, which the backend never closes
+        connection.ensure_connection()
+        source = sqlite3.connect(f'file:{template}?mode=ro', uri=True)
+        try:
+            source.backup(connection.connection)
+        finally:
+            source.close()
@@ -0,0 +1,86 @@
+import json
+import tempfile
+
+from datetime import timedelta
+from pathlib import Path
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..fhir.export import bulk_export
+from ..models.accounts import HISAccount
+from ..models.archive import ArchivedRecord
+from ..models.dicom import DicomStudy
+from ..models.objects import Department, Patient
+from ..models.tasks import Case, ExaminationOrder
+from ..services.archive import archive_cases, archived, kept_rows, patient_cases
+
+
+class ArchiveTests(TestCase):
+    databases = {'default', 'archive'}
+
+    def setUp(self):
+        self.issuer = HISAccount.objects.order_by('pk').first()
+        self.department = Department.objects.create(name='Archiv')
+        self.patient = Patient.objects.create(first_name='Archiv', last_name='Test', date_of_birth='2000-01-01')
+
+        self.case = Case.objects.create(patient=self.patient, assigned_department=self.department)
+        self.order = ExaminationOrder.objects.create(issued_by=self.issuer, case=self.case, description='Röntgen')
+        self.study = DicomStudy.objects.create(study_instance_uid='1.2.3', patient=self.patient, case=self.case,
+                                               examination_order=self.order)
+        Case.objects.filter(pk=self.case.pk).close(closed_at=timezone.now() - timedelta(days=2))
+
+        self.open_case = Case.objects.create(patient=self.patient, assigned_department=self.department)
+        self.assertEqual(archive_cases(older_than=timedelta(days=1)), 1)
+
+    def test_links_are_restored(self):
+        with self.assertNumQueries(2, using='archive'):
+            order, = archived(ExaminationOrder, case_id=self.case.pk)
+
+        self.assertTrue(order.case.is_archived)
+        self.assertEqual(order.case.patient_id, self.patient.pk)
+        self.assertEqual(order.case.assigned_department, self.department)
+
+        # the study keeps the links to the archived case and order
+        study = DicomStudy.objects.get(pk=self.study.pk)
+        self.assertEqual((study.case_id, study.examination_order_id), (self.case.pk, self.order.pk))
+        self.assertEqual(kept_rows(self.case.pk)[DicomStudy], [study])
+
+    def test_patient_cases(self):
+        cases = patient_cases(self.patient.pk)
+        self.assertEqual([case.pk for case in cases], [self.case.pk, self.open_case.pk])
+        self.assertEqual([getattr(case, 'is_archived', False) for case in cases], [True, False])
+
+    def test_fhir_export(self):
+        since = ArchivedRecord.objects.get(model='NaiveHIS.Case', object_id=self.case.pk).archived_at
+
+        with tempfile.TemporaryDirectory() as directory:
+            bulk_export(directory, ['Encounter', 'ServiceRequest'], since=since - timedelta(seconds=1), workers=1)
+            resources = [json.loads(line) for path in sorted(Path(directory).glob('*.ndjson'))
+                         for line in path.read_text(encoding='utf-8').splitlines()]
+
+            encounters = {resource['id']: resource for resource in resources if resource['resourceType'] == 'Encounter'}
+            self.assertEqual(encounters[str(self.case.pk)]['status'], 'finished')
+            self.assertEqual(encounters[str(self.case.pk)]['serviceType'], {'text': 'Archiv'})
+            self.assertIn(f'examinationorder-{self.order.pk}', [resource['id'] for resource in resources])
+
+            # archived before `since`, only the open case has changed since
+            manifest = bulk_export(directory, ['Encounter'], since=timezone.now(), workers=1)
+            self.assertEqual(manifest['output'], [])
+
+    def test_admin(self):
+        HISAccount.objects.create_superuser('archivar', password='archivar')
+        self.client.login(username='archivar', password='archivar')
+
+        response = self.client.get(reverse('admin:NaiveHIS_patient_change', args=(self.patient.pk,)))
+        self.assertContains(response, f'object_id={self.case.pk}')
+
+        # the archived links are shown, and can't be dropped by saving the study
+        response = self.client.get(reverse('admin:NaiveHIS_dicomstudy_change', args=(self.study.pk,)))
+        self.assertNotIn('case', response.context['adminform'].form.fields)
+        self.assertContains(response, '(archiviert)')
+
+        record = ArchivedRecord.objects.get(model='NaiveHIS.Case', object_id=self.case.pk)
+        response = self.client.get(reverse('admin:NaiveHIS_archivedrecord_change', args=(record.pk,)))
+        self.assertContains(response, reverse('admin:NaiveHIS_dicomstudy_change', args=(self.study.pk,)))
@@ -0,0 +1,111 @@
+import tempfile
+
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin.attachments import _byte_range
+from ..blobs import blob_store
+from ..models.accounts import HISAccount
+from ..models.archive import ArchivedRecord
+from ..models.attachments import Attachment, Blob
+from ..models.objects import Department, Patient
+from ..models.tasks import Case, ExaminationOrder, ExaminationReport
+from ..services.attachments import attach, collect_blobs
+
+
+class ByteRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(_byte_range('bytes=0-9', 50), (0, 10))
+        self.assertEqual(_byte_range('bytes=10-', 50), (10, 50))
+        self.assertEqual(_byte_range('bytes=-10', 50), (40, 50))
+        # clipped to the end of the file
+        self.assertEqual(_byte_range('bytes=40-99', 50), (40, 50))
+        self.assertEqual(_byte_range('bytes=-99', 50), (0, 50))
+
+    def test_whole_file(self):
+        for header in ('bytes=0-1,5-6', 'bytes=-', 'items=0-1'):
+            self.assertIsNone(_byte_range(header, 50))
+
+    def test_not_satisfiable(self):
+        for header in ('bytes=50-', 'bytes=9-5'):
+            with self.assertRaises(ValueError):
+                _byte_range(header, 50)
+
+
+class BlobStoreTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(BLOB_STORE_ROOT=directory.name))
+
+        self.user = HISAccount.objects.order_by('pk').first()
+        patient = Patient.objects.create(first_name='Anhang', last_name='Test', date_of_birth='2000-01-01')
+        case = Case.objects.create(patient=patient, assigned_department=Department.objects.first())
+        order = ExaminationOrder.objects.create(issued_by=self.user, case=case, description='Röntgen')
+        self.report = ExaminationReport.objects.create(written_by=self.user, case=case, examination_order=order,
+                                                       text='Befund')
+
+    def _attach(self, content: bytes, content_type: str = 'application/pdf') -> Attachment:
+        return attach(self.report, [content[:4], content[4:]], 'befund.pdf', content_type, self.user)
+
+
+class DownloadTests(BlobStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        HISAccount.objects.create_superuser('anhang', password='anhang')
+        self.client.login(username='anhang', password='anhang')
+
+        self.attachment = self._attach(b'0123456789')
+        self.url = reverse('admin:NaiveHIS_examinationreport_attachment', args=(self.report.pk, self.attachment.pk))
+        self.etag = f'"{self.attachment.blob_id}"'
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['ETag'], self.etag)
+        response.close()
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        # the range belongs to another version of the file, the whole one is sent
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"veraltet"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_not_modified(self):
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag).status_code, 304)
+
+
+class CollectBlobsTests(BlobStoreTestCase):
+    databases = {'default', 'archive'}
+
+    def _blob(self, content: bytes, stored_at=None) -> str:
+        digest, size = blob_store.store([content])
+        Blob.objects.create(sha256=digest, size=size, stored_at=stored_at or timezone.now() - timedelta(days=1))
+        return digest
+
+    def test_collect(self):
+        attached = self._attach(b'angehaengt').blob_id
+        Blob.objects.filter(pk=attached).update(stored_at=timezone.now() - timedelta(days=1))
+        unreferenced = self._blob(b'verwaist')
+        recent = self._blob(b'gerade hochgeladen', stored_at=timezone.now())
+        archived = self._blob(b'archiviert')
+        ArchivedRecord.objects.create(model=Attachment._meta.label, object_id=1, case_id=1, patient_id=1,
+                                      closed_at=timezone.now(), data={'blob_id': archived})
+
+        self.assertEqual(collect_blobs(), 1)
+        self.assertEqual(set(Blob.objects.values_list('sha256', flat=True)), {attached, recent, archived})
+        self.assertFalse(blob_store.exists(unreferenced))
+        self.assertTrue(blob_store.exists(attached))
@@ -0,0 +1,59 @@
+from uuid import uuid4
+
+from django.db import transaction
+from django.test import TestCase
+
+from .. import cache
+from ..cache import ReferenceDataCache
+from ..models.medical import Discipline
+from ..models.objects import Department, DepartmentQualifications
+
+
+def _names() -> list[str]:
+    return [department.name for department in cache.departments()]
+
+
+class ReferenceDataCacheTests(TestCase):
+    def setUp(self):
+        self.namespace = f'test-{uuid4().hex}'
+        self.loads = 0
+
+    def _load(self) -> int:
+        self.loads += 1
+        return self.loads
+
+    def test_cached_until_bumped(self):
+        reference_cache = ReferenceDataCache()
+        self.assertEqual(reference_cache.get(self.namespace, self._load), 1)
+        self.assertEqual(reference_cache.get(self.namespace, self._load), 1)
+
+        reference_cache.bump(self.namespace)
+        self.assertEqual(reference_cache.get(self.namespace, self._load), 2)
+
+    def test_token_of_other_processes_is_remembered(self):
+        remembering, asking = ReferenceDataCache(token_ttl=60), ReferenceDataCache(token_ttl=0)
+        remembering.get(self.namespace, self._load)
+        asking.get(self.namespace, self._load)
+
+        # bumped by another process
+        ReferenceDataCache().bump(self.namespace)
+        self.assertEqual(remembering.get(self.namespace, self._load), 1)
+        self.assertEqual(asking.get(self.namespace, self._load), 3)
+
+    def test_saved_reference_data_is_served(self):
+        _names()
+        Department.objects.create(name='Cache A')
+        self.assertIn('Cache A', _names())
+
+        department = Department.objects.get(name='Cache A')
+        DepartmentQualifications.objects.create(department=department, qualification=Discipline.values[0])
+        self.assertEqual(cache.department_qualifications()[department.pk], [Discipline.values[0]])
+
+    def test_rolled_back_writes_are_not_served(self):
+        _names()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Department.objects.create(name='Cache B')
+            self.assertIn('Cache B', _names())
+            raise RuntimeError
+
+        self.assertNotIn('Cache B', _names())
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models.accounts import HISAccount
+from ..models.census import DailyCensus
+from ..models.objects import Department, Patient
+from ..models.tasks import Case, TransferOrder
+from ..services import census
+
+
+class CensusTests(TestCase):
+    def setUp(self):
+        self.issuer = HISAccount.objects.order_by('pk').first()
+        self.departments = [Department.objects.create(name=f'Census {name}') for name in 'ABC']
+        self.now = timezone.now()
+
+    def _case(self, department: Department) -> Case:
+        patient = Patient.objects.create(first_name='Census', last_name='Test', date_of_birth='2000-01-01')
+        return Case.objects.create(patient=patient, assigned_department=department)
+
+    def _transfer(self, case: Case, from_department: Department, to_department: Department,
+                  minutes: int = None) -> TransferOrder:
+        closed_at = self.now + timedelta(minutes=minutes) if minutes is not None else None
+        return TransferOrder.objects.create(issued_by=self.issuer, case=case, from_department=from_department,
+                                            to_department=to_department, closed_at=closed_at)
+
+    def _rows(self) -> list[tuple]:
+        return list(DailyCensus.objects.filter(department__in=self.departments).order_by('department', 'day')
+                    .values_list('department', 'day', 'census', 'admissions', 'discharges', 'transfers_in',
+                                 'transfers_out'))
+
+    def test_live_rows_match_rebuild(self):
+        first, second, third = self.departments
+        transferred = self._case(first)
+        self._transfer(transferred, first, second, minutes=1)
+        self._transfer(transferred, second, third, minutes=2)
+
+        discharged = self._case(second)
+        Case.objects.filter(pk=discharged.pk).close(closed_at=self.now + timedelta(minutes=3))
+
+        # the open transfer is closed by the discharge, it wasn't carried out
+        not_transferred = self._case(first)
+        self._transfer(not_transferred, first, third)
+        Case.objects.filter(pk=not_transferred.pk).close(closed_at=self.now + timedelta(minutes=4))
+
+        live = self._rows()
+        census.rebuild(timezone.localdate())
+        self.assertEqual(self._rows(), live)
+        self.assertEqual([row[2] for row in live], [0, 0, 1])
+
+    def test_transfer_starts_from_current_department(self):
+        first, second, third = self.departments
+        case = self._case(first)
+        with self.assertRaises(ValidationError):
+            TransferOrder(issued_by=self.issuer, case=case, from_department=second, to_department=third).clean()
+
+        self._transfer(case, first, second, minutes=1)
+        TransferOrder(issued_by=self.issuer, case=case, from_department=second, to_department=third).clean()
+        with self.assertRaises(ValidationError):
+            TransferOrder(issued_by=self.issuer, case=case, from_department=first, to_department=third).clean()
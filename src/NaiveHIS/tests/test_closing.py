@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from ..models.accounts import HISAccount
+from ..models.discharge import DischargeSummary
+from ..models.objects import Department, Patient
+from ..models.tasks import Case, ExaminationOrder
+
+
+class CloseCasesTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(first_name='Close', last_name='Test', date_of_birth='2000-01-01')
+        department = Department.objects.first()
+        self.cases = [Case.objects.create(patient=self.patient, assigned_department=department) for _ in range(2)]
+
+    def test_close_open_cases_of_one_patient(self):
+        # cases are unique per patient and closing time
+        self.assertEqual(Case.objects.filter(patient=self.patient).close(), 2)
+
+        closing_times = Case.objects.filter(patient=self.patient).values_list('closed_at', flat=True)
+        self.assertEqual(len(set(closing_times)), 2)
+        self.assertNotIn(None, closing_times)
+        self.assertEqual(DischargeSummary.objects.filter(case__in=self.cases).count(), 2)
+
+    def test_reopen(self):
+        Case.objects.filter(patient=self.patient).close()
+        Case.objects.filter(patient=self.patient).reopen()
+
+        self.assertFalse(Case.objects.filter(patient=self.patient).exclude(closed_at=None).exists())
+        self.assertFalse(DischargeSummary.objects.filter(case__in=self.cases).exists())
+
+    def test_orders_close_and_reopen_with_their_case(self):
+        issuer = HISAccount.objects.order_by('pk').first()
+        case = self.cases[0]
+        orders = ExaminationOrder.objects.bulk_create([
+            ExaminationOrder(issued_by=issuer, case=case, description=f'Untersuchung {number}') for number in range(3)
+        ])
+
+        Case.objects.filter(pk=case.pk).close()
+        closed_at = Case.objects.get(pk=case.pk).closed_at
+        # orders aren't unique with their closing time, they all close when the case does
+        self.assertEqual(set(ExaminationOrder.objects.filter(case=case).values_list('closed_at', flat=True)),
+                         {closed_at})
+        self.assertEqual(DischargeSummary.objects.get(case=case).closed_orders, len(orders))
+
+        Case.objects.filter(pk=case.pk).reopen()
+        self.assertEqual(ExaminationOrder.objects.open_objects.filter(case=case).count(), len(orders))
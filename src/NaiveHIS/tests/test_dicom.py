@@ -0,0 +1,92 @@
+import os
+import tempfile
+
+from datetime import date
+from pathlib import Path
+
+import pydicom
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+from ..models.dicom import DicomInstance, DicomSeries, DicomStudy
+from ..models.objects import Department, Patient
+from ..models.tasks import Case
+from ..services.dicom import index_directory
+
+
+class IndexDirectoryTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(first_name='Dicom', last_name='Test', date_of_birth=date(1970, 1, 1))
+        self.case = Case.objects.create(patient=self.patient, assigned_department=Department.objects.first())
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.study_uid, self.series_uid = generate_uid(), generate_uid()
+
+    def _write(self, name: str) -> Path:
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = pydicom.uid.CTImageStorage
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+        dataset = pydicom.Dataset()
+        dataset.file_meta = meta
+        dataset.SOPClassUID = meta.MediaStorageSOPClassUID
+        dataset.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+        dataset.StudyInstanceUID = self.study_uid
+        dataset.SeriesInstanceUID = self.series_uid
+        # our own patient number, acquired while the case is open
+        dataset.PatientID = str(self.patient.pk)
+        dataset.IssuerOfPatientID = settings.HL7_APPLICATION
+        dataset.PatientBirthDate = '19700101'
+        dataset.StudyDate = timezone.localdate().strftime('%Y%m%d')
+        dataset.StudyTime = '235959'
+        dataset.Modality = 'CT'
+        dataset.StudyDescription = 'Thorax'
+
+        path = self.root / name
+        dataset.save_as(path, enforce_file_format=True)
+        return path
+
+    def _index(self, **kwargs):
+        return index_directory(self.root, workers=1, **kwargs)
+
+    def test_rescan(self):
+        self._write('1.dcm')
+        second = self._write('2.dcm')
+        (self.root / 'notes.txt').write_text('kein DICOM')
+
+        with self.assertLogs('NaiveHIS.services.dicom', 'WARNING'):
+            self.assertEqual(self._index(), (2, 0, 1, 0))
+
+        study = DicomStudy.objects.get(study_instance_uid=self.study_uid)
+        self.assertEqual((study.patient_id, study.case_id), (self.patient.pk, self.case.pk))
+
+        # only the changed file is read again, the unreadable one is tried again
+        stat = second.stat()
+        os.utime(second, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        progress = []
+        with self.assertLogs('NaiveHIS.services.dicom', 'WARNING'):
+            self.assertEqual(self._index(progress=lambda *args: progress.append(args)), (1, 1, 1, 0))
+
+        self.assertEqual(progress[-1], (3, None, '1 Dateien indiziert, 1 unverändert'))
+        self.assertEqual(DicomInstance.objects.filter(series__series_instance_uid=self.series_uid).count(), 2)
+
+    def test_prune(self):
+        first, second = self._write('1.dcm'), self._write('2.dcm')
+        self._index()
+
+        first.unlink()
+        self.assertEqual(self._index().removed, 0)
+        self.assertEqual(self._index(prune=True).removed, 1)
+
+        # the series and study go along with their last file
+        second.unlink()
+        self._index(prune=True)
+        self.assertFalse(DicomSeries.objects.filter(series_instance_uid=self.series_uid).exists())
+        self.assertFalse(DicomStudy.objects.filter(study_instance_uid=self.study_uid).exists())
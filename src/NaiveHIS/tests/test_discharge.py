@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models.accounts import HISAccount
+from ..models.discharge import DischargeSummary
+from ..models.objects import Department, Patient, Room
+from ..models.tasks import Case, TransportOrder
+
+
+class DischargeTests(TestCase):
+    def setUp(self):
+        self.issuer = HISAccount.objects.order_by('pk').first()
+        patient = Patient.objects.create(first_name='Discharge', last_name='Test', date_of_birth='2000-01-01')
+        self.case = Case.objects.create(patient=patient, assigned_department=Department.objects.first())
+        self.rooms = list(Room.objects.order_by('pk')[:2])
+
+    def _usage(self) -> list[int]:
+        return [room.usage for room in Room.objects.filter(pk__in=[room.pk for room in self.rooms]).order_by('pk')]
+
+    def _transport(self, from_room: Room, to_room: Room, **fields) -> TransportOrder:
+        return TransportOrder.objects.create(issued_by=self.issuer, case=self.case, from_room=from_room,
+                                             to_room=to_room, requested_arrival=timezone.now(), supervised=False,
+                                             **fields)
+
+    def test_save_closing_time(self):
+        case = Case.objects.get(pk=self.case.pk)
+        case.closed_at = timezone.now()
+        case.save()
+        self.assertTrue(DischargeSummary.objects.filter(case=case).exists())
+
+        case.closed_at = None
+        case.save()
+        self.assertFalse(DischargeSummary.objects.filter(case=case).exists())
+
+    def test_room_usage_is_balanced(self):
+        first, second = self.rooms
+        before = self._usage()
+
+        # the first transport of a case brings the patient in, without leaving its from_room
+        self._transport(first, first, closed_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(self._usage(), [before[0] + 1, before[1]])
+
+        moved = self._transport(first, second)
+        TransportOrder.objects.filter(pk=moved.pk).close(closed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self._usage(), [before[0], before[1] + 1])
+
+        # a transport still open on discharge wasn't carried out
+        self._transport(second, first)
+        Case.objects.filter(pk=self.case.pk).close()
+        self.assertEqual(self._usage(), before)
+
+        Case.objects.filter(pk=self.case.pk).reopen()
+        self.assertEqual(self._usage(), [before[0], before[1] + 1])
+
+    def test_reopened_transport(self):
+        first, second = self.rooms
+        before = self._usage()
+
+        self._transport(first, first, closed_at=timezone.now() - timedelta(hours=2))
+        moved = self._transport(first, second, closed_at=timezone.now() - timedelta(hours=1))
+        TransportOrder.objects.filter(pk=moved.pk).reopen()
+        self.assertEqual(self._usage(), [before[0] + 1, before[1]])
+
+        moved = TransportOrder.objects.get(pk=moved.pk)
+        moved.closed_at = timezone.now()
+        moved.save()
+        self.assertEqual(self._usage(), [before[0], before[1] + 1])
@@ -0,0 +1,56 @@
+import json
+import tempfile
+
+from datetime import timedelta
+from pathlib import Path
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..fhir.export import bulk_export
+from ..models.accounts import Doctor, DoctorQualification
+from ..models.hl7 import PatientIdentifier
+from ..models.medical import Discipline
+from ..models.objects import Patient
+
+
+class FhirExportTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(first_name='Fhir', last_name='Test', date_of_birth='2000-01-01')
+        self.doctor = Doctor.objects.order_by('pk').first()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def _export(self, since=None) -> dict[str, set[str]]:
+        manifest = bulk_export(self.directory, ['Patient', 'Practitioner'], since=since, workers=1)
+
+        ids = {'Patient': set(), 'Practitioner': set()}
+        for output in manifest['output']:
+            for line in (self.directory / output['url']).read_text(encoding='utf-8').splitlines():
+                resource = json.loads(line)
+                ids[resource['resourceType']].add(resource['id'])
+
+        for path in self.directory.glob('*.ndjson'):
+            path.unlink()
+
+        return ids
+
+    def test_full_export(self):
+        ids = self._export()
+        self.assertIn(str(self.patient.pk), ids['Patient'])
+        self.assertIn(str(self.doctor.pk), ids['Practitioner'])
+
+        manifest = json.loads((self.directory / 'manifest.json').read_text(encoding='utf-8'))
+        self.assertEqual(manifest['request'], '$export?_type=Patient,Practitioner')
+
+    def test_since(self):
+        since = timezone.now() + timedelta(microseconds=1)
+        self.assertEqual(self._export(since), {'Patient': set(), 'Practitioner': set()})
+
+        # identifiers and qualifications are part of the resources, adding them changes them
+        PatientIdentifier.objects.create(patient=self.patient, authority='TEST', value='4711')
+        DoctorQualification.objects.create(doctor=self.doctor, qualification=Discipline.values[0])
+        self.assertEqual(self._export(since), {'Patient': {str(self.patient.pk)},
+                                               'Practitioner': {str(self.doctor.pk)}})
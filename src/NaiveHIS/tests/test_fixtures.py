@@ -0,0 +1,56 @@
+from datetime import date
+
+from django.test import TestCase
+
+from .. import cache
+from ..models.accounts import Doctor, DoctorQualification, HISAccount
+from ..models.medical import Discipline
+from ..models.objects import Department, Patient, Room
+from ..models.search import PatientSearchIndex
+from ..services.fixtures import load_fixtures
+
+
+def _doctor(department, username: str) -> dict:
+    return dict(department=department, rank=Doctor.Rank.SPECIALIST_PHYSICIAN, username=username, password='geheim',
+                first_name='Fixture', last_name='Test', gender='d', date_of_birth=date(1970, 1, 1), city='Berlin',
+                street='Teststraße', street_number=1, zip_code='10115')
+
+
+class LoadFixturesTests(TestCase):
+    def test_load(self):
+        existing = Department.objects.first()
+        # warm the cache, loading departments bumps it
+        cache.departments()
+
+        objects = load_fixtures({
+            # declared before what they reference
+            DoctorQualification: {'lister_surgery': dict(doctor='lister', qualification=Discipline.values[0])},
+            Doctor: {'lister': _doctor('fixtures', 'lister'), 'semmelweis': _doctor(existing.pk, 'semmelweis')},
+            Room: {'fixture_room': dict(name='Fixture-Raum', department='fixtures', capacity=2)},
+            Department: {'fixtures': dict(name='Fixtures')},
+            Patient: {'patient': dict(first_name='Fixture', last_name='Patientin', date_of_birth=date(2000, 1, 1))},
+        }, hashing_workers=2)
+
+        lister = Doctor.objects.get(username='lister')
+        self.assertEqual(lister.pk, objects['lister'].pk)
+        self.assertEqual(lister.department, objects['fixtures'])
+        self.assertTrue(lister.check_password('geheim'))
+        # the account table shares the primary key
+        self.assertTrue(HISAccount.objects.filter(pk=lister.pk, username='lister').exists())
+        self.assertEqual(Doctor.objects.get(username='semmelweis').department, existing)
+        self.assertEqual(DoctorQualification.objects.get(doctor=lister).qualification, Discipline.values[0])
+        self.assertEqual(Room.objects.get(name='Fixture-Raum').department, objects['fixtures'])
+
+        self.assertTrue(PatientSearchIndex.objects.filter(patient=objects['patient']).exists())
+        self.assertIn('Fixtures', [department.name for department in cache.departments()])
+
+    def test_invalid(self):
+        for fixtures, message in (
+            ({Department: {'same': dict(name='A')}, Room: {'same': dict(name='B', department='same', capacity=1)}},
+             'used twice'),
+            ({Room: {'room': dict(name='A', department='missing', capacity=1)}}, 'unknown fixture'),
+        ):
+            with self.subTest(message=message), self.assertRaisesMessage(ValueError, message):
+                load_fixtures(fixtures)
+
+        self.assertFalse(Room.objects.filter(name='A').exists())
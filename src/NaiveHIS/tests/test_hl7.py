@@ -0,0 +1,150 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..hl7.adt import AdtIngester
+from ..hl7.parser import escape, format_timestamp, iter_messages, parse_message, parse_timestamp, unescape
+from ..models.census import DailyCensus
+from ..models.discharge import DischargeSummary
+from ..models.hl7 import CaseIdentifier, PatientIdentifier, ReceivedMessage
+from ..models.objects import Department, Patient, Room
+from ..models.tasks import Case, TransferOrder, TransportOrder
+
+
+class ParserTests(TestCase):
+    def test_fields_and_components(self):
+        message = parse_message('MSH|^~\\&|LAB|HOSPITAL|||20230115083000||ADT^A01|42|P|2.5\r'
+                                'PID|||123^^^KIS||Muster^Max\\S\\Moritz||19700101|M\r')
+
+        self.assertEqual(message.get('MSH-1'), '|')
+        self.assertEqual(message.message_type, 'ADT^A01')
+        self.assertEqual(message.control_id, '42')
+        self.assertEqual(message.sender, 'LAB^HOSPITAL')
+        self.assertEqual(message.get('PID-3.4'), 'KIS')
+        self.assertEqual(message.get('PID-5.2'), 'Max^Moritz')
+        self.assertEqual(message.get('PV1-3'), '')
+
+    def test_escape(self):
+        value = 'a|b^c&d~e\\f'
+        self.assertEqual(unescape(escape(value)), value)
+
+    def test_timestamps(self):
+        self.assertEqual(parse_timestamp('20230115'), parse_timestamp('20230115000000'))
+        self.assertEqual(parse_timestamp('202301150830+0100').utcoffset(), timedelta(hours=1))
+        self.assertIsNone(parse_timestamp(''))
+        with self.assertRaises(ValueError):
+            parse_timestamp('yesterday')
+
+        now = timezone.now().replace(microsecond=0)
+        self.assertEqual(parse_timestamp(format_timestamp(now)), now)
+
+    def test_stream(self):
+        stream = 'MSH|^~\\&|A|B|||20230115||ADT^A01|1|P|2.5\nPID|||1\nMSH|^~\\&|A|B|||20230115||ADT^A08|2|P|2.5\n'
+        messages = list(iter_messages([stream[:30], stream[30:]]))
+        self.assertEqual([message.control_id for message in messages], ['1', '2'])
+        self.assertEqual(messages[0].get('PID-3'), '1')
+
+
+class IngestionTests(TestCase):
+    def setUp(self):
+        self.departments = [Department.objects.create(name=f'HL7 {name}') for name in 'AB']
+        self.rooms = [Room.objects.create(name=f'HL7-{number}', department=self.departments[0], capacity=4, usage=0)
+                      for number in range(2)]
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        self.number = 0
+
+    def _message(self, event: str, patient: int, department: str = 'A', room: int | None = None,
+                 visit: bool = True, name: str = 'Muster') -> str:
+        self.number += 1
+        timestamp = format_timestamp(self.start + timedelta(minutes=self.number))
+        location = f'HL7 {department}^{f"HL7-{room}" if room is not None else ""}'
+
+        return '\r'.join([
+            f'MSH|^~\\&|TEST|HOSPITAL|NaiveHIS||{timestamp}||ADT^{event}|TEST{self.number}|P|2.5',
+            f'EVN|{event}|{timestamp}',
+            f'PID|||T{patient}^^^TEST||{name}^Max||19700101|M|||Hauptstraße 3^^Berlin^^10115',
+            f'PV1||I|{location}||||||||||||||||{f"V{patient}" if visit else ""}^^^TEST',
+        ])
+
+    def _ingest(self, *messages: str) -> list[str]:
+        return [parse_message(ack).get('MSA-1') for ack in AdtIngester().ingest([parse_message(m) for m in messages])]
+
+    def _usage(self) -> list[int]:
+        return list(Room.objects.filter(pk__in=[room.pk for room in self.rooms]).order_by('pk')
+                    .values_list('usage', flat=True))
+
+    def test_admission_transfer_update_discharge(self):
+        acks = self._ingest(
+            self._message('A01', 1, room=0),
+            self._message('A02', 1, department='B', room=1),
+            self._message('A08', 1, name='Mustermann'),
+            self._message('A01', 2, room=0, visit=False),
+        )
+        self.assertEqual(acks, ['AA'] * 4)
+
+        patient = PatientIdentifier.objects.get(authority='TEST', value='T1').patient
+        self.assertEqual(patient.last_name, 'Mustermann')
+        self.assertEqual(patient.street, 'Hauptstraße')
+        self.assertEqual(patient.street_number, 3)
+
+        case = CaseIdentifier.objects.get(authority='TEST', value='V1').case
+        self.assertEqual(case.assigned_department, self.departments[1])
+        self.assertEqual(case.last_room, self.rooms[1])
+        self.assertEqual(TransportOrder.objects.filter(case=case).count(), 2)
+        self.assertTrue(TransferOrder.objects.filter(case=case, from_department=self.departments[0]).exists())
+        self.assertEqual(self._usage(), [1, 1])
+
+        census = dict(DailyCensus.objects.filter(department__in=self.departments).order_by('day')
+                      .values_list('department', 'census'))
+        self.assertEqual(census, {self.departments[0].pk: 1, self.departments[1].pk: 1})
+
+        # without a visit number the patient's open case is discharged
+        self.assertEqual(self._ingest(self._message('A03', 1), self._message('A03', 2, visit=False)), ['AA', 'AA'])
+        self.assertFalse(Case.objects.open_objects.filter(patient__identifiers__authority='TEST').exists())
+        self.assertEqual(DischargeSummary.objects.filter(case__patient__identifiers__authority='TEST').count(), 2)
+        self.assertEqual(self._usage(), [0, 0])
+
+    def test_discharge_times(self):
+        first, second = self._message('A01', 1), self._message('A01', 2)
+        discharges = [self._message('A03', 1), self._message('A03', 2)]
+        self._ingest(first, second, *discharges)
+
+        closed_at = sorted(Case.objects.filter(patient__identifiers__authority='TEST')
+                           .values_list('closed_at', flat=True))
+        self.assertEqual(closed_at, [parse_timestamp(parse_message(m).get('EVN-2')) for m in discharges])
+
+    def test_readmission_in_the_same_batch(self):
+        acks = self._ingest(
+            self._message('A01', 1, room=0, visit=False),
+            self._message('A03', 1, visit=False),
+            self._message('A01', 1, room=1, visit=False),
+        )
+        self.assertEqual(acks, ['AA'] * 3)
+
+        cases = Case.objects.filter(patient__identifiers__value='T1').order_by('created_at')
+        self.assertEqual([case.is_open for case in cases], [False, True])
+        self.assertEqual(self._usage(), [0, 1])
+
+    def test_rejected_messages(self):
+        admission = self._message('A01', 1)
+        acks = self._ingest(
+            admission,
+            self._message('A01', 2, department='unknown'),
+            self._message('A02', 3),
+            admission,
+        )
+        self.assertEqual(acks, ['AA', 'AE', 'AE', 'AA'])
+        self.assertEqual(Patient.objects.filter(identifiers__authority='TEST').count(), 1)
+
+        # sent again, the admission isn't applied twice
+        self.assertEqual(self._ingest(admission), ['AA'])
+        self.assertEqual(Case.objects.filter(patient__identifiers__authority='TEST').count(), 1)
+        self.assertEqual(ReceivedMessage.objects.filter(sender='TEST^HOSPITAL').count(), 3)
+
+    def test_visit_taken_twice(self):
+        self._ingest(self._message('A01', 1))
+
+        acks = self._ingest(self._message('A01', 1), self._message('A01', 2))
+        self.assertEqual(acks, ['AE', 'AA'])
+        self.assertEqual(Case.objects.filter(patient__identifiers__authority='TEST').count(), 2)
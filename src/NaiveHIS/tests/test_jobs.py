@@ -0,0 +1,61 @@
+import tempfile
+
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models.jobs import Job
+from ..services.jobs import TASKS, JobCancelled, JobContext, JobWorker, enqueue
+
+
+class JobClaimTests(TestCase):
+    def setUp(self):
+        self.job = enqueue('rebuild_census', max_attempts=2)
+
+    def test_claimed_once(self):
+        self.assertEqual(JobWorker().claim().pk, self.job.pk)
+        self.assertIsNone(JobWorker().claim())
+
+    def test_stale_run_is_fenced(self):
+        worker = JobWorker(stale_after=timedelta(minutes=5))
+        worker.claim()
+        stale = JobContext(Job.objects.get(pk=self.job.pk))
+
+        Job.objects.filter(pk=self.job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(worker.recover_stale(), 1)
+        worker.claim()
+
+        # the run that was given up on can neither report progress nor finish the next attempt
+        with self.assertRaises(JobCancelled):
+            stale.progress(1, 2)
+        self.assertEqual(stale._run.update(status=Job.Status.SUCCEEDED), 0)
+
+        job = Job.objects.get(pk=self.job.pk)
+        self.assertEqual((job.status, job.attempts, job.progress), (Job.Status.RUNNING, 2, 0))
+
+
+class JobProgressTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.arguments = {'directory': directory.name, 'types': ['Location', 'Practitioner']}
+
+        job = enqueue('fhir_export', **self.arguments)
+        JobWorker().claim()
+        # loaded again like the worker process does, with the attempt it was claimed for
+        self.context = JobContext(Job.objects.get(pk=job.pk))
+        self.context.progress_interval = 0
+
+    def test_progress_per_range(self):
+        TASKS['fhir_export'](self.context, **self.arguments)
+
+        job = Job.objects.get(pk=self.context.job.pk)
+        self.assertEqual((job.progress, job.total), (2, 2))
+        self.assertTrue(job.message.endswith('Ressourcen exportiert'))
+
+    def test_cancelled(self):
+        Job.objects.filter(pk=self.context.job.pk).update(cancel_requested=True)
+
+        with self.assertRaises(JobCancelled):
+            TASKS['fhir_export'](self.context, **self.arguments)
@@ -0,0 +1,133 @@
+import hashlib
+import sqlite3
+import tempfile
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.contrib.auth.hashers import check_password
+from django.test import SimpleTestCase, TestCase
+
+from ..hashers import LegacyPBKDF2PasswordHasher
+from ..models.accounts import Doctor, DoctorQualification
+from ..models.legacy import LegacyRecord
+from ..models.medical import Discipline, Metastases, Nodes, Tumor
+from ..models.objects import Department, Patient
+from ..models.tasks import Case, DiagnosisReport
+from ..services.legacy import LegacyMigrator
+
+SCHEMA = '''
+CREATE TABLE doctors (doctor_id INTEGER PRIMARY KEY, username TEXT, last_name TEXT, first_name TEXT, salt BLOB,
+                      pw_hash BLOB, created TEXT, updated TEXT);
+CREATE TABLE roles (role_id INTEGER PRIMARY KEY, role TEXT);
+CREATE TABLE doctors_roles (doctor_id INTEGER, role_id INTEGER);
+CREATE TABLE patients (patient_id INTEGER PRIMARY KEY, last_name TEXT, first_name TEXT, date_of_birth TEXT,
+                       created TEXT, updated TEXT);
+CREATE TABLE cases (case_id INTEGER PRIMARY KEY, patient_id INTEGER, created TEXT, updated TEXT);
+CREATE TABLE doctors_cases (doctor_id INTEGER, case_id INTEGER, created TEXT, updated TEXT);
+CREATE TABLE reports (report_id INTEGER PRIMARY KEY, case_id INTEGER, doctor_id INTEGER, text TEXT, data TEXT,
+                      report_type TEXT, created TEXT, updated TEXT);
+'''
+
+
+def _legacy_password(password: str, salt: bytes) -> bytes:
+    # see old/utils.py
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100_000, dklen=128)
+
+
+class LegacyHasherTests(SimpleTestCase):
+    def test_legacy_hashes_are_checked(self):
+        salt = bytes(range(64))
+        encoded = LegacyPBKDF2PasswordHasher().from_legacy(salt, _legacy_password('geheim', salt))
+
+        self.assertTrue(check_password('geheim', encoded))
+        self.assertFalse(check_password('falsch', encoded))
+
+    def test_encode_matches_legacy(self):
+        hasher = LegacyPBKDF2PasswordHasher()
+        salt = hasher.salt()
+        self.assertEqual(hasher.encode('geheim', salt),
+                         hasher.from_legacy(bytes.fromhex(salt), _legacy_password('geheim', bytes.fromhex(salt))))
+
+
+class LegacyMigratorTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Altsystem')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'legacy.sqlite3')
+
+        salt = bytes(64)
+        with sqlite3.connect(self.path) as connection:
+            connection.executescript(SCHEMA)
+            connection.execute("INSERT INTO doctors VALUES (1, 'altarzt', 'Alt', 'Arzt', ?, ?, "
+                               "'2019-01-01 08:00:00', '2019-01-01 08:00:00')",
+                               (salt, _legacy_password('geheim', salt)))
+            connection.execute("INSERT INTO roles VALUES (1, 'PATHOLOGIST')")
+            connection.execute('INSERT INTO doctors_roles VALUES (1, 1)')
+            connection.executemany('INSERT INTO patients VALUES (?, ?, ?, ?, ?, ?)', [
+                (1, 'Legacy', 'Erika', '1950-02-03', '2019-01-01 08:00:00', '2019-01-01 08:00:00'),
+                # without a date of birth, which patients need now
+                (2, 'Legacy', 'Ohne', None, '2019-01-01 08:00:00', '2019-01-01 08:00:00'),
+            ])
+            connection.executemany('INSERT INTO cases VALUES (?, ?, ?, ?)', [
+                (1, 1, '2020-01-01 08:00:00', '2020-02-01 08:00:00'),
+                (2, 1, '2021-01-01 08:00:00', '2020-02-01 08:00:00'),
+                (3, 1, '2022-01-01 08:00:00', '2022-02-01 08:00:00'),
+                (4, 2, '2022-01-01 08:00:00', '2022-02-01 08:00:00'),
+            ])
+            connection.execute("INSERT INTO doctors_cases VALUES (1, 3, '2022-01-01 08:00:00', "
+                               "'2022-01-01 08:00:00')")
+            connection.execute("INSERT INTO reports VALUES (1, 3, 1, 'Befund', 'pT2 N1 M0', 'PATHOLOGY', "
+                               "'2022-01-02 08:00:00', '2022-01-02 08:00:00')")
+        connection.close()
+
+    def _migrate(self, **kwargs):
+        migrator = LegacyMigrator(self.path, self.department, **kwargs)
+        try:
+            return migrator.migrate()
+        finally:
+            migrator.close()
+
+    def _cases(self) -> list[Case]:
+        return list(Case.objects.filter(patient__last_name='Legacy').order_by('created_at'))
+
+    def test_migrate(self):
+        stats = self._migrate()
+        self.assertEqual((stats['doctors'], stats['patients'], stats['patients skipped']), (1, 1, 1))
+        self.assertEqual((stats['cases'], stats['cases skipped'], stats['reports']), (3, 1, 1))
+
+        doctor = Doctor.objects.get(username='altarzt')
+        self.assertTrue(doctor.check_password('geheim'))
+        self.assertEqual(list(DoctorQualification.objects.filter(doctor=doctor).values_list('qualification',
+                                                                                             flat=True)),
+                         [Discipline.PATHOLOGY])
+
+        cases = self._cases()
+        self.assertEqual(cases[0].created_at, datetime(2020, 1, 1, 8, tzinfo=timezone.utc))
+        self.assertEqual(cases[2].assigned_doctor_id, doctor.pk)
+
+        report = DiagnosisReport.objects.get(case=cases[2])
+        self.assertEqual((report.tumor, report.nodes, report.metastases), (Tumor.T2, Nodes.N1, Metastases.M0))
+
+        # run again, nothing is left to migrate
+        self.assertEqual(sum(self._migrate().values()), 0)
+        self.assertEqual(LegacyRecord.objects.filter(table='cases').count(), 4)
+
+    def test_only_the_newest_case_stays_open(self):
+        # one case per chunk, the cases migrated before are closed once a newer one is
+        self._migrate(chunk_size=1)
+
+        cases = self._cases()
+        self.assertEqual([case.is_open for case in cases], [False, False, True])
+        # both changed last at the same time
+        changed = datetime(2020, 2, 1, 8, tzinfo=timezone.utc)
+        self.assertEqual([case.closed_at for case in cases[:2]], [changed, changed + timedelta(microseconds=1)])
+        self.assertEqual(Patient.objects.filter(last_name='Legacy').count(), 1)
+
+    def test_close_cases(self):
+        self._migrate(close_cases=True)
+
+        closed_at = [case.closed_at for case in self._cases()]
+        self.assertNotIn(None, closed_at)
+        self.assertEqual(len(set(closed_at)), 3)
@@ -0,0 +1,26 @@
+from django.test import SimpleTestCase
+
+from ..models.medical import Metastases, Nodes, Tumor, parse_staging
+
+
+class ParseStagingTests(SimpleTestCase):
+    def test_compact(self):
+        self.assertEqual(parse_staging('TisN3M1'), (Tumor.TIS, Nodes.N3, Metastases.M1))
+
+    def test_prefixes(self):
+        for text, staging in (
+            ('pT2 N1 M0', (Tumor.T2, Nodes.N1, Metastases.M0)),
+            ('pT3 pN1 M0', (Tumor.T3, Nodes.N1, Metastases.M0)),
+            ('T2 N1 cM0', (Tumor.T2, Nodes.N1, Metastases.M0)),
+            ('ypT1 ypN0 cM0', (Tumor.T1, Nodes.N0, Metastases.M0)),
+        ):
+            with self.subTest(text):
+                self.assertEqual(parse_staging(text), staging)
+
+    def test_subcategories(self):
+        self.assertEqual(parse_staging('Befund: T1a N0 M0'), (Tumor.T1, Nodes.N0, Metastases.M0))
+
+    def test_invalid(self):
+        for text in ('', 'T5 N0 M0', 'T2 M0'):
+            with self.subTest(text), self.assertRaises(ValueError):
+                parse_staging(text)
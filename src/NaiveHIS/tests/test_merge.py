@@ -0,0 +1,77 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models.accounts import HISAccount
+from ..models.audit import AuditEvent
+from ..models.discharge import DischargeSummary
+from ..models.duplicates import DuplicateCandidate, PatientMerge
+from ..models.objects import Department, Patient
+from ..models.tasks import Case
+from ..services.merge import merge_patients, undo_merge
+
+
+def _patient(name: str) -> Patient:
+    return Patient.objects.create(first_name=name, last_name=name, date_of_birth='2000-01-01')
+
+
+class MergePatientsTests(TestCase):
+    def setUp(self):
+        department = Department.objects.first()
+        self.survivor, self.merged = _patient('Survivor'), _patient('Merged')
+
+        Case.objects.create(patient=self.survivor, assigned_department=department)
+        self.cases = [Case.objects.create(patient=self.merged, assigned_department=department) for _ in range(2)]
+        AuditEvent.objects.create(action=AuditEvent.Action.VIEW, model='NaiveHIS.Patient',
+                                  object_id=str(self.merged.pk), object_repr='Merged', patient=self.merged)
+
+    def test_merge(self):
+        merged_pk = self.merged.pk
+        merge = merge_patients(self.survivor, self.merged)
+
+        # the survivor keeps its open case, the ones of the merged patient are discharged
+        self.assertEqual(sorted(merge.closed_cases), sorted(case.pk for case in self.cases))
+        self.assertEqual(Case.objects.filter(patient=self.survivor, closed_at=None).count(), 1)
+        self.assertEqual(DischargeSummary.objects.filter(case__in=self.cases).count(), 2)
+        # history stays with the patient it was recorded for
+        self.assertEqual(AuditEvent.objects.filter(patient_id=merged_pk).count(), 1)
+        self.assertFalse(Patient.objects.filter(pk=merged_pk).exists())
+
+    def test_undo(self):
+        merge = merge_patients(self.survivor, self.merged)
+        restored = undo_merge(PatientMerge.objects.get(pk=merge.pk))
+
+        self.assertEqual(Case.objects.filter(patient=restored, closed_at=None).count(), 2)
+        self.assertFalse(DischargeSummary.objects.filter(case__in=self.cases).exists())
+
+    def test_chained(self):
+        merged_pk = self.merged.pk
+        merge = merge_patients(self.survivor, self.merged)
+        third = _patient('Third')
+        chained = merge_patients(third, self.survivor)
+
+        undo_merge(chained)
+        undo_merge(PatientMerge.objects.get(pk=merge.pk))
+        self.assertEqual(Case.objects.filter(patient_id=merged_pk).count(), 2)
+
+
+class MergeActionTests(TestCase):
+    def setUp(self):
+        HISAccount.objects.create_superuser('zusammen', password='zusammen')
+        self.client.login(username='zusammen', password='zusammen')
+
+    def _candidate(self, name: str, status: str) -> DuplicateCandidate:
+        return DuplicateCandidate.objects.create(patient=_patient(name), duplicate=_patient(name), score=1.0,
+                                                 blocking_key=name, status=status)
+
+    def test_rejected_candidates_are_skipped(self):
+        candidate = self._candidate('Offen', DuplicateCandidate.Status.OPEN)
+        rejected = self._candidate('Abgelehnt', DuplicateCandidate.Status.REJECTED)
+
+        response = self.client.post(reverse('admin:NaiveHIS_duplicatecandidate_changelist'), {
+            'action': 'merge', '_selected_action': [candidate.pk, rejected.pk],
+        }, follow=True)
+
+        self.assertFalse(Patient.objects.filter(pk=candidate.duplicate_id).exists())
+        self.assertTrue(Patient.objects.filter(pk=rejected.duplicate_id).exists())
+        self.assertContains(response, '1 bereits geprüfte Kandidaten übersprungen')
+        self.assertContains(response, '1 Patienten zusammengeführt')
@@ -0,0 +1,105 @@
+import threading
+
+from datetime import date
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..hl7.mllp import MLLPServer
+from ..hl7.outbound import OutboundSender
+from ..hl7.parser import Message, parse_message
+from ..models.accounts import HISAccount
+from ..models.hl7 import OutboundMessage
+from ..models.objects import Department, Patient, Room
+from ..models.tasks import Case, TransportOrder
+
+DESTINATIONS = {
+    'PDMS': {'host': '127.0.0.1', 'port': 0, 'messages': ('ADT',)},
+    'LAB': {'host': '127.0.0.1', 'port': 0, 'messages': ('ORU',)},
+}
+
+
+@override_settings(HL7_OUTBOUND_DESTINATIONS=DESTINATIONS)
+class OutboundEventTests(TestCase):
+    def setUp(self):
+        patient = Patient.objects.create(first_name='Feed', last_name='Test', date_of_birth=date(2000, 1, 1))
+        self.case = Case.objects.create(patient=patient, assigned_department=Department.objects.first())
+
+    def _types(self) -> list[tuple[str, str]]:
+        return list(OutboundMessage.objects.order_by('id').values_list('destination', 'message_type'))
+
+    def test_case_lifecycle(self):
+        first, second = Room.objects.order_by('pk')[:2]
+        issuer = HISAccount.objects.order_by('pk').first()
+        transport = TransportOrder.objects.create(issued_by=issuer, case=self.case, from_room=first, to_room=second,
+                                                  requested_arrival=timezone.now(), supervised=False)
+        TransportOrder.objects.filter(pk=transport.pk).close()
+
+        Case.objects.filter(pk=self.case.pk).close()
+        Case.objects.filter(pk=self.case.pk).reopen()
+
+        # only the destination that subscribed to ADT gets them
+        self.assertEqual(self._types(), [('PDMS', 'ADT^A01'), ('PDMS', 'ADT^A02'), ('PDMS', 'ADT^A03'),
+                                         ('PDMS', 'ADT^A13')])
+
+        admission = parse_message(OutboundMessage.objects.order_by('id').first().payload)
+        self.assertEqual(admission.get('MSH-5'), 'PDMS')
+        self.assertEqual(admission.get('PV1-19.1'), str(self.case.pk))
+
+    @override_settings(HL7_OUTBOUND_DESTINATIONS={})
+    def test_nothing_queued_without_destinations(self):
+        # the admission was queued in setUp, while PDMS was still subscribed
+        Case.objects.filter(pk=self.case.pk).close()
+        self.assertEqual(self._types(), [('PDMS', 'ADT^A01')])
+
+
+class OutboundSenderTests(TestCase):
+    def setUp(self):
+        # rejects what the test marks as invalid, accepts the rest
+        self.received = []
+        self.server = MLLPServer(('127.0.0.1', 0), self._acknowledge)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.destinations = {'PDMS': {'host': '127.0.0.1', 'port': self.server.server_address[1]}}
+
+    def _acknowledge(self, messages: list[Message]) -> list[str]:
+        self.received.extend(message.control_id for message in messages)
+        return [f'MSH|^~\\&|PDMS||||||ACK|||P|2.5\rMSA|{"AE" if "INVALID" in str(message) else "AA"}|'
+                f'{message.control_id}' for message in messages]
+
+    def _queue(self, *control_ids: str) -> list[OutboundMessage]:
+        return OutboundMessage.objects.bulk_create(
+            OutboundMessage(destination='PDMS', control_id=control_id, message_type='ADT^A01',
+                            payload=f'MSH|^~\\&|NaiveHIS||PDMS||||ADT^A01|{control_id}|P|2.5\rEVN|A01')
+            for control_id in control_ids
+        )
+
+    def test_deliver_in_order(self):
+        self._queue('1', 'INVALID', '3')
+
+        self.assertEqual(OutboundSender(self.destinations, window=2).deliver('PDMS'), 3)
+        self.assertEqual(self.received, ['1', 'INVALID', '3'])
+
+        statuses = dict(OutboundMessage.objects.values_list('control_id', 'status'))
+        self.assertEqual(statuses, {'1': OutboundMessage.Status.SENT, 'INVALID': OutboundMessage.Status.FAILED,
+                                    '3': OutboundMessage.Status.SENT})
+        self.assertEqual(OutboundSender(self.destinations).lag()['PDMS'][0], 0)
+
+    def test_unreachable_destination_is_retried(self):
+        self._queue('1', '2')
+        self.server.shutdown()
+        self.server.server_close()
+
+        sender = OutboundSender(self.destinations, retry_delay=60)
+        with self.assertLogs('NaiveHIS.hl7.outbound', 'WARNING'):
+            self.assertEqual(sender.deliver('PDMS'), 0)
+
+        head = OutboundMessage.objects.get(control_id='1')
+        self.assertEqual((head.status, head.attempts), (OutboundMessage.Status.PENDING, 1))
+        self.assertGreater(head.next_attempt_at, timezone.now())
+        # the queue waits for its head
+        self.assertEqual(sender.deliver('PDMS'), 0)
+        self.assertEqual(OutboundMessage.objects.get(control_id='1').attempts, 1)
+        self.assertEqual(sender.lag()['PDMS'][0], 2)
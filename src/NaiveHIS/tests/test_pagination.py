@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..admin.pagination import AFTER_VAR, BEFORE_VAR, KeysetPaginator
+from ..models.objects import Department, Patient
+from ..models.tasks import Case
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        department = Department.objects.first()
+        closed_at = timezone.now()
+
+        # open cases next to closed ones, some of them closed at the same time
+        for number in range(7):
+            patient = Patient.objects.create(first_name=f'Seite {number}', last_name='Blättern',
+                                             date_of_birth='2000-01-01')
+            Case.objects.create(patient=patient, assigned_department=department,
+                                closed_at=None if number % 3 == 0 else closed_at - timedelta(days=number // 2))
+
+        self.queryset = Case.objects.filter(patient__last_name='Blättern').order_by('-closed_at', '-pk')
+        # open cases last when descending, on every database
+        self.ordered = list(KeysetPaginator(self.queryset, 3)._ordered)
+        self.assertIsNone(self.ordered[-1].closed_at)
+
+    def _paginator(self, number: int = 1, **boundary) -> KeysetPaginator:
+        # every table counts as large
+        return KeysetPaginator(self.queryset, 3, exact_count_threshold=0, number=number, **boundary)
+
+    def test_pages_by_keyset(self):
+        rows, number = list(self._paginator().page(1)), 1
+        pages = [rows]
+
+        while True:
+            params = self._paginator(number).boundary_params(rows, number + 1, number)
+            paginator = self._paginator(number + 1, after=params[AFTER_VAR])
+            rows, more = paginator._fetch(number + 1)
+            pages.append(rows)
+            number += 1
+            if not more:
+                break
+
+        self.assertEqual([case for page in pages for case in page], self.ordered)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        # and back again
+        params = self._paginator(3).boundary_params(pages[2], 2, 3)
+        self.assertEqual(list(self._paginator(2, before=params[BEFORE_VAR]).page(2)), pages[1])
+
+    def test_same_as_offset(self):
+        for number in (1, 2, 3):
+            self.assertEqual(list(self._paginator(number).page(number)), self.ordered[(number - 1) * 3:number * 3])
+
+    def test_foreign_boundary_is_ignored(self):
+        # a boundary from another ordering, or tampered with, falls back to the offset
+        for boundary in ('[1]', 'kaputt', '["kein Datum", 1]'):
+            self.assertEqual(list(self._paginator(2, after=boundary).page(2)), self.ordered[3:6])
+
+    def test_distant_pages_have_no_boundary(self):
+        rows = list(self._paginator().page(1))
+        self.assertEqual(self._paginator().boundary_params(rows, 3, 1), {})
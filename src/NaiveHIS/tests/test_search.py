@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.test import SimpleTestCase, TestCase
+
+from ..models.objects import Patient
+from ..models.search import PatientSearchIndex
+from ..services.search import _rare_trigrams, cologne_phonetics, normalize_name, search_patients, trigrams
+
+
+class PhoneticsTests(SimpleTestCase):
+    def test_normalize_name(self):
+        for name in ('van Gogh', 'Van-Gogh', 'vanGogh'):
+            self.assertEqual(normalize_name(name), 'vangogh')
+        self.assertEqual(normalize_name('Größe'), 'grosse')
+
+    def test_cologne_phonetics(self):
+        self.assertEqual(cologne_phonetics('Müller-Lüdenscheidt'), '65752682')
+        self.assertEqual(cologne_phonetics('Meyer'), cologne_phonetics('Maier'))
+        self.assertEqual(cologne_phonetics('Schmidt'), cologne_phonetics('Schmitt'))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.meier = Patient.objects.create(first_name='Jürgen', last_name='Meier', date_of_birth='1960-05-01')
+        self.mayr = Patient.objects.create(first_name='Jörg', last_name='Mayr', date_of_birth='1970-01-01')
+        self.schmitt = Patient.objects.create(first_name='Anna', last_name='Schmitt', date_of_birth='1980-01-01')
+
+    def test_similar_names(self):
+        found = [match.patient for match in search_patients('Mayer')]
+        self.assertIn(self.meier, found)
+        self.assertIn(self.mayr, found)
+        self.assertNotIn(self.schmitt, found)
+
+        self.assertEqual(search_patients('Anna Schmidt')[0].patient, self.schmitt)
+
+    def test_date_of_birth_ranks_first(self):
+        self.assertEqual(search_patients('Mayer', date_of_birth=date(1970, 1, 1))[0].patient, self.mayr)
+        self.assertEqual(search_patients('Mayer', date_of_birth=date(1960, 5, 1))[0].patient, self.meier)
+
+    def test_rare_trigrams_are_counted_at_once(self):
+        with self.assertNumQueries(1):
+            rare = _rare_trigrams(trigrams('Meier') | {'§§§'})
+
+        # trigrams no patient has don't narrow anything down
+        self.assertTrue(rare)
+        self.assertTrue(set(rare) <= trigrams('Meier'))
+
+    def test_raw_saves_are_not_indexed(self):
+        patient = Patient(first_name='Roh', last_name='Fixture', date_of_birth='2000-01-01')
+        patient.save_base(raw=True)
+
+        self.assertFalse(PatientSearchIndex.objects.filter(patient=patient).exists())
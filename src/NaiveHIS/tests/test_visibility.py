@@ -0,0 +1,49 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models.accounts import Doctor, HISAccount
+from ..models.objects import Patient
+from ..models.tasks import Case, TreatmentOrder
+from ..services.visibility import visible_cases
+
+
+class VisibilityTests(TestCase):
+    def setUp(self):
+        self.doctor = HISAccount.objects.get(username='koch')
+        other = Doctor.objects.get(username='hippocrates')
+        patient = Patient.objects.create(first_name='Visible', last_name='Visible', date_of_birth='2000-01-01')
+        department = Doctor.objects.get(pk=self.doctor.pk).department
+
+        self.own = Case.objects.create(patient=patient, assigned_department=department)
+        self.assigned = Case.objects.create(patient=patient, assigned_department=other.department,
+                                            assigned_doctor_id=self.doctor.pk)
+        self.ordered = Case.objects.create(patient=patient, assigned_department=other.department)
+        TreatmentOrder.objects.create(issued_by=other, case=self.ordered, doctor_id=self.doctor.pk)
+        self.hidden = Case.objects.create(patient=patient, assigned_department=other.department)
+
+        self.client.force_login(self.doctor)
+
+    def test_visible_cases(self):
+        visible = set(Case.objects.filter(visible_cases(self.doctor)).values_list('pk', flat=True))
+
+        self.assertTrue({self.own.pk, self.assigned.pk, self.ordered.pk} <= visible)
+        self.assertNotIn(self.hidden.pk, visible)
+
+    def test_changelist(self):
+        response = self.client.get(reverse('admin:NaiveHIS_case_changelist'))
+        listed = {case.pk for case in response.context['cl'].result_list}
+
+        self.assertIn(self.own.pk, listed)
+        self.assertNotIn(self.hidden.pk, listed)
+
+    def test_change_form(self):
+        response = self.client.get(reverse('admin:NaiveHIS_case_change', args=(self.hidden.pk,)))
+        self.assertNotEqual(response.status_code, 200)
+
+    def test_autocomplete_choices(self):
+        # the form class is shared by all doctors, the cases are checked per user
+        url = reverse('admin:NaiveHIS_treatmentorder_add')
+        for case, valid in ((self.own, True), (self.hidden, False)):
+            response = self.client.post(url, {'case': case.pk, 'doctor': self.doctor.pk})
+            with self.subTest(valid=valid):
+                self.assertEqual(response.status_code == 302, valid)
@@ -1,6 +1,11 @@
 import os
 
 from pathlib import Path
+from typing import Callable
+
+# reports how far a long running function got: the work done, the total if it's known and a message,
+# e.g. `JobContext.progress`
+Progress = Callable[[int, int | None, str], None]
 
 
 def read_env_file(file_path: str | bytes | Path | os.PathLike) -> dict[str, str]:
@@ -22,3 +27,33 @@ def read_env_file(file_path: str | bytes | Path | os.PathLike) -> dict[str, str]
             env[parts[0].strip()] = parts[1].strip()
 
     return env
+
+
+# database connections a forked worker inherited, kept referenced: freeing them would close the parent's sessions
+_inherited_connections = []
+
+
+def _setup_worker():
+    import django
+    from django.db import connections
+
+    django.setup()
+
+    # the pool forks on demand, by then the parent may have opened connections again. They are dropped unclosed,
+    # the worker opens its own
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            _inherited_connections.append(connection.connection)
+            connection.connection = None
+
+
+def process_pool(workers: int | None = None):
+    """
+    Process pool for CPU bound work outside of the request cycle.
+
+    Open database connections must not be shared with forked workers, every worker drops the ones it inherited
+    and sets up django on its own, in case processes are spawned instead of forked.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_setup_worker)